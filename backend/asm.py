@@ -1,27 +1,58 @@
+from typing import Optional
+
+from backend.dataflow.blocklayout import BlockLayout
 from backend.dataflow.cfg import CFG
 from backend.dataflow.cfgbuilder import CFGBuilder
 from backend.dataflow.livenessanalyzer import LivenessAnalyzer
-from backend.reg.bruteregalloc import BruteRegAlloc
+from backend.reg.regalloc import RegAlloc
 from backend.riscv.riscvasmemitter import RiscvAsmEmitter
+from utils.passtimer import PassTimer
 from utils.tac.tacprog import TACProg
 
 """
 Asm: we use it to generate all the asm code for the program
+
+Each pass of each function is measured by timer, if one is given.
+If a BlockLayout is given, the basic blocks are reordered before the liveness analysis.
+The blocks unreachable from the entry are not emitted: they never run, and may load temps
+which no reachable block stores to the stack.
 """
 
 class Asm:
-    def __init__(self, emitter: RiscvAsmEmitter, regAlloc: BruteRegAlloc) -> None:
+    def __init__(
+        self,
+        emitter: RiscvAsmEmitter,
+        regAlloc: RegAlloc,
+        analyzer: Optional[LivenessAnalyzer] = None,
+        timer: Optional[PassTimer] = None,
+        layout: Optional[BlockLayout] = None,
+    ) -> None:
         self.emitter = emitter
         self.regAlloc = regAlloc
+        self.analyzer = analyzer or LivenessAnalyzer()
+        self.timer = timer or PassTimer(enabled=False)
+        self.layout = layout
 
     def transform(self, prog: TACProg):
-        analyzer = LivenessAnalyzer()
+        analyzer = self.analyzer
+        timer = self.timer
 
         for func in prog.funcs:
-            pair = self.emitter.selectInstr(func)
-            builder = CFGBuilder()
-            cfg: CFG = builder.buildFrom(pair[0])
-            analyzer.accept(cfg)
-            self.regAlloc.accept(cfg, pair[1])
+            name = func.entry.name
+            with timer.phase("selectInstr", name):
+                pair = self.emitter.selectInstr(func)
+            with timer.phase("buildCFG", name):
+                builder = CFGBuilder()
+                cfg: CFG = builder.buildFrom(pair[0])
+            if self.layout is not None:
+                with timer.phase("layout", name):
+                    cfg = self.layout.transform(cfg, func.entry)
+            domTree = cfg.getDominatorTree()
+            cfg.order = [id for id in cfg.order if domTree.isReachable(id)]
+            with timer.phase("liveness", name):
+                analyzer.accept(cfg)
+            with timer.phase("regAlloc", name):
+                self.regAlloc.accept(cfg, pair[1])
 
-        return self.emitter.emitEnd()
+        with timer.phase("emitEnd"):
+            return self.emitter.emitEnd()
@@ -31,6 +31,11 @@ label: the label of the block, which will be used in CfgBuilder
 liveUse: the temps used in this basicblock before it's redefine
  liveIn: the active temps in the start of the basicblock
 liveOut: the active temps in the end of the basicblock
+
+liveInAt/liveOutAt: the active temps before/after a loc of this basicblock
+    They are rebuilt from liveIn and the born/dead temps of each loc with a cursor,
+    so querying the locs in order only costs the size of the differences.
+    The returned set is owned by the cursor and changed by the next query, copy it to keep it.
 """
 
 
@@ -48,6 +53,10 @@ class BasicBlock:
         self.liveIn: set[int] = set()
         self.liveOut: set[int] = set()
 
+        # liveIn of self.locs[self.cursorIndex]
+        self.cursorIndex = 0
+        self.cursorLive: set[int] = None
+
     def isEmpty(self):
         return len(self.locs) == 0
 
@@ -64,3 +73,21 @@ class BasicBlock:
 
     def getLastInstr(self):
         return self.locs[-1].instr
+
+    def liveInAt(self, loc: Loc) -> set[int]:
+        return self.moveCursorTo(loc.index)
+
+    def liveOutAt(self, loc: Loc) -> set[int]:
+        return self.moveCursorTo(loc.index + 1)
+
+    def moveCursorTo(self, index: int) -> set[int]:
+        if self.cursorLive is None or index < self.cursorIndex:
+            self.cursorIndex = 0
+            self.cursorLive = self.liveIn.copy()
+
+        while self.cursorIndex < index:
+            loc = self.locs[self.cursorIndex]
+            self.cursorLive.difference_update(loc.dead)
+            self.cursorLive.update(loc.born)
+            self.cursorIndex += 1
+        return self.cursorLive
@@ -0,0 +1,137 @@
+from collections import deque
+
+from backend.dataflow.basicblock import BasicBlock
+from backend.dataflow.cfg import CFG
+from backend.dataflow.livenessanalyzer import LivenessAnalyzer
+
+"""
+BitVectorLivenessAnalyzer: the same liveness analysis as LivenessAnalyzer, with a faster solver
+
+Temps are numbered densely: temp i is bit i, as the temps of a TACFunc are 0 .. tempUsed - 1,
+and the precolored regs get the bits after all the temps. define/liveUse/liveIn/liveOut of
+every basic block are python ints used as bitsets while solving, and are turned back into
+sets of temp indexes at the end, so the results are identical to LivenessAnalyzer.
+
+Instead of sweeping all the basic blocks until nothing changes, the blocks are put into a
+worklist in postorder (i.e. the reverse postorder of the reversed CFG), and a block is only
+revisited when the liveIn of one of its successors has changed.
+"""
+
+
+class BitVectorLivenessAnalyzer(LivenessAnalyzer):
+    def accept(self, graph: CFG):
+        (indexes, define, liveUse, liveIn, liveOut) = self.solve(graph)
+        for bb in graph.nodes:
+            bb.define = self.toSet(define[bb.id], indexes)
+            bb.liveUse = self.toSet(liveUse[bb.id], indexes)
+            bb.liveIn = self.toSet(liveIn[bb.id], indexes)
+            bb.liveOut = self.toSet(liveOut[bb.id], indexes)
+            self.analyzeLivenessForEachLocIn(bb)
+
+    # only the liveOut of each block, for the passes which need nothing else
+    def computeLiveOut(self, graph: CFG) -> list[set[int]]:
+        (indexes, _, _, _, liveOut) = self.solve(graph)
+        return [self.toSet(bitset, indexes) for bitset in liveOut]
+
+    # the indexes of the bits, and define/liveUse/liveIn/liveOut of each block as bits
+    def solve(
+        self, graph: CFG
+    ) -> tuple[list[int], list[int], list[int], list[int], list[int]]:
+        bits = self.numberTemps(graph)
+        indexes = sorted(bits, key=bits.get)
+
+        n = len(graph.nodes)
+        define = [0] * n
+        liveUse = [0] * n
+        liveIn = [0] * n
+        liveOut = [0] * n
+        for bb in graph.nodes:
+            define[bb.id], liveUse[bb.id] = self.computeDefAndLiveUseBits(bb, bits)
+            liveIn[bb.id] = liveUse[bb.id]
+
+        order = self.postorder(graph)
+        worklist = deque(order)
+        inWorklist = [False] * n
+        for id in order:
+            inWorklist[id] = True
+
+        while worklist:
+            id = worklist.popleft()
+            inWorklist[id] = False
+
+            out = 0
+            for next in graph.getSucc(id):
+                out |= liveIn[next]
+            liveOut[id] = out
+
+            live = liveUse[id] | (out & ~define[id])
+            if live != liveIn[id]:
+                liveIn[id] = live
+                for prev in graph.getPrev(id):
+                    if not inWorklist[prev]:
+                        inWorklist[prev] = True
+                        worklist.append(prev)
+        return (indexes, define, liveUse, liveIn, liveOut)
+
+    # from temp index to bit
+    def numberTemps(self, graph: CFG) -> dict[int, int]:
+        regs = set()
+        tempUsed = 0
+        for bb in graph.nodes:
+            for loc in bb.iterator():
+                for index in loc.instr.getRead() + loc.instr.getWritten():
+                    if index < 0:
+                        regs.add(index)
+                    elif index >= tempUsed:
+                        tempUsed = index + 1
+
+        bits = {index: index for index in range(tempUsed)}
+        for index in sorted(regs, reverse=True):
+            bits[index] = len(bits)
+        return bits
+
+    def computeDefAndLiveUseBits(
+        self, bb: BasicBlock, bits: dict[int, int]
+    ) -> tuple[int, int]:
+        define = 0
+        liveUse = 0
+        for loc in bb.iterator():
+            for read in loc.instr.getRead():
+                bit = 1 << bits[read]
+                if not define & bit:
+                    liveUse |= bit
+            for written in loc.instr.getWritten():
+                define |= 1 << bits[written]
+        return define, liveUse
+
+    # the blocks unreachable from the entry are appended in the order of their ids
+    def postorder(self, graph: CFG) -> list[int]:
+        order = []
+        visited = [False] * len(graph.nodes)
+        for root in range(len(graph.nodes)):
+            if visited[root]:
+                continue
+            visited[root] = True
+            stack = [(root, iter(sorted(graph.getSucc(root))))]
+            while stack:
+                (id, succs) = stack[-1]
+                for next in succs:
+                    if not visited[next]:
+                        visited[next] = True
+                        stack.append((next, iter(sorted(graph.getSucc(next)))))
+                        break
+                else:
+                    order.append(id)
+                    stack.pop()
+        return order
+
+    def toSet(self, bitset: int, indexes: list[int]) -> set[int]:
+        # the binary digits from the lowest bit to the highest bit
+        digits = bin(bitset)[:1:-1]
+        result = set()
+        # skip the runs of zeros with find, the sets are sparse in a large function
+        bit = digits.find("1")
+        while bit >= 0:
+            result.add(indexes[bit])
+            bit = digits.find("1", bit + 1)
+        return result
@@ -0,0 +1,245 @@
+from typing import Optional
+
+from backend.dataflow.basicblock import BasicBlock, BlockKind
+from backend.dataflow.cfg import CFG
+from backend.dataflow.loc import Loc
+from backend.interp.profile import FuncProfile, Profile
+from utils.label.blocklabel import BlockLabel
+from utils.label.label import Label, LabelKind
+from utils.riscv import Riscv
+
+"""
+BlockLayout: reorders the basic blocks of a function before they are emitted
+
+The blocks are laid out so that control mostly falls through from one block to the
+next: the edges of the CFG are visited from the heaviest, and an edge u -> v joins the
+chain ending with u and the chain starting with v. When the back edge of a loop closes
+a chain, the chain is rotated so that the block testing the condition of the loop is at
+its bottom, and the jump back to the top of the loop falls through instead.
+
+The weight of an edge is its execution count in the profile of the function, taken on
+the TAC by TACInterpreter, or else LOOP_WEIGHT to the power of the depth of the loops
+it is in. The blocks are only reordered, the instrs are fixed up to keep the semantics:
+a jump to the next block is removed, a conditional branch to the next block is inverted,
+and a block which falls through to a block not next to it any more gets a jump. The
+instrs of a block are still followed by the epilogue of the function when it is last.
+
+1. transform：对函数的 CFG 重新排列基本块，修正跳转指令，返回新的 CFG（可能新增只含跳转的基本块）
+2. buildChains：按边的权重从大到小将基本块连成链，并在链构成循环时旋转循环
+3. fixUp：按新的顺序删除多余的跳转、翻转条件跳转、补充必要的跳转
+"""
+
+# how many times the body of a loop is assumed to run, without a profile
+LOOP_WEIGHT = 10
+
+
+class BlockLayout:
+    def __init__(self, profile: Optional[Profile] = None) -> None:
+        self.profile = profile
+
+    def transform(self, graph: CFG, entry: Label) -> CFG:
+        if not graph.nodes:
+            return graph
+        self.entry = entry
+        self.nodes = list(graph.nodes)
+        n = len(self.nodes)
+
+        # None is the epilogue of the function, which follows the last block
+        labelsToBBs = {bb.label: bb.id for bb in self.nodes if bb.label is not None}
+        self.fallthroughs: list[Optional[int]] = [
+            id + 1 if id + 1 < n else None for id in range(n)
+        ]
+        # the block a jump or a conditional branch ending each block goes to
+        self.targets: list[Optional[int]] = [None] * n
+        self.succs: list[list[int]] = []
+        for bb in self.nodes:
+            succs = []
+            if bb.kind in (BlockKind.END_BY_JUMP, BlockKind.END_BY_COND_JUMP):
+                self.targets[bb.id] = labelsToBBs[bb.getLastInstr().label]
+                succs.append(self.targets[bb.id])
+            if bb.kind in (BlockKind.CONTINUOUS, BlockKind.END_BY_COND_JUMP):
+                if self.fallthroughs[bb.id] is not None:
+                    succs.append(self.fallthroughs[bb.id])
+            self.succs.append(sorted(set(succs)))
+
+        # the reachable blocks, the back edges and the loop depth of each block
+        domTree = graph.getDominatorTree()
+        loopNest = graph.getLoopNest()
+        self.reachable = [domTree.isReachable(id) for id in range(n)]
+        self.preds = domTree.preds
+        self.backEdges = loopNest.backEdges
+        self.depths = loopNest.depths
+
+        funcProfile = self.profileOf(entry.name)
+        if funcProfile is not None:
+            self.weight = funcProfile.edgeCount
+        else:
+            self.weight = lambda u, v: LOOP_WEIGHT ** min(
+                self.depths[u], self.depths[v]
+            )
+
+        order = self.place(self.buildChains(), funcProfile)
+        return self.fixUp(graph, order)
+
+    # the profile of the function, if it is taken on the same blocks
+    def profileOf(self, name: str) -> Optional[FuncProfile]:
+        if self.profile is None or name not in self.profile.funcs:
+            return None
+        funcProfile = self.profile.funcs[name]
+        labels = [None if bb.label is None else bb.label.name for bb in self.nodes]
+        return funcProfile if funcProfile.labels == labels else None
+
+    def buildChains(self) -> list[list[int]]:
+        edges = [
+            (u, v)
+            for u in range(len(self.nodes))
+            if self.reachable[u]
+            for v in self.succs[u]
+        ]
+        # at the same weight, a back edge is the last to be laid out as a fall through
+        # so that it closes the chain of its loop, and the original order is preferred
+        edges.sort(
+            key=lambda e: (
+                -self.weight(*e),
+                e in self.backEdges,
+                e[1] != self.fallthroughs[e[0]],
+                e,
+            )
+        )
+
+        chains = [[id] for id in range(len(self.nodes))]
+        chainOf = list(range(len(self.nodes)))
+        for (u, v) in edges:
+            chain = chains[chainOf[u]]
+            if chain[-1] != u:
+                continue
+            if chainOf[v] == chainOf[u]:
+                if chain[0] == v:
+                    self.rotate(chain)
+                continue
+            # the entry block stays at the start of the function
+            if chains[chainOf[v]][0] != v or v == 0:
+                continue
+
+            other = chains[chainOf[v]]
+            chains[chainOf[v]] = None
+            for id in other:
+                chainOf[id] = chainOf[u]
+            chain += other
+
+        return [chain for chain in chains if chain is not None]
+
+    # the last block of a loop chain jumps back to the first one, rotate the chain so
+    # that a conditional branch leaving the loop comes last, and the jump falls through
+    def rotate(self, chain: list[int]) -> None:
+        (header, latch) = (chain[0], chain[-1])
+        if header == 0 or self.nodes[latch].kind is not BlockKind.END_BY_JUMP:
+            return
+
+        inside = set(chain)
+        entering = sum(
+            self.weight(u, header) for u in self.preds[header] if u not in inside
+        )
+        if self.weight(latch, header) <= entering:
+            return
+
+        best = None
+        for (index, u) in enumerate(chain[:-1]):
+            if self.nodes[u].kind is not BlockKind.END_BY_COND_JUMP:
+                continue
+            exits = [v for v in self.succs[u] if v not in inside]
+            if not exits:
+                continue
+            exiting = sum(self.weight(u, v) for v in exits)
+            if best is None or exiting > best[0]:
+                best = (exiting, index)
+
+        if best is not None:
+            index = best[1]
+            chain[:] = chain[index + 1 :] + chain[: index + 1]
+
+    # the chain of the entry block comes first, then the other chains in the original
+    # order, the blocks which never ran in the profile last
+    def place(
+        self, chains: list[list[int]], funcProfile: Optional[FuncProfile]
+    ) -> list[int]:
+        def key(chain: list[int]):
+            if chain[0] == 0:
+                return (0, 0, 0)
+            if not self.reachable[chain[0]]:
+                return (2, 0, min(chain))
+            cold = funcProfile is not None and not any(
+                funcProfile.blockCounts[id] for id in chain
+            )
+            return (1, cold, min(chain))
+
+        order = []
+        for chain in sorted(chains, key=key):
+            for id in chain:
+                bb = self.nodes[id]
+                # nothing jumps to an unreachable block without a label
+                if self.reachable[id] or bb.label is not None or not bb.isEmpty():
+                    order.append(id)
+        return order
+
+    def fixUp(self, graph: CFG, order: list[int]) -> CFG:
+        edges = list(graph.edges)
+        layout = []
+        for (position, id) in enumerate(order):
+            bb = self.nodes[id]
+            next = order[position + 1] if position + 1 < len(order) else None
+            fallthrough = self.fallthroughs[id]
+            layout.append(id)
+            # where control goes after an unreachable block does not matter
+            if not self.reachable[id]:
+                continue
+
+            if bb.kind is BlockKind.END_BY_JUMP:
+                if self.targets[id] == next:
+                    self.dropLastInstr(bb)
+            elif bb.kind is BlockKind.END_BY_RETURN:
+                if next is None:
+                    self.dropLastInstr(bb)
+            elif bb.kind is BlockKind.CONTINUOUS:
+                if fallthrough != next:
+                    self.appendJump(bb, fallthrough)
+            elif fallthrough != next:
+                instr = bb.getLastInstr()
+                if self.targets[id] == next:
+                    bb.locs[-1] = Loc(instr.inverse(self.labelOf(fallthrough)))
+                else:
+                    # a block holding only the jump to the fall through
+                    trampoline = BasicBlock(
+                        BlockKind.CONTINUOUS, len(self.nodes), None, []
+                    )
+                    self.nodes.append(trampoline)
+                    self.appendJump(trampoline, fallthrough)
+                    layout.append(trampoline.id)
+                    edges = [e for e in edges if e != (id, fallthrough)]
+                    edges.append((id, trampoline.id))
+                    if fallthrough is not None:
+                        edges.append((trampoline.id, fallthrough))
+
+        newGraph = CFG(self.nodes, edges)
+        newGraph.order = layout
+        return newGraph
+
+    def dropLastInstr(self, bb: BasicBlock) -> None:
+        bb.locs.pop()
+        bb.kind = BlockKind.CONTINUOUS
+
+    def appendJump(self, bb: BasicBlock, target: Optional[int]) -> None:
+        if target is None:
+            bb.locs.append(Loc(Riscv.JumpToEpilogue(self.entry)))
+            bb.kind = BlockKind.END_BY_RETURN
+        else:
+            bb.locs.append(Loc(Riscv.Jump(self.labelOf(target))))
+            bb.kind = BlockKind.END_BY_JUMP
+
+    def labelOf(self, id: Optional[int]) -> Label:
+        if id is None:
+            return Label(LabelKind.TEMP, self.entry.name + Riscv.EPILOGUE_SUFFIX)
+        bb = self.nodes[id]
+        if bb.label is None:
+            bb.label = BlockLabel("_{}_{}".format(self.entry.name, id))
+        return bb.label
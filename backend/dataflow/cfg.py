@@ -6,6 +6,11 @@ CFG: Control Flow Graph
 nodes: sequence of basicblock
 edges: sequence of edge(u,v), which represents after block u is executed, block v may be executed
 links: links[u][0] represent the Prev of u, links[u][1] represent the Succ of u,
+order: the ids of the blocks in the order they are emitted, see BlockLayout
+
+The DominatorTree and the LoopNest of the graph are built on demand and kept until the
+blocks or the edges change, through addBlock/addEdge/removeEdge. Whoever changes nodes
+or edges directly must call invalidate.
 """
 
 
@@ -15,6 +20,7 @@ class CFG:
         self.edges = edges
 
         self.links = []
+        self.order = list(range(len(nodes)))
 
         for i in range(len(nodes)):
             self.links.append((set(), set()))
@@ -23,6 +29,9 @@ class CFG:
             self.links[u][1].add(v)
             self.links[v][0].add(u)
 
+        self.dominatorTree = None
+        self.loopNest = None
+
     def getBlock(self, id):
         return self.nodes[id]
 
@@ -38,5 +47,42 @@ class CFG:
     def getOutDegree(self, id):
         return len(self.links[id][1])
 
+    def addBlock(self, bb: BasicBlock) -> None:
+        self.nodes.append(bb)
+        self.links.append((set(), set()))
+        self.invalidate()
+
+    def addEdge(self, u: int, v: int) -> None:
+        self.edges.append((u, v))
+        self.links[u][1].add(v)
+        self.links[v][0].add(u)
+        self.invalidate()
+
+    def removeEdge(self, u: int, v: int) -> None:
+        self.edges = [e for e in self.edges if e != (u, v)]
+        self.links[u][1].discard(v)
+        self.links[v][0].discard(u)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        self.dominatorTree = None
+        self.loopNest = None
+
+    def getDominatorTree(self):
+        # imported here, as the analyses import CFG
+        from backend.dataflow.dominatortree import DominatorTree
+
+        if self.dominatorTree is None:
+            self.dominatorTree = DominatorTree(self)
+        return self.dominatorTree
+
+    def getLoopNest(self):
+        from backend.dataflow.loopnest import LoopNest
+
+        if self.loopNest is None:
+            self.loopNest = LoopNest(self, self.getDominatorTree())
+        return self.loopNest
+
+    # the blocks in the order they are emitted
     def iterator(self):
-        return iter(self.nodes)
+        return (self.nodes[id] for id in self.order)
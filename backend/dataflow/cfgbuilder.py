@@ -56,7 +56,7 @@ class CFGBuilder:
                 if self.labelsToBBs.get(bb.getLastInstr().label) is None:
                     raise NullPointerException
                 edges.append((bb.id, self.labelsToBBs.get(bb.getLastInstr().label)))
-                if now < len(self.bbs) - 1:
+                if now < len(self.bbs):
                     edges.append((bb.id, bb.id + 1))
             elif bb.kind is BlockKind.END_BY_RETURN:
                 pass
@@ -0,0 +1,129 @@
+from typing import Optional
+
+from backend.dataflow.cfg import CFG
+
+"""
+DominatorTree: the dominators of the basic blocks of a CFG, block 0 being the entry
+
+A block u dominates a block v if every path from the entry to v goes through u. The
+immediate dominators are found with the iterative algorithm of Cooper, Harvey and
+Kennedy ("A Simple, Fast Dominance Algorithm") on the reverse postorder of the blocks,
+and the dominance frontiers with the runners of the same paper. Only the reachable
+blocks are in the tree, an unreachable block has no dominator.
+
+Build it with CFG.getDominatorTree, which keeps it until the CFG changes.
+
+1. rpo：可达基本块的逆后序
+2. idom：各基本块的直接支配者，入口为其自身，不可达的为 None
+3. children：支配树中各基本块的子结点
+4. preds：各基本块的可达前驱
+5. dominates/getFrontiers：支配关系的查询与支配边界
+"""
+
+
+class DominatorTree:
+    def __init__(self, graph: CFG) -> None:
+        n = len(graph.nodes)
+        self.rpo = self.reversePostorder(graph) if n else []
+        self.idom = self.immediateDominators(graph)
+        self.preds: list[list[int]] = [
+            [p for p in sorted(graph.getPrev(id)) if self.idom[p] is not None]
+            for id in range(n)
+        ]
+
+        self.children: list[list[int]] = [[] for _ in range(n)]
+        for id in self.rpo[1:]:
+            self.children[self.idom[id]].append(id)
+
+        # the preorder and the postorder numbers of the blocks in the tree, u dominates
+        # v iff the subtree of u, numbered from pre[u] to post[u], contains v
+        self.pre = [-1] * n
+        self.post = [-1] * n
+        counter = 0
+        worklist = [(0, False)] if n else []
+        while worklist:
+            (id, done) = worklist.pop()
+            if done:
+                self.post[id] = counter - 1
+                continue
+            self.pre[id] = counter
+            counter += 1
+            worklist.append((id, True))
+            for child in reversed(self.children[id]):
+                worklist.append((child, False))
+
+        self.frontiers: Optional[list[set[int]]] = None
+
+    @staticmethod
+    def reversePostorder(graph: CFG) -> list[int]:
+        postorder = []
+        visited = {0}
+        stack = [(0, iter(sorted(graph.getSucc(0))))]
+        while stack:
+            (u, succs) = stack[-1]
+            for v in succs:
+                if v not in visited:
+                    visited.add(v)
+                    stack.append((v, iter(sorted(graph.getSucc(v)))))
+                    break
+            else:
+                postorder.append(u)
+                stack.pop()
+        postorder.reverse()
+        return postorder
+
+    def immediateDominators(self, graph: CFG) -> list[Optional[int]]:
+        index = {id: i for (i, id) in enumerate(self.rpo)}
+        idom: list[Optional[int]] = [None] * len(graph.nodes)
+        if not self.rpo:
+            return idom
+        idom[0] = 0
+
+        changed = True
+        while changed:
+            changed = False
+            for id in self.rpo[1:]:
+                new = None
+                for p in graph.getPrev(id):
+                    if idom[p] is None:
+                        continue
+                    if new is None:
+                        new = p
+                        continue
+                    # intersect: walk up from the deeper one until the two meet
+                    (a, b) = (p, new)
+                    while a != b:
+                        while index[a] > index[b]:
+                            a = idom[a]
+                        while index[b] > index[a]:
+                            b = idom[b]
+                    new = a
+                if idom[id] != new:
+                    idom[id] = new
+                    changed = True
+        return idom
+
+    def isReachable(self, id: int) -> bool:
+        return self.idom[id] is not None
+
+    # whether u dominates v, a block dominates itself
+    def dominates(self, u: int, v: int) -> bool:
+        if self.idom[u] is None or self.idom[v] is None:
+            return False
+        return self.pre[u] <= self.pre[v] <= self.post[u]
+
+    # the blocks where the dominance of each block ends
+    def getFrontiers(self) -> list[set[int]]:
+        if self.frontiers is not None:
+            return self.frontiers
+
+        self.frontiers = [set() for _ in self.idom]
+        for id in self.rpo:
+            if len(self.preds[id]) < 2:
+                continue
+            for p in self.preds[id]:
+                runner = p
+                while runner != self.idom[id]:
+                    self.frontiers[runner].add(id)
+                    runner = self.idom[runner]
+        return self.frontiers
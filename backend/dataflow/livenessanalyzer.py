@@ -48,13 +48,20 @@ class LivenessAnalyzer:
                     bb.liveUse.add(read)
             bb.define.update(loc.instr.getWritten())
 
+    # only record the difference between liveIn and liveOut of each loc
+    # use bb.liveInAt/liveOutAt to get the full sets
     def analyzeLivenessForEachLocIn(self, bb: BasicBlock):
+        bb.cursorLive = None
         liveOut = bb.liveOut.copy()
-        for loc in bb.backwardIterator():
-            loc.liveOut = liveOut.copy()
+        for index in range(len(bb.locs) - 1, -1, -1):
+            loc = bb.locs[index]
+            loc.index = index
+            read = loc.instr.getRead()
+            written = loc.instr.getWritten()
 
-            for v in loc.instr.getWritten():
-                liveOut.discard(v)
+            loc.born = tuple(v for v in written if v in liveOut and v not in read)
+            loc.dead = tuple({v for v in read if v not in liveOut})
 
-            liveOut.update(loc.instr.getRead())
-            loc.liveIn = liveOut.copy()
+            for v in written:
+                liveOut.discard(v)
+            liveOut.update(read)
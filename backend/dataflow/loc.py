@@ -2,11 +2,19 @@ from utils.tac.tacinstr import TACInstr
 
 """
 Loc: line of code
+
+To save memory, a Loc does not store its own liveIn/liveOut sets, only the difference
+between them, which is usually tiny. Use BasicBlock.liveInAt/liveOutAt to query them.
+
+index: the position of the loc in its basicblock
+ born: the temps written by the instr which are live after it (in liveOut but not in liveIn)
+ dead: the temps whose last use is the instr (in liveIn but not in liveOut)
 """
 
 
 class Loc:
     def __init__(self, instr: TACInstr) -> None:
         self.instr = instr
-        self.liveIn: set[int] = set()
-        self.liveOut: set[int] = set()
+        self.index = 0
+        self.born: tuple[int, ...] = ()
+        self.dead: tuple[int, ...] = ()
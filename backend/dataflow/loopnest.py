@@ -0,0 +1,82 @@
+from typing import Optional
+
+from backend.dataflow.cfg import CFG
+from backend.dataflow.dominatortree import DominatorTree
+
+"""
+LoopNest: the natural loops of a CFG and how they nest
+
+An edge latch -> header is a back edge if the header dominates the latch. The natural
+loop of the header is made of the header and the blocks reaching one of its latches
+without going through the header, the back edges to the same header giving one loop.
+Two natural loops are either disjoint or one contains the other, so they form a forest.
+A retreating edge into the middle of an irreducible loop is not a back edge, TACGen
+never produces such a loop.
+
+Build it with CFG.getLoopNest, which keeps it until the CFG changes.
+
+1. Loop：一个自然循环，header 为循环头，latches 为跳回循环头的基本块，body 含循环头
+2. loops：所有循环，外层循环在其内层循环之前
+3. loopOf/depths：各基本块所在的最内层循环，以及包含它的循环个数
+"""
+
+
+class Loop:
+    def __init__(self, header: int) -> None:
+        self.header = header
+        self.latches: list[int] = []
+        self.body = {header}
+        self.parent: Optional[Loop] = None
+        self.children: list[Loop] = []
+        self.depth = 1
+
+    def contains(self, id: int) -> bool:
+        return id in self.body
+
+    def __repr__(self) -> str:
+        return "Loop(header={}, depth={}, body={})".format(
+            self.header, self.depth, sorted(self.body)
+        )
+
+
+class LoopNest:
+    def __init__(self, graph: CFG, domTree: DominatorTree) -> None:
+        n = len(graph.nodes)
+        self.backEdges: set[tuple[int, int]] = set()
+
+        loopsByHeader: dict[int, Loop] = {}
+        for u in domTree.rpo:
+            for v in sorted(graph.getSucc(u)):
+                if domTree.dominates(v, u):
+                    self.backEdges.add((u, v))
+                    loop = loopsByHeader.setdefault(v, Loop(v))
+                    loop.latches.append(u)
+
+        for loop in loopsByHeader.values():
+            worklist = list(loop.latches)
+            while worklist:
+                u = worklist.pop()
+                if u not in loop.body:
+                    loop.body.add(u)
+                    worklist.extend(domTree.preds[u])
+
+        # from the outermost loops, each block ends up in its innermost loop
+        self.loops = sorted(
+            loopsByHeader.values(), key=lambda loop: (-len(loop.body), loop.header)
+        )
+        self.loopOf: list[Optional[Loop]] = [None] * n
+        for loop in self.loops:
+            loop.parent = self.loopOf[loop.header]
+            if loop.parent is not None:
+                loop.parent.children.append(loop)
+                loop.depth = loop.parent.depth + 1
+            for u in loop.body:
+                self.loopOf[u] = loop
+
+        self.depths = [0 if loop is None else loop.depth for loop in self.loopOf]
+
+    def getDepth(self, id: int) -> int:
+        return self.depths[id]
+
+    def isBackEdge(self, u: int, v: int) -> bool:
+        return (u, v) in self.backEdges
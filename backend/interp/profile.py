@@ -0,0 +1,92 @@
+import json
+from typing import Optional
+
+"""
+Profile: how many times each basic block and each edge of a function was executed
+
+The blocks are those built by CFGBuilder from the TAC of the function. Instr selection
+maps each TAC instr to native instrs without adding or removing labels and jumps, so
+the CFG of the native instrs has the same blocks with the same ids, and a profile
+taken on the TAC can be used by the passes working on the native instrs. The labels of
+the blocks are kept to check that the profile still matches the CFG.
+
+1. FuncProfile：一个函数的各基本块执行次数、各条边的执行次数，以及由此得到的每条指令的执行次数
+2. Profile：整个程序的 FuncProfile，可以与 JSON 互相转换
+"""
+
+
+class FuncProfile:
+    def __init__(
+        self, name: str, labels: list[Optional[str]], sizes: list[int]
+    ) -> None:
+        self.name = name
+        # the label and the number of instrs of each block
+        self.labels = labels
+        self.sizes = sizes
+        self.blockCounts = [0] * len(labels)
+        self.edgeCounts: dict[tuple[int, int], int] = {}
+
+    # the times the instrs of the function were executed, in the order of the blocks
+    def instrCounts(self) -> list[int]:
+        counts = []
+        for (size, count) in zip(self.sizes, self.blockCounts):
+            counts += [count] * size
+        return counts
+
+    def instrCount(self) -> int:
+        return sum(size * count for (size, count) in zip(self.sizes, self.blockCounts))
+
+    def edgeCount(self, u: int, v: int) -> int:
+        return self.edgeCounts.get((u, v), 0)
+
+    def toJson(self) -> dict:
+        return {
+            "blocks": [
+                {"id": id, "label": label, "instrs": size, "count": count}
+                for (id, (label, size, count)) in enumerate(
+                    zip(self.labels, self.sizes, self.blockCounts)
+                )
+            ],
+            "edges": [
+                [u, v, count] for ((u, v), count) in sorted(self.edgeCounts.items())
+            ],
+        }
+
+    @staticmethod
+    def fromJson(name: str, data: dict) -> "FuncProfile":
+        blocks = data["blocks"]
+        profile = FuncProfile(
+            name,
+            [block["label"] for block in blocks],
+            [block["instrs"] for block in blocks],
+        )
+        profile.blockCounts = [block["count"] for block in blocks]
+        profile.edgeCounts = {(u, v): count for (u, v, count) in data["edges"]}
+        return profile
+
+
+class Profile:
+    def __init__(self) -> None:
+        self.funcs: dict[str, FuncProfile] = {}
+
+    def instrCount(self) -> int:
+        return sum(func.instrCount() for func in self.funcs.values())
+
+    def toJson(self) -> dict:
+        return {"functions": {name: f.toJson() for (name, f) in self.funcs.items()}}
+
+    @staticmethod
+    def fromJson(data: dict) -> "Profile":
+        profile = Profile()
+        for (name, func) in data["functions"].items():
+            profile.funcs[name] = FuncProfile.fromJson(name, func)
+        return profile
+
+    def save(self, fileName: str) -> None:
+        with open(fileName, "w") as f:
+            json.dump(self.toJson(), f, indent=1)
+
+    @staticmethod
+    def load(fileName: str) -> "Profile":
+        with open(fileName) as f:
+            return Profile.fromJson(json.load(f))
@@ -0,0 +1,217 @@
+from typing import Callable, Optional
+
+from backend.dataflow.basicblock import BasicBlock, BlockKind
+from backend.dataflow.cfg import CFG
+from backend.dataflow.cfgbuilder import CFGBuilder
+from backend.interp.profile import FuncProfile, Profile
+from utils.error import SimulatorError
+from utils.label.label import Label
+from utils.tac.tacfunc import TACFunc
+from utils.tac.tacinstr import *
+from utils.tac.tacop import BinaryOp, CondBranchOp, UnaryOp
+from utils.tac.tacprog import TACProg
+
+"""
+TACInterpreter: runs a TACProg directly, and records a Profile of the run
+
+The values are 32-bit, and the operations wrap around and behave as the instrs the
+backend selects for them, e.g. a division by zero gives -1 as `div` does, so the return
+value is the same as the one of the generated code, which makes the interpreter an
+oracle to check the backend against. Reading a temp before it is written is an error.
+
+The function is split into basic blocks by CFGBuilder, and every instr is turned into a
+closure once, before the run. Each block counts its executions, and each edge between
+two blocks counts how many times control went along it. The TAC may be in SSA form: the
+phis at the start of a block take the sources of the edge control comes from, at once.
+
+1. run：从 entry 函数开始执行，返回其返回值和 Profile
+2. compile：把一个基本块中的顺序执行的指令转换为闭包
+"""
+
+MASK = 0xFFFF_FFFF
+
+
+def s32(x: int) -> int:
+    x &= MASK
+    return x - (1 << 32) if x & 0x8000_0000 else x
+
+
+def div(x: int, y: int) -> int:
+    if y == 0:
+        return -1
+    q = abs(x) // abs(y)
+    return q if (x < 0) == (y < 0) else -q
+
+
+def rem(x: int, y: int) -> int:
+    if y == 0:
+        return x
+    return x - y * div(x, y)
+
+
+UNARY_OPS: dict[UnaryOp, Callable[[int], int]] = {
+    UnaryOp.NEG: lambda x: -x,
+    UnaryOp.NOT: lambda x: ~x,
+    UnaryOp.SEQZ: lambda x: int(x == 0),
+    UnaryOp.SNEZ: lambda x: int(x != 0),
+}
+
+BINARY_OPS: dict[BinaryOp, Callable[[int, int], int]] = {
+    BinaryOp.ADD: lambda x, y: x + y,
+    BinaryOp.SUB: lambda x, y: x - y,
+    BinaryOp.MUL: lambda x, y: x * y,
+    BinaryOp.DIV: div,
+    BinaryOp.REM: rem,
+    BinaryOp.EQU: lambda x, y: int(x == y),
+    BinaryOp.NEQ: lambda x, y: int(x != y),
+    BinaryOp.SLT: lambda x, y: int(x < y),
+    BinaryOp.LEQ: lambda x, y: int(x <= y),
+    BinaryOp.SGT: lambda x, y: int(x > y),
+    BinaryOp.GEQ: lambda x, y: int(x >= y),
+    BinaryOp.AND: lambda x, y: int(x != 0 and y != 0),
+    BinaryOp.OR: lambda x, y: int(x != 0 or y != 0),
+}
+
+Closure = Callable[[list], None]
+
+
+class TACInterpreter:
+    def __init__(self, maxSteps: Optional[int] = None) -> None:
+        # the maximum number of blocks to execute
+        self.maxSteps = maxSteps
+
+    def run(
+        self, prog: TACProg, entry: str = "main"
+    ) -> tuple[Optional[int], Profile]:
+        funcs = {func.entry.name: func for func in prog.funcs}
+        if entry not in funcs:
+            raise SimulatorError("no function '{}'".format(entry))
+
+        profile = Profile()
+        value = self.runFunc(funcs[entry], profile)
+        return value, profile
+
+    def runFunc(self, func: TACFunc, profile: Profile) -> Optional[int]:
+        cfg: CFG = CFGBuilder().buildFrom(func.getInstrSeq())
+        blocks = [bb for bb in cfg.iterator()]
+        labelsToBBs = {bb.label: bb.id for bb in blocks if bb.label is not None}
+
+        funcProfile = FuncProfile(
+            func.entry.name,
+            [None if bb.label is None else bb.label.name for bb in blocks],
+            [len(bb.locs) for bb in blocks],
+        )
+        profile.funcs[func.entry.name] = funcProfile
+        blockCounts = funcProfile.blockCounts
+        edgeCounts = funcProfile.edgeCounts
+
+        codes = [self.compile(bb) for bb in blocks]
+        phis = [
+            [loc.instr for loc in bb.iterator() if isinstance(loc.instr, Phi)]
+            for bb in blocks
+        ]
+        temps: list = [None] * func.getUsedTempCount()
+
+        id = 0
+        prev = None
+        steps = 0
+        while True:
+            if phis[id]:
+                self.enter(phis[id], blocks[prev].label, temps)
+            blockCounts[id] += 1
+            steps += 1
+            if self.maxSteps is not None and steps > self.maxSteps:
+                raise SimulatorError(
+                    "more than {} blocks executed".format(self.maxSteps)
+                )
+
+            bb = blocks[id]
+            try:
+                for closure in codes[id]:
+                    closure(temps)
+                # the jump or return ending the block is not compiled, check its srcs
+                if bb.kind is not BlockKind.CONTINUOUS:
+                    for src in bb.getLastInstr().srcs:
+                        temps[src.index] + 0
+            except TypeError:
+                raise SimulatorError(
+                    "a temp is read before written in {}".format(func.entry.name)
+                )
+
+            if bb.kind is BlockKind.END_BY_RETURN:
+                instr = bb.getLastInstr()
+                return None if instr.value is None else temps[instr.value.index]
+            elif bb.kind is BlockKind.END_BY_JUMP:
+                next = labelsToBBs[bb.getLastInstr().target]
+            elif bb.kind is BlockKind.END_BY_COND_JUMP:
+                instr = bb.getLastInstr()
+                if (temps[instr.cond.index] == 0) == (instr.op == CondBranchOp.BEQ):
+                    next = labelsToBBs[instr.target]
+                else:
+                    next = id + 1
+            else:
+                next = id + 1
+
+            if next >= len(blocks):
+                raise SimulatorError(
+                    "control reaches the end of {}".format(func.entry.name)
+                )
+            edgeCounts[(id, next)] = edgeCounts.get((id, next), 0) + 1
+            (prev, id) = (id, next)
+
+    # the phis of a block entered from the block with the label
+    def enter(self, phis: list[Phi], label: Label, temps: list) -> None:
+        values = []
+        for phi in phis:
+            src = phi.sources.get(label)
+            values.append(None if src is None else temps[src.index])
+        for (phi, value) in zip(phis, values):
+            temps[phi.dst.index] = value
+
+    def compile(self, bb: BasicBlock) -> list[Closure]:
+        closures = []
+        for loc in bb.locs:
+            instr = loc.instr
+            if isinstance(instr, LoadImm4):
+                closures.append(self.loadImm(instr.dst.index, s32(instr.value)))
+            elif isinstance(instr, Assign):
+                closures.append(self.assign(instr.dst.index, instr.src.index))
+            elif isinstance(instr, Unary):
+                op = UNARY_OPS[instr.op]
+                closures.append(self.unary(op, instr.dst.index, instr.operand.index))
+            elif isinstance(instr, Binary):
+                op = BINARY_OPS[instr.op]
+                closures.append(
+                    self.binary(op, instr.dst.index, instr.lhs.index, instr.rhs.index)
+                )
+            elif isinstance(instr, Phi):
+                pass
+            elif instr.isSequential() and instr.dsts:
+                raise SimulatorError("cannot interpret '{}'".format(instr))
+        return closures
+
+    def loadImm(self, dst: int, value: int) -> Closure:
+        def closure(temps: list) -> None:
+            temps[dst] = value
+
+        return closure
+
+    def assign(self, dst: int, src: int) -> Closure:
+        def closure(temps: list) -> None:
+            temps[dst] = temps[src] + 0
+
+        return closure
+
+    def unary(self, op: Callable[[int], int], dst: int, src: int) -> Closure:
+        def closure(temps: list) -> None:
+            temps[dst] = s32(op(temps[src]))
+
+        return closure
+
+    def binary(
+        self, op: Callable[[int, int], int], dst: int, lhs: int, rhs: int
+    ) -> Closure:
+        def closure(temps: list) -> None:
+            temps[dst] = s32(op(temps[lhs], temps[rhs]))
+
+        return closure
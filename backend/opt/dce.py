@@ -0,0 +1,64 @@
+from backend.dataflow.basicblock import BasicBlock
+from backend.dataflow.bitvectorlivenessanalyzer import BitVectorLivenessAnalyzer
+from backend.opt.tacpass import TACPass
+from utils.tac.tacfunc import TACFunc
+from utils.tac.tacinstr import *
+
+"""
+DCE: dead code elimination over the TAC of a function
+
+The unreachable blocks are removed first, e.g. the instrs after a return or a break,
+which CFGBuilder puts into blocks of their own. Then the liveness of the temps is
+computed by BitVectorLivenessAnalyzer, and an instr without side effects is removed if
+none of the temps it writes is live after it. This removes the temps never read, and
+the stores to a variable which is written again before being read. The operands of a
+removed instr may become dead in turn, so the liveness is computed again, until no
+instr is removed.
+
+The instrs without side effects are the ones computing a value only. A division by zero
+does not trap on RISC-V, so DIV and REM are removed as well.
+
+1. 删除不可达的基本块
+2. 根据活跃变量分析反复删除结果不活跃的无副作用指令，直到不动点
+"""
+
+PURE_INSTRS = (LoadImm4, Unary, Binary, Assign, Phi)
+
+
+class DCE(TACPass):
+    def transform(self, func: TACFunc) -> None:
+        graph = self.buildCFG(func)
+        # the liveness flows backwards, so the unreachable blocks, whose predecessors
+        # are unreachable as well, never make a temp of the other blocks live
+        domTree = graph.getDominatorTree()
+        graph.order = [id for id in graph.order if domTree.isReachable(id)]
+
+        analyzer = BitVectorLivenessAnalyzer()
+        changed = True
+        while changed:
+            liveOut = analyzer.computeLiveOut(graph)
+            changed = False
+            for bb in graph.iterator():
+                changed |= self.sweep(bb, liveOut[bb.id])
+        self.writeBack(func, graph)
+
+    # remove the dead instrs of a block, from the last one, whether any was removed
+    def sweep(self, bb: BasicBlock, liveOut: set[int]) -> bool:
+        live = set(liveOut)
+        locs = []
+        for loc in reversed(bb.locs):
+            instr = loc.instr
+            written = instr.getWritten()
+            if isinstance(instr, PURE_INSTRS) and not any(
+                index in live for index in written
+            ):
+                continue
+            live.difference_update(written)
+            live.update(instr.getRead())
+            locs.append(loc)
+
+        if len(locs) == len(bb.locs):
+            return False
+        locs.reverse()
+        bb.locs = locs
+        return True
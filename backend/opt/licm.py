@@ -0,0 +1,158 @@
+from backend.dataflow.basicblock import BasicBlock, BlockKind
+from backend.dataflow.dominatortree import DominatorTree
+from backend.dataflow.loc import Loc
+from backend.dataflow.loopnest import Loop
+from backend.interp.tacinterpreter import s32
+from backend.opt.tacpass import TACPass
+from utils.tac.tacfunc import TACFunc
+from utils.tac.tacinstr import *
+from utils.tac.tacop import BinaryOp
+
+"""
+LICM: loop-invariant code motion over the TAC of a function, before SSAConstruction
+
+Every natural loop is given a preheader, a block which the edges entering the loop go
+through, and the invariant instrs of the loop are moved to it, from the inner loops to
+the outer ones. An instr is invariant if it is a LoadImm4, Unary or Binary, and none of
+the temps it reads is written in the loop, except by other invariant instrs. The temp
+it writes must have no other definition, and each read of the temp must come after the
+instr, so that it gets the same value wherever it is computed.
+
+An invariant instr may be moved out of a path that never runs it, e.g. out of an if in
+the loop or out of a loop that runs zero times, which is fine for the pure operations,
+but not for a DIV/REM which may divide by zero. They are moved only if the divisor is
+a nonzero constant, or if they run whenever the loop is entered, i.e. their block
+dominates every block leaving the loop or jumping back to its header.
+
+1. insertPreheader：为循环创建前置基本块（唯一从循环外进入循环头的前驱可直接作为前置块）
+2. hoist：把循环不变的指令移到前置块的末尾
+"""
+
+DIVISIONS = (BinaryOp.DIV, BinaryOp.REM)
+
+
+class LICM(TACPass):
+    def transform(self, func: TACFunc) -> None:
+        graph = self.buildCFG(func)
+        self.func = func
+        self.graph = graph
+        loops = graph.getLoopNest().loops
+        if not loops:
+            return
+
+        # a preheader only changes the edges into its header, so the other loops and
+        # their entering edges are still the same
+        domTree = graph.getDominatorTree()
+        preheaders = {
+            loop.header: self.insertPreheader(loop, domTree) for loop in loops
+        }
+
+        # the preheaders changed the graph, but not the loops
+        domTree = graph.getDominatorTree()
+        self.findDefs(domTree)
+        for loop in reversed(graph.getLoopNest().loops):
+            self.hoist(loop, graph.getBlock(preheaders[loop.header]), domTree)
+        self.writeBack(func, graph)
+
+    # the id of the block placed before the header of loop
+    def insertPreheader(self, loop: Loop, domTree: DominatorTree) -> int:
+        graph = self.graph
+        header = graph.getBlock(loop.header)
+        entering = [p for p in domTree.preds[loop.header] if p not in loop.body]
+        if len(entering) == 1:
+            pred = graph.getBlock(entering[0])
+            if graph.getOutDegree(pred.id) == 1 and pred.kind in (
+                BlockKind.CONTINUOUS,
+                BlockKind.END_BY_JUMP,
+            ):
+                return pred.id
+
+        if header.label is None:
+            header.label = self.func.freshLabel()
+        preheader = BasicBlock(
+            BlockKind.CONTINUOUS, len(graph.nodes), self.func.freshLabel(), []
+        )
+        graph.addBlock(preheader)
+
+        position = graph.order.index(header.id)
+        before = graph.order[position - 1] if position > 0 else None
+        if (
+            before in loop.body
+            and graph.getBlock(before).kind
+            in (BlockKind.CONTINUOUS, BlockKind.END_BY_COND_JUMP)
+        ):
+            # the back edge falls through to the header, jump from the function end
+            preheader.locs.append(Loc(Branch(header.label)))
+            preheader.kind = BlockKind.END_BY_JUMP
+            graph.order.append(preheader.id)
+        else:
+            graph.order.insert(position, preheader.id)
+
+        for id in entering:
+            pred = graph.getBlock(id)
+            instr = None
+            if pred.kind is not BlockKind.CONTINUOUS:
+                instr = pred.getLastInstr()
+            if isinstance(instr, Branch) and instr.target == header.label:
+                pred.locs[-1] = Loc(Branch(preheader.label))
+            elif isinstance(instr, CondBranch) and instr.target == header.label:
+                pred.locs[-1] = Loc(CondBranch(instr.op, instr.cond, preheader.label))
+            graph.removeEdge(id, header.id)
+            graph.addEdge(id, preheader.id)
+        graph.addEdge(preheader.id, header.id)
+        return preheader.id
+
+    # the blocks writing each temp, and the values of the constants
+    def findDefs(self, domTree: DominatorTree) -> None:
+        self.movable = self.findSingleDefs(self.graph, domTree)
+        self.defBlocks: dict[int, set[int]] = {}
+        self.constants: dict[int, int] = {}
+        for id in domTree.rpo:
+            for loc in self.graph.getBlock(id).iterator():
+                instr = loc.instr
+                for index in instr.getWritten():
+                    self.defBlocks.setdefault(index, set()).add(id)
+                    if isinstance(instr, LoadImm4) and index in self.movable:
+                        self.constants[index] = s32(instr.value)
+
+    def isInvariant(self, instr: TACInstr, loop: Loop) -> bool:
+        if not isinstance(instr, (LoadImm4, Unary, Binary)):
+            return False
+        if instr.dst.index not in self.movable:
+            return False
+        return all(
+            not (self.defBlocks.get(src.index, set()) & loop.body) for src in instr.srcs
+        )
+
+    def hoist(self, loop: Loop, preheader: BasicBlock, domTree: DominatorTree) -> None:
+        graph = self.graph
+        # the blocks an instr must dominate to run whenever the loop is entered
+        exiting = loop.latches + [
+            id
+            for id in loop.body
+            if any(next not in loop.body for next in graph.getSucc(id))
+        ]
+        hoisted: list[Loc] = []
+        for id in domTree.rpo:
+            if id not in loop.body:
+                continue
+            bb = graph.getBlock(id)
+            locs = []
+            for loc in bb.iterator():
+                instr = loc.instr
+                if self.isInvariant(instr, loop) and (
+                    not isinstance(instr, Binary)
+                    or instr.op not in DIVISIONS
+                    or self.constants.get(instr.rhs.index, 0) != 0
+                    or all(domTree.dominates(id, u) for u in exiting)
+                ):
+                    hoisted.append(loc)
+                    self.defBlocks[instr.dst.index] = {preheader.id}
+                else:
+                    locs.append(loc)
+            bb.locs = locs
+
+        if preheader.kind is BlockKind.CONTINUOUS:
+            preheader.locs += hoisted
+        else:
+            preheader.locs[-1:-1] = hoisted
@@ -0,0 +1,51 @@
+from typing import Optional
+
+from backend.opt.dce import DCE
+from backend.opt.licm import LICM
+from backend.opt.sccp import SCCP
+from backend.opt.ssa import SSAConstruction, SSADestruction
+from backend.opt.tacpass import TACPass
+from backend.opt.valuenumbering import LocalValueNumbering, ValueNumbering
+from utils.passtimer import PassTimer
+from utils.tac.tacprog import TACProg
+
+"""
+Optimizer: runs the TAC passes of an optimization level on every function of a program
+
+The TAC is changed in place, between TACGen and Asm, so the optimized TAC is also what
+--tac prints and --interpret runs. Each pass of each function is measured by timer.
+
+1. PASSES：各优化遍的名称
+2. OPT_LEVELS：各优化级别依次运行的优化遍，0 级不做任何优化；
+   ssa 与 outssa 之间的 TAC 为 SSA 形式，RiscvInstrSelector 之前必须已经离开 SSA 形式
+"""
+
+PASSES: dict[str, type[TACPass]] = {
+    "sccp": SCCP,
+    "licm": LICM,
+    "lvn": LocalValueNumbering,
+    "gvn": ValueNumbering,
+    "dce": DCE,
+    "ssa": SSAConstruction,
+    "outssa": SSADestruction,
+}
+
+OPT_LEVELS: dict[int, list[str]] = {
+    0: [],
+    1: ["sccp", "lvn", "licm", "dce"],
+    # the passes working on SSA form go between ssa and outssa
+    2: ["sccp", "licm", "ssa", "gvn", "outssa", "dce"],
+}
+
+
+class Optimizer:
+    def __init__(self, passes: list[str], timer: Optional[PassTimer] = None) -> None:
+        self.passes = passes
+        self.timer = timer or PassTimer(enabled=False)
+
+    def transform(self, prog: TACProg) -> TACProg:
+        for func in prog.funcs:
+            for name in self.passes:
+                with self.timer.phase(name, func.entry.name):
+                    PASSES[name]().transform(func)
+        return prog
@@ -0,0 +1,228 @@
+from typing import Iterable, Optional, Union
+
+from backend.dataflow.basicblock import BasicBlock, BlockKind
+from backend.dataflow.cfg import CFG
+from backend.dataflow.loc import Loc
+from backend.interp.tacinterpreter import BINARY_OPS, UNARY_OPS, s32
+from backend.opt.tacpass import TACPass
+from utils.tac.tacfunc import TACFunc
+from utils.tac.tacinstr import *
+from utils.tac.tacop import CondBranchOp
+
+"""
+SCCP: sparse conditional constant propagation over the TAC of a function
+
+The value of a temp is either a constant, or NAC (not a constant). A temp which has not
+been given a value on any path executed so far has no value yet, and may still become
+any constant. Only the edges found executable carry values, so a branch on a constant
+never makes its other side executable, and the temps assigned there do not spoil the
+constants after the join.
+
+Most temps are written by a single instr, like the values of SSA, and have one value
+for the whole function: when it changes, the blocks reading the temp are visited again.
+The temps written by more than one instr, e.g. by Assign, have a value at the start of
+each block, which is the meet of the values at the end of its executable predecessors.
+
+The operations are folded as the interpreter does them, with 32-bit wraparound and the
+results of the RISC-V instrs, e.g. a division by zero gives -1. Then:
+
+1. Unary/Binary/Assign 的结果为常量时替换为 LoadImm4
+2. 条件为常量的 CondBranch 替换为 Branch 或删除
+3. 删除不可达的基本块
+4. 删除结果不再被读取的 LoadImm4（多为被折叠的运算的操作数）
+"""
+
+# not a constant
+NAC = None
+# no value yet
+UNDEF = False
+
+Value = Union[int, None, bool]
+State = dict[int, Value]
+
+
+def meetValue(x: Value, y: Value) -> Value:
+    if x is UNDEF:
+        return y
+    if y is UNDEF or x == y:
+        return x
+    return NAC
+
+
+# 0 == False, so compare the types as well
+def sameValue(x: Value, y: Value) -> bool:
+    return type(x) is type(y) and x == y
+
+
+class SCCP(TACPass):
+    def transform(self, func: TACFunc) -> None:
+        graph = self.buildCFG(func)
+        n = len(graph.nodes)
+        self.n = n
+        self.labelsToBBs = {
+            bb.label: bb.id for bb in graph.nodes if bb.label is not None
+        }
+
+        # the blocks reading each temp, and the temps written more than once
+        self.readers: dict[int, set[int]] = {}
+        written: set[int] = set()
+        self.multiDefs: set[int] = set()
+        for bb in graph.nodes:
+            for loc in bb.iterator():
+                for index in loc.instr.getRead():
+                    self.readers.setdefault(index, set()).add(bb.id)
+                for index in loc.instr.getWritten():
+                    if index in written:
+                        self.multiDefs.add(index)
+                    written.add(index)
+
+        # the values of the temps written once
+        self.values: State = {}
+        # the values of the other temps at the start and at the end of each block,
+        # None if the block is not executable
+        self.ins: list[Optional[State]] = [None] * n
+        ins = self.ins
+        outs: list[Optional[State]] = [None] * n
+        executable: set[tuple[int, int]] = set()
+
+        ins[0] = {}
+        self.worklist = [0]
+        self.queued = {0}
+        while self.worklist:
+            id = self.worklist.pop()
+            self.queued.discard(id)
+            bb = graph.getBlock(id)
+            state = dict(ins[id])
+            for loc in bb.iterator():
+                self.evaluate(loc.instr, state)
+            outs[id] = state
+
+            for next in self.successors(bb, state):
+                executable.add((id, next))
+                old = ins[next]
+                ins[next] = self.meet(
+                    outs[u] for u in graph.getPrev(next) if (u, next) in executable
+                )
+                if ins[next] != old:
+                    self.push(next)
+
+        graph.order = [id for id in range(n) if ins[id] is not None]
+        for id in graph.order:
+            self.rewrite(graph.getBlock(id), dict(ins[id]))
+        self.removeDeadLoads(graph)
+        self.writeBack(func, graph)
+
+    def push(self, id: int) -> None:
+        if id not in self.queued:
+            self.queued.add(id)
+            self.worklist.append(id)
+
+    def get(self, state: State, temp: Temp) -> Value:
+        if temp.index in self.multiDefs:
+            return state.get(temp.index, UNDEF)
+        return self.values.get(temp.index, UNDEF)
+
+    def set(self, state: State, temp: Temp, value: Value) -> None:
+        if temp.index in self.multiDefs:
+            if value is UNDEF:
+                state.pop(temp.index, None)
+            else:
+                state[temp.index] = value
+            return
+
+        old = self.values.get(temp.index, UNDEF)
+        value = meetValue(old, value)
+        if not sameValue(value, old):
+            self.values[temp.index] = value
+            for id in self.readers.get(temp.index, ()):
+                if self.ins[id] is not None:
+                    self.push(id)
+
+    # the value of instr, written to state or self.values
+    def evaluate(self, instr: TACInstr, state: State) -> None:
+        if isinstance(instr, LoadImm4):
+            self.set(state, instr.dst, s32(instr.value))
+        elif isinstance(instr, (Assign, Unary, Binary)):
+            self.set(state, instr.dsts[0], self.fold(instr, state))
+        else:
+            for dst in instr.dsts:
+                self.set(state, dst, NAC)
+
+    def fold(self, instr: TACInstr, state: State) -> Value:
+        values = [self.get(state, src) for src in instr.srcs]
+        if any(value is NAC for value in values):
+            return NAC
+        if any(value is UNDEF for value in values):
+            return UNDEF
+        if isinstance(instr, Assign):
+            return values[0]
+        if isinstance(instr, Unary):
+            return s32(UNARY_OPS[instr.op](*values))
+        return s32(BINARY_OPS[instr.op](*values))
+
+    # the blocks which may be executed after bb
+    def successors(self, bb: BasicBlock, state: State) -> list[int]:
+        fallthrough = [bb.id + 1] if bb.id + 1 < self.n else []
+        if bb.kind is BlockKind.CONTINUOUS:
+            return fallthrough
+        if bb.kind is BlockKind.END_BY_RETURN:
+            return []
+
+        target = [self.labelsToBBs[bb.getLastInstr().label]]
+        if bb.kind is BlockKind.END_BY_JUMP:
+            return target
+
+        taken = self.taken(bb.getLastInstr(), state)
+        if taken is None:
+            return target + fallthrough
+        return target if taken else fallthrough
+
+    # whether a CondBranch is taken, None if not known
+    def taken(self, instr: CondBranch, state: State) -> Optional[bool]:
+        value = self.get(state, instr.cond)
+        # a branch on a temp without a value is kept as it is
+        if value is NAC or value is UNDEF:
+            return None
+        return (value == 0) == (instr.op == CondBranchOp.BEQ)
+
+    def meet(self, states: Iterable[State]) -> State:
+        result: Optional[State] = None
+        for state in states:
+            if result is None:
+                result = dict(state)
+                continue
+            for (index, value) in state.items():
+                result[index] = meetValue(result.get(index, UNDEF), value)
+        return result
+
+    def rewrite(self, bb: BasicBlock, state: State) -> None:
+        locs = []
+        for loc in bb.iterator():
+            instr = loc.instr
+            if isinstance(instr, (Assign, Unary, Binary)):
+                value = self.fold(instr, state)
+                if value is not NAC and value is not UNDEF:
+                    instr = LoadImm4(instr.dsts[0], value)
+            elif isinstance(instr, CondBranch):
+                taken = self.taken(instr, state)
+                if taken is True:
+                    instr = Branch(instr.target)
+                elif taken is False:
+                    continue
+            self.evaluate(loc.instr, state)
+            locs.append(loc if instr is loc.instr else Loc(instr))
+        bb.locs = locs
+
+    # the constants left without a reader
+    def removeDeadLoads(self, graph: CFG) -> None:
+        read = set()
+        for bb in graph.iterator():
+            for loc in bb.iterator():
+                read.update(loc.instr.getRead())
+        for bb in graph.iterator():
+            bb.locs = [
+                loc
+                for loc in bb.locs
+                if not isinstance(loc.instr, LoadImm4)
+                or loc.instr.dst.index in read
+            ]
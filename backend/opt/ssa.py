@@ -0,0 +1,261 @@
+from typing import Optional
+
+from backend.dataflow.basicblock import BasicBlock, BlockKind
+from backend.dataflow.cfg import CFG
+from backend.dataflow.loc import Loc
+from backend.opt.tacpass import TACPass
+from utils.label.label import Label
+from utils.tac.tacfunc import TACFunc
+from utils.tac.tacinstr import *
+from utils.tac.temp import Temp
+
+"""
+SSAConstruction: puts the TAC of a function into SSA form
+
+Only the temps written more than once (by Assign, or by the *Self instrs of FuncVisitor)
+are renamed, the other temps already have a single definition. A phi is placed at the
+iterated dominance frontier of the blocks writing such a temp, if the temp is read
+before written in some block (semi-pruned SSA), and the phis whose values are never
+used are removed at the end. The sources of a phi are indexed by the labels of the
+predecessors, so every predecessor of a block with phis is given a label. A read of
+a temp with no definition on the path is left as it is, and reads the undefined temp.
+The unreachable blocks are removed, as they have no dominator.
+
+The dominators and the dominance frontiers are taken from the DominatorTree of the CFG.
+
+SSADestruction: turns the phis back into copies
+
+The phis of a block are parallel copies on each incoming edge. They are sequentialized
+with a fresh temp to break each cycle, and placed at the end of the predecessor, before
+its jump. A critical edge, from a conditional branch, is split first: a fall through
+edge by a block placed between the two blocks, a taken edge by a block at the end of
+the function which jumps to the target, and the branch is redirected to it.
+
+1. placePhis：在迭代支配边界处插入 phi
+2. rename：沿支配树重命名，并填写后继基本块中 phi 的来源
+3. sequentialize：把并行复制转换为顺序的 Assign
+"""
+
+
+class SSAConstruction(TACPass):
+    def transform(self, func: TACFunc) -> None:
+        graph = self.buildCFG(func)
+        self.func = func
+        self.graph = graph
+
+        domTree = graph.getDominatorTree()
+        rpo = domTree.rpo
+        self.preds = domTree.preds
+
+        phis = self.placePhis(rpo, domTree.getFrontiers())
+        for (id, blockPhis) in enumerate(phis):
+            if blockPhis:
+                for p in self.preds[id]:
+                    if graph.getBlock(p).label is None:
+                        graph.getBlock(p).label = func.freshLabel()
+
+        self.rename(phis, domTree.children)
+
+        self.removeDeadPhis(phis)
+        for id in rpo:
+            bb = graph.getBlock(id)
+            bb.locs = [Loc(phi) for (_, phi) in sorted(phis[id].items())] + bb.locs
+        graph.order = sorted(rpo)
+        self.writeBack(func, graph)
+
+    # from each block to the phis placed there, by the index of the temp
+    def placePhis(
+        self, rpo: list[int], frontiers: list[set[int]]
+    ) -> list[dict[int, Phi]]:
+        defSites: dict[int, list[int]] = {}
+        defCounts: dict[int, int] = {}
+        exposed: set[int] = set()
+        for id in rpo:
+            written = set()
+            for loc in self.graph.getBlock(id).iterator():
+                for index in loc.instr.getRead():
+                    if index not in written:
+                        exposed.add(index)
+                for index in loc.instr.getWritten():
+                    written.add(index)
+                    defCounts[index] = defCounts.get(index, 0) + 1
+            for index in written:
+                defSites.setdefault(index, []).append(id)
+
+        self.variables = {index for (index, n) in defCounts.items() if n > 1}
+
+        phis: list[dict[int, Phi]] = [{} for _ in frontiers]
+        for index in sorted(self.variables & exposed):
+            worklist = list(defSites[index])
+            visited = set(worklist)
+            while worklist:
+                id = worklist.pop()
+                for frontier in frontiers[id]:
+                    if index not in phis[frontier]:
+                        phis[frontier][index] = Phi(Temp(index), {})
+                        if frontier not in visited:
+                            visited.add(frontier)
+                            worklist.append(frontier)
+        return phis
+
+    def rename(self, phis: list[dict[int, Phi]], children: list[list[int]]) -> None:
+        variables = self.variables
+        stacks: dict[int, list[Temp]] = {index: [] for index in variables}
+
+        worklist: list[tuple[int, Optional[list[int]]]] = [(0, None)]
+        while worklist:
+            (id, pushed) = worklist.pop()
+            if pushed is not None:
+                for index in pushed:
+                    stacks[index].pop()
+                continue
+
+            bb = self.graph.getBlock(id)
+            pushed = []
+            for (index, phi) in phis[id].items():
+                phi.dsts[0] = self.func.freshTemp()
+                stacks[index].append(phi.dst)
+                pushed.append(index)
+
+            for loc in bb.iterator():
+                instr = loc.instr
+                for (i, src) in enumerate(instr.srcs):
+                    if src.index in variables and stacks[src.index]:
+                        instr.srcs[i] = stacks[src.index][-1]
+                for (i, dst) in enumerate(instr.dsts):
+                    if dst.index in variables:
+                        instr.dsts[i] = self.func.freshTemp()
+                        stacks[dst.index].append(instr.dsts[i])
+                        pushed.append(dst.index)
+
+            for next in self.graph.getSucc(id):
+                for (index, phi) in phis[next].items():
+                    stack = stacks[index]
+                    phi.setSource(bb.label, stack[-1] if stack else None)
+
+            worklist.append((id, pushed))
+            for child in reversed(children[id]):
+                worklist.append((child, None))
+
+    # keep the phis whose values are read by other instrs, directly or through phis
+    def removeDeadPhis(self, phis: list[dict[int, Phi]]) -> None:
+        phiOf: dict[int, Phi] = {}
+        for blockPhis in phis:
+            for phi in blockPhis.values():
+                phiOf[phi.dst.index] = phi
+
+        worklist = []
+        for bb in self.graph.nodes:
+            for loc in bb.iterator():
+                for index in loc.instr.getRead():
+                    if index in phiOf:
+                        worklist.append(phiOf[index])
+        live: set[int] = set()
+        while worklist:
+            phi = worklist.pop()
+            if phi.dst.index in live:
+                continue
+            live.add(phi.dst.index)
+            for index in phi.getRead():
+                if index in phiOf:
+                    worklist.append(phiOf[index])
+
+        for blockPhis in phis:
+            for (index, phi) in list(blockPhis.items()):
+                if phi.dst.index not in live:
+                    del blockPhis[index]
+
+
+class SSADestruction(TACPass):
+    def transform(self, func: TACFunc) -> None:
+        graph = self.buildCFG(func)
+        n = len(graph.nodes)
+        labelsToBBs = {bb.label: bb.id for bb in graph.nodes if bb.label is not None}
+
+        # the blocks placed after a block, and at the end of the function
+        after: dict[int, BasicBlock] = {}
+        tail: list[BasicBlock] = []
+        for bb in graph.nodes[:n]:
+            phis = [loc.instr for loc in bb.iterator() if isinstance(loc.instr, Phi)]
+            if not phis:
+                continue
+            bb.locs = [loc for loc in bb.locs if not isinstance(loc.instr, Phi)]
+
+            for label in phis[0].sources:
+                copies = [
+                    (phi.dst, phi.sources[label])
+                    for phi in phis
+                    if phi.sources[label] is not None
+                ]
+                locs = [Loc(instr) for instr in self.sequentialize(copies, func)]
+                if not locs:
+                    continue
+
+                pred = graph.getBlock(labelsToBBs[label])
+                if pred.kind is BlockKind.CONTINUOUS:
+                    pred.locs += locs
+                elif pred.kind is not BlockKind.END_BY_COND_JUMP:
+                    pred.locs[-1:-1] = locs
+                elif labelsToBBs[pred.getLastInstr().target] != pred.id + 1:
+                    # a critical edge
+                    if bb.id == pred.id + 1:
+                        after[pred.id] = self.newBlock(graph, None, locs)
+                    else:
+                        instr = pred.getLastInstr()
+                        split = self.newBlock(
+                            graph, func.freshLabel(), locs + [Loc(Branch(bb.label))]
+                        )
+                        pred.locs[-1] = Loc(
+                            CondBranch(instr.op, instr.cond, split.label)
+                        )
+                        tail.append(split)
+                else:
+                    pred.locs[-1:-1] = locs
+
+        order = []
+        for id in graph.order:
+            order.append(id)
+            if id in after:
+                order.append(after[id].id)
+        graph.order = order + [bb.id for bb in tail]
+        self.writeBack(func, graph)
+
+    def newBlock(
+        self, graph: CFG, label: Optional[Label], locs: list[Loc]
+    ) -> BasicBlock:
+        bb = BasicBlock(BlockKind.CONTINUOUS, len(graph.nodes), label, locs)
+        graph.addBlock(bb)
+        return bb
+
+    # the Assigns doing the copies (dst, src) at the same time
+    def sequentialize(
+        self, copies: list[tuple[Temp, Temp]], func: TACFunc
+    ) -> list[Assign]:
+        pending = {
+            dst.index: (dst, src) for (dst, src) in copies if dst.index != src.index
+        }
+        # the number of pending copies reading each temp
+        readers: dict[int, int] = {}
+        for (_, src) in pending.values():
+            readers[src.index] = readers.get(src.index, 0) + 1
+
+        result = []
+        while pending:
+            ready = [index for index in pending if not readers.get(index)]
+            if not ready:
+                # the pending copies form cycles, save one of their dsts to a new temp
+                index = next(iter(pending))
+                temp = func.freshTemp()
+                result.append(Assign(temp, pending[index][0]))
+                for (key, (dst, src)) in pending.items():
+                    if src.index == index:
+                        pending[key] = (dst, temp)
+                        readers[temp.index] = readers.get(temp.index, 0) + 1
+                readers[index] = 0
+                continue
+
+            for index in ready:
+                (dst, src) = pending.pop(index)
+                result.append(Assign(dst, src))
+                readers[src.index] -= 1
+        return result
@@ -0,0 +1,64 @@
+from abc import ABC, abstractmethod
+
+from backend.dataflow.cfg import CFG
+from backend.dataflow.cfgbuilder import CFGBuilder
+from backend.dataflow.dominatortree import DominatorTree
+from utils.tac.tacfunc import TACFunc
+from utils.tac.tacinstr import Mark
+
+"""
+TACPass: a abstract class for the optimization passes working on the TAC of a function
+
+A pass usually splits the function into basic blocks with buildCFG, changes the locs of
+the blocks, and puts the instrs back into the function with writeBack. The blocks left
+out of graph.order are removed from the function.
+
+findSingleDefs gives the temps which behave like the values of SSA form even when the
+function is not in it: the temps written by a single instr, which comes before every
+read of the temp. Such a temp holds the same value wherever it is read.
+"""
+
+
+class TACPass(ABC):
+    @abstractmethod
+    def transform(self, func: TACFunc) -> None:
+        raise NotImplementedError
+
+    @staticmethod
+    def buildCFG(func: TACFunc) -> CFG:
+        return CFGBuilder().buildFrom(func.getInstrSeq())
+
+    @staticmethod
+    def writeBack(func: TACFunc, graph: CFG) -> None:
+        instrSeq = [Mark(func.entry)]
+        for bb in graph.iterator():
+            if bb.label is not None:
+                instrSeq.append(Mark(bb.label))
+            instrSeq.extend(loc.instr for loc in bb.iterator())
+        func.instrSeq = instrSeq
+
+    @staticmethod
+    def findSingleDefs(graph: CFG, domTree: DominatorTree) -> set[int]:
+        counts: dict[int, int] = {}
+        defAt: dict[int, tuple[int, int]] = {}
+        # the blocks reading each temp, and the position of the first read in each
+        firstReads: dict[int, dict[int, int]] = {}
+        for id in domTree.rpo:
+            for (position, loc) in enumerate(graph.getBlock(id).iterator()):
+                for index in loc.instr.getRead():
+                    firstReads.setdefault(index, {}).setdefault(id, position)
+                for index in loc.instr.getWritten():
+                    counts[index] = counts.get(index, 0) + 1
+                    defAt[index] = (id, position)
+
+        singleDefs = set()
+        for (index, count) in counts.items():
+            if count != 1:
+                continue
+            (block, position) = defAt[index]
+            if all(
+                domTree.dominates(block, id) and (id != block or first > position)
+                for (id, first) in firstReads.get(index, {}).items()
+            ):
+                singleDefs.add(index)
+        return singleDefs
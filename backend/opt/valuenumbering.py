@@ -0,0 +1,207 @@
+from typing import Optional
+
+from backend.dataflow.basicblock import BasicBlock
+from backend.dataflow.dominatortree import DominatorTree
+from backend.dataflow.loc import Loc
+from backend.interp.tacinterpreter import s32
+from backend.opt.tacpass import TACPass
+from utils.tac.tacfunc import TACFunc
+from utils.tac.tacinstr import *
+from utils.tac.tacop import BinaryOp
+
+"""
+ValueNumbering: removes the instrs computing a value which is already in a temp
+
+Each value computed by the function is given a number, and a LoadImm4, Unary or Binary
+is known by its op and the numbers of its operands. When the same operation is found
+again, its result is taken from the temp holding the first one: the instr is removed
+and its temp replaced by the first one, or it becomes an Assign if either temp has
+more than one definition. The commutative ops, and SGT/GEQ with the operands swapped as
+SLT/LEQ, give the same operation.
+
+The number of a temp with a single definition (see TACPass.findSingleDefs, all of them
+in SSA form) never changes. An Assign, or any other write, gives a variable a new
+number, so the operations on its old value are not found any more, and an operation
+found is only used if the temp holding it still has the same number. The numbers of the
+variables are only kept from a block to the next one when the block is entered from it
+alone, otherwise they are unknown.
+
+The operations are kept in the block which computes them and, for ValueNumbering, in
+the blocks it dominates, walking the dominator tree. LocalValueNumbering forgets them
+at the end of each block.
+
+1. visitBlock：为基本块中的每个运算编号，删除或替换重复的运算
+2. replaceTemps：把被删除的运算的结果替换为之前保存同一个值的临时变量
+"""
+
+COMMUTATIVE = {
+    BinaryOp.ADD,
+    BinaryOp.MUL,
+    BinaryOp.EQU,
+    BinaryOp.NEQ,
+    BinaryOp.AND,
+    BinaryOp.OR,
+}
+
+SWAPPED = {
+    BinaryOp.SGT: BinaryOp.SLT,
+    BinaryOp.GEQ: BinaryOp.LEQ,
+}
+
+
+class ValueNumbering(TACPass):
+    # whether the operations are kept for the blocks dominated
+    GLOBAL = True
+
+    def transform(self, func: TACFunc) -> None:
+        graph = self.buildCFG(func)
+        self.graph = graph
+        domTree = graph.getDominatorTree()
+        self.singleDefs = self.findSingleDefs(graph, domTree)
+
+        self.counter = 0
+        # the numbers of the temps with a single definition
+        self.numbers: dict[int, int] = {}
+        # the numbers of the other temps, with the block which was entered without
+        # knowing them, undone when leaving a block
+        self.variables: dict[int, tuple[int, int]] = {}
+        # from an operation to its number and the temp holding it
+        self.table: dict[tuple, tuple[int, Temp]] = {}
+        # the temps whose instrs are removed, and the temps to read instead
+        self.replaced: dict[int, Temp] = {}
+
+        roots = [0] * len(graph.nodes)
+        worklist: list[tuple[int, Optional[list]]] = [(0, None)]
+        while worklist:
+            (id, undo) = worklist.pop()
+            if undo is not None:
+                self.undo(undo)
+                continue
+
+            # a block entered from its immediate dominator alone knows the variables
+            if self.GLOBAL and domTree.preds[id] == [domTree.idom[id]]:
+                roots[id] = roots[domTree.idom[id]]
+            else:
+                roots[id] = id
+            self.root = roots[id]
+            undo = []
+            self.visitBlock(graph.getBlock(id), undo)
+
+            if self.GLOBAL:
+                worklist.append((id, undo))
+            else:
+                self.undo(undo)
+            for child in reversed(domTree.children[id]):
+                worklist.append((child, None))
+
+        self.replaceTemps()
+        self.writeBack(func, graph)
+
+    # forget what a block added to the tables
+    def undo(self, undo: list) -> None:
+        for (table, key, old) in reversed(undo):
+            if old is None:
+                del table[key]
+            else:
+                table[key] = old
+
+    def numberOf(self, temp: Temp, undo: list) -> int:
+        if temp.index in self.singleDefs:
+            number = self.numbers.get(temp.index)
+            if number is None:
+                # read but never written, e.g. a parameter
+                number = self.numbers[temp.index] = self.newNumber()
+            return number
+
+        known = self.variables.get(temp.index)
+        if known is not None and known[1] == self.root:
+            return known[0]
+        number = self.newNumber()
+        self.setVariable(temp, number, undo)
+        return number
+
+    def newNumber(self) -> int:
+        self.counter += 1
+        return self.counter
+
+    def setNumber(self, temp: Temp, number: int, undo: list) -> None:
+        if temp.index in self.singleDefs:
+            self.numbers[temp.index] = number
+        else:
+            self.setVariable(temp, number, undo)
+
+    def setVariable(self, temp: Temp, number: int, undo: list) -> None:
+        undo.append((self.variables, temp.index, self.variables.get(temp.index)))
+        self.variables[temp.index] = (number, self.root)
+
+    # the operation an instr computes, None if it is not a pure operation
+    def keyOf(self, instr: TACInstr, undo: list) -> Optional[tuple]:
+        if isinstance(instr, LoadImm4):
+            return ("imm", s32(instr.value))
+        if isinstance(instr, Unary):
+            return (instr.op, self.numberOf(instr.operand, undo))
+        if isinstance(instr, Binary):
+            op = instr.op
+            lhs = self.numberOf(instr.lhs, undo)
+            rhs = self.numberOf(instr.rhs, undo)
+            if op in SWAPPED:
+                (op, lhs, rhs) = (SWAPPED[op], rhs, lhs)
+            if op in COMMUTATIVE and lhs > rhs:
+                (lhs, rhs) = (rhs, lhs)
+            return (op, lhs, rhs)
+        return None
+
+    def visitBlock(self, bb: BasicBlock, undo: list) -> None:
+        locs = []
+        for loc in bb.iterator():
+            instr = loc.instr
+            key = self.keyOf(instr, undo)
+            if key is None:
+                if isinstance(instr, Assign):
+                    number = self.numberOf(instr.src, undo)
+                    self.setNumber(instr.dst, number, undo)
+                else:
+                    for dst in instr.dsts:
+                        self.setNumber(dst, self.newNumber(), undo)
+                locs.append(loc)
+                continue
+
+            dst = instr.dsts[0]
+            found = self.table.get(key)
+            # the temp holding the operation may have been written since
+            if found is not None and self.numberOf(found[1], undo) == found[0]:
+                (number, holder) = found
+                self.setNumber(dst, number, undo)
+                if dst.index == holder.index:
+                    continue
+                if dst.index in self.singleDefs and holder.index in self.singleDefs:
+                    self.replaced[dst.index] = holder
+                else:
+                    locs.append(Loc(Assign(dst, holder)))
+                continue
+
+            number = self.newNumber()
+            undo.append((self.table, key, found))
+            self.table[key] = (number, dst)
+            self.setNumber(dst, number, undo)
+            locs.append(loc)
+        bb.locs = locs
+
+    def replaceTemps(self) -> None:
+        if not self.replaced:
+            return
+        for bb in self.graph.nodes:
+            for loc in bb.iterator():
+                instr = loc.instr
+                if isinstance(instr, Phi):
+                    for (label, src) in list(instr.sources.items()):
+                        if src is not None and src.index in self.replaced:
+                            instr.setSource(label, self.replaced[src.index])
+                    continue
+                for (i, src) in enumerate(instr.srcs):
+                    if src.index in self.replaced:
+                        instr.srcs[i] = self.replaced[src.index]
+
+
+class LocalValueNumbering(ValueNumbering):
+    GLOBAL = False
@@ -16,6 +16,7 @@ from utils.tac.temp import Temp
 BruteRegAlloc: one kind of RegAlloc
 
 bindings: map from temp.index to Reg
+occupants: map from Reg to the Temp bound to it, a reg not in it is free
 
 we don't need to take care of GlobalTemp here
 because we can remove all the GlobalTemp in selectInstr process
@@ -32,8 +33,7 @@ class BruteRegAlloc(RegAlloc):
     def __init__(self, emitter: RiscvAsmEmitter) -> None:
         super().__init__(emitter)
         self.bindings = {}
-        for reg in emitter.allocatableRegs:
-            reg.used = False
+        self.occupants: dict[Reg, Temp] = {}
 
     def accept(self, graph: CFG, info: SubroutineInfo) -> None:
         subEmitter = self.emitter.emitSubroutine(info)
@@ -46,36 +46,35 @@ class BruteRegAlloc(RegAlloc):
         subEmitter.emitEnd()
 
     def bind(self, temp: Temp, reg: Reg):
-        reg.used = True
         self.bindings[temp.index] = reg
-        reg.occupied = True
-        reg.temp = temp
+        self.occupants[reg] = temp
 
     def unbind(self, temp: Temp):
         if temp.index in self.bindings:
-            self.bindings[temp.index].occupied = False
+            self.occupants.pop(self.bindings[temp.index])
             self.bindings.pop(temp.index)
 
     def localAlloc(self, bb: BasicBlock, subEmitter: SubroutineEmitter):
         self.bindings.clear()
-        for reg in self.emitter.allocatableRegs:
-            reg.occupied = False
+        self.occupants.clear()
 
         # in step9, you may need to think about how to store callersave regs here
         for loc in bb.allSeq():
             subEmitter.emitComment(str(loc.instr))
 
-            self.allocForLoc(loc, subEmitter)
+            self.allocForLoc(bb, loc, subEmitter)
 
         for tempindex in bb.liveOut:
             if tempindex in self.bindings:
-                subEmitter.emitStoreToStack(self.bindings.get(tempindex))
+                reg = self.bindings[tempindex]
+                subEmitter.emitStoreToStack(reg, self.occupants[reg])
 
         if (not bb.isEmpty()) and (bb.kind is not BlockKind.CONTINUOUS):
-            self.allocForLoc(bb.locs[len(bb.locs) - 1], subEmitter)
+            self.allocForLoc(bb, bb.locs[len(bb.locs) - 1], subEmitter)
 
-    def allocForLoc(self, loc: Loc, subEmitter: SubroutineEmitter):
+    def allocForLoc(self, bb: BasicBlock, loc: Loc, subEmitter: SubroutineEmitter):
         instr = loc.instr
+        live = bb.liveInAt(loc)
         srcRegs: list[Reg] = []
         dstRegs: list[Reg] = []
 
@@ -84,14 +83,14 @@ class BruteRegAlloc(RegAlloc):
             if isinstance(temp, Reg):
                 srcRegs.append(temp)
             else:
-                srcRegs.append(self.allocRegFor(temp, True, loc.liveIn, subEmitter))
+                srcRegs.append(self.allocRegFor(temp, True, live, subEmitter))
 
         for i in range(len(instr.dsts)):
             temp = instr.dsts[i]
             if isinstance(temp, Reg):
                 dstRegs.append(temp)
             else:
-                dstRegs.append(self.allocRegFor(temp, False, loc.liveIn, subEmitter))
+                dstRegs.append(self.allocRegFor(temp, False, live, subEmitter))
 
         subEmitter.emitNative(instr.toNative(dstRegs, srcRegs))
 
@@ -102,7 +101,8 @@ class BruteRegAlloc(RegAlloc):
             return self.bindings[temp.index]
 
         for reg in self.emitter.allocatableRegs:
-            if (not reg.occupied) or (not reg.temp.index in live):
+            occupant = self.occupants.get(reg)
+            if (occupant is None) or (not occupant.index in live):
                 subEmitter.emitComment(
                     "  allocate {} to {}  (read: {}):".format(
                         str(temp), str(reg), str(isRead)
@@ -110,17 +110,18 @@ class BruteRegAlloc(RegAlloc):
                 )
                 if isRead:
                     subEmitter.emitLoadFromStack(reg, temp)
-                if reg.occupied:
-                    self.unbind(reg.temp)
+                if occupant is not None:
+                    self.unbind(occupant)
                 self.bind(temp, reg)
                 return reg
 
         reg = self.emitter.allocatableRegs[
-            random.randint(0, len(self.emitter.allocatableRegs))
+            random.randint(0, len(self.emitter.allocatableRegs) - 1)
         ]
-        subEmitter.emitStoreToStack(reg)
-        subEmitter.emitComment("  spill {} ({})".format(str(reg), str(reg.temp)))
-        self.unbind(reg.temp)
+        occupant = self.occupants[reg]
+        subEmitter.emitStoreToStack(reg, occupant)
+        subEmitter.emitComment("  spill {} ({})".format(str(reg), str(occupant)))
+        self.unbind(occupant)
         self.bind(temp, reg)
         subEmitter.emitComment(
             "  allocate {} to {} (read: {})".format(str(temp), str(reg), str(isRead))
@@ -0,0 +1,78 @@
+from typing import Optional
+
+from backend.dataflow.cfg import CFG
+from backend.reg.regalloc import RegAlloc
+from backend.subroutineemitter import SubroutineEmitter
+from utils.riscv import Riscv
+from utils.tac.reg import Reg
+from utils.tac.temp import Temp
+
+"""
+GlobalRegAlloc: a RegAlloc which gives every temp a single location for the whole function
+
+A temp is either bound to a reg, or spilled to the stack. A spilled temp is loaded
+into one of SPILL_REGS before each read, and stored back to the stack after each
+write, so SPILL_REGS must not be handed out when some temp is spilled.
+
+1. emitFunction：根据 assignment（temp.index 到 Reg 的映射，None 表示溢出）生成整个函数的汇编代码
+"""
+
+
+class GlobalRegAlloc(RegAlloc):
+    # regs reserved to load and store spilled temps, an instr reads at most two temps
+    SPILL_REGS = [Riscv.T5, Riscv.T6]
+
+    # the allocatable regs when some temp needs to be spilled
+    def regsWithoutSpillRegs(self) -> list[Reg]:
+        return [
+            reg for reg in self.emitter.allocatableRegs if reg not in self.SPILL_REGS
+        ]
+
+    def emitFunction(
+        self,
+        graph: CFG,
+        assignment: dict[int, Optional[Reg]],
+        subEmitter: SubroutineEmitter,
+    ) -> None:
+        for bb in graph.iterator():
+            if bb.label is not None:
+                subEmitter.emitLabel(bb.label)
+
+            for loc in bb.iterator():
+                instr = loc.instr
+                subEmitter.emitComment(str(instr))
+
+                srcRegs: list[Reg] = []
+                loaded: dict[int, Reg] = {}
+                for temp in instr.srcs:
+                    if isinstance(temp, Reg):
+                        srcRegs.append(temp)
+                    elif assignment[temp.index] is not None:
+                        srcRegs.append(assignment[temp.index])
+                    elif temp.index in loaded:
+                        srcRegs.append(loaded[temp.index])
+                    else:
+                        reg = self.SPILL_REGS[len(loaded)]
+                        subEmitter.emitLoadFromStack(reg, temp)
+                        loaded[temp.index] = reg
+                        srcRegs.append(reg)
+
+                dstRegs: list[Reg] = []
+                spilledDsts: list[tuple[Reg, Temp]] = []
+                for temp in instr.dsts:
+                    if isinstance(temp, Reg):
+                        dstRegs.append(temp)
+                    elif assignment[temp.index] is not None:
+                        dstRegs.append(assignment[temp.index])
+                    else:
+                        reg = self.SPILL_REGS[len(spilledDsts)]
+                        spilledDsts.append((reg, temp))
+                        dstRegs.append(reg)
+
+                # a move between temps bound to the same reg is not needed any more
+                if not (isinstance(instr, Riscv.Move) and dstRegs[0] is srcRegs[0]):
+                    subEmitter.emitNative(instr.toNative(dstRegs, srcRegs))
+
+                for (reg, temp) in spilledDsts:
+                    subEmitter.emitComment("  spill {} ({})".format(str(reg), str(temp)))
+                    subEmitter.emitStoreToStack(reg, temp)
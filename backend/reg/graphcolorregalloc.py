@@ -0,0 +1,244 @@
+from typing import Optional
+
+from backend.dataflow.cfg import CFG
+from backend.reg.globalregalloc import GlobalRegAlloc
+from backend.subroutineinfo import SubroutineInfo
+from utils.riscv import Riscv
+from utils.tac.reg import Reg
+from utils.tac.temp import Temp
+
+"""
+GraphColorRegAlloc: one kind of GlobalRegAlloc, a Chaitin/Briggs style graph coloring allocator
+
+Two temps interfere if one of them is written while the other one is live. The copy
+of a move does not interfere with its source, so the two temps of a move can often be
+coalesced into one node and the move disappears. The allocator is deterministic:
+nodes, moves and regs are always visited in a fixed order.
+
+1. accept：为整个函数着色，若有实际溢出的 Temp，则去掉 SPILL_REGS 后重新着色，直到不再有新的溢出
+2. build：根据每条指令的 liveOut 构建冲突图，统计每个 Temp 按循环深度加权的使用次数作为溢出代价
+3. coalesce：用 Briggs 保守合并准则合并 move 指令两端的 Temp
+4. simplify：不断移除度数小于 K 的结点，没有这样的结点时选择代价/度数最小的结点乐观地压栈
+5. select：按出栈顺序着色，优先选择与 move 相关结点相同的寄存器
+"""
+
+
+class InterferenceGraph:
+    def __init__(self) -> None:
+        # the nodes are temp indexes, the coalesced nodes are represented by one of them
+        self.adj: dict[int, set[int]] = {}
+        # regs that must not be given to a node, e.g. a0 written while the temp is live
+        self.forbidden: dict[int, set[Reg]] = {}
+        self.cost: dict[int, int] = {}
+        self.alias: dict[int, int] = {}
+
+    def addNode(self, u: int) -> None:
+        if u not in self.adj:
+            self.adj[u] = set()
+            self.forbidden[u] = set()
+            self.cost[u] = 0
+
+    def addEdge(self, u: int, v: int) -> None:
+        if u != v:
+            self.adj[u].add(v)
+            self.adj[v].add(u)
+
+    def find(self, u: int) -> int:
+        while u in self.alias:
+            u = self.alias[u]
+        return u
+
+    # merge node v into node u
+    def merge(self, u: int, v: int) -> None:
+        for w in self.adj[v]:
+            self.adj[w].discard(v)
+            self.addEdge(u, w)
+        self.forbidden[u] |= self.forbidden[v]
+        self.cost[u] += self.cost[v]
+        del self.adj[v]
+        del self.forbidden[v]
+        del self.cost[v]
+        self.alias[v] = u
+
+
+class GraphColorRegAlloc(GlobalRegAlloc):
+    # the weight of an instr is LOOP_WEIGHT ** (the loop depth of its basic block)
+    LOOP_WEIGHT = 10
+
+    def accept(self, graph: CFG, info: SubroutineInfo) -> None:
+        spilled: set[int] = set()
+        while True:
+            if spilled:
+                # spilled temps need scratch regs, so color without them
+                regs = self.regsWithoutSpillRegs()
+            else:
+                regs = self.emitter.allocatableRegs
+
+            ig, moves, prefers = self.build(graph, spilled)
+            self.coalesce(ig, moves, len(regs))
+            members = self.members(ig)
+            stack = self.simplify(ig, len(regs))
+            colors = self.select(ig, stack, regs, members, moves, prefers)
+
+            newSpilled = [u for u in sorted(ig.adj) if colors[u] is None]
+            if not newSpilled:
+                break
+            for u in newSpilled:
+                spilled.update(members[u])
+
+        assignment: dict[int, Optional[Reg]] = {index: None for index in spilled}
+        for (u, temps) in members.items():
+            for index in temps:
+                assignment[index] = colors[u]
+
+        subEmitter = self.emitter.emitSubroutine(info)
+        self.emitFunction(graph, assignment, subEmitter)
+        subEmitter.emitEnd()
+
+    def build(
+        self, graph: CFG, spilled: set[int]
+    ) -> tuple[InterferenceGraph, list[tuple[int, int, int]], dict[int, list[Reg]]]:
+        ig = InterferenceGraph()
+        # (dst, src, weight) of the moves between two temps
+        moves: list[tuple[int, int, int]] = []
+        # from temp index to the precolored regs it is moved from/to
+        prefers: dict[int, list[Reg]] = {}
+
+        def isTemp(temp: Temp) -> bool:
+            return not isinstance(temp, Reg) and temp.index not in spilled
+
+        depths = graph.getLoopNest().depths
+        for bb in graph.iterator():
+            weight = self.LOOP_WEIGHT ** depths[bb.id]
+            for loc in bb.iterator():
+                instr = loc.instr
+                liveOut = bb.liveOutAt(loc)
+                for temp in instr.srcs + instr.dsts:
+                    if isTemp(temp):
+                        ig.addNode(temp.index)
+                        ig.cost[temp.index] += weight
+
+                isMove = isinstance(instr, Riscv.Move)
+                if isMove:
+                    dst, src = instr.dsts[0], instr.srcs[0]
+                    if isTemp(dst) and isTemp(src):
+                        moves.append((dst.index, src.index, weight))
+                    elif isTemp(src):
+                        prefers.setdefault(src.index, []).append(dst)
+                    elif isTemp(dst):
+                        prefers.setdefault(dst.index, []).append(src)
+
+                for dst in instr.dsts:
+                    if isinstance(dst, Reg):
+                        for index in liveOut:
+                            if index >= 0 and index not in spilled:
+                                ig.addNode(index)
+                                ig.forbidden[index].add(dst)
+                    elif dst.index not in spilled:
+                        for index in liveOut:
+                            if index < 0 or index in spilled:
+                                continue
+                            if isMove and index == instr.srcs[0].index:
+                                continue
+                            ig.addNode(index)
+                            ig.addEdge(dst.index, index)
+
+        moves.sort(key=lambda move: (-move[2], move[0], move[1]))
+        return ig, moves, prefers
+
+    def coalesce(
+        self, ig: InterferenceGraph, moves: list[tuple[int, int, int]], k: int
+    ) -> None:
+        changed = True
+        while changed:
+            changed = False
+            for (dst, src, _) in moves:
+                u, v = ig.find(dst), ig.find(src)
+                if u == v or v in ig.adj[u]:
+                    continue
+                if self.canCoalesce(ig, u, v, k):
+                    ig.merge(min(u, v), max(u, v))
+                    changed = True
+
+    # Briggs: the merged node has fewer than k neighbors of significant degree
+    def canCoalesce(self, ig: InterferenceGraph, u: int, v: int, k: int) -> bool:
+        k -= len(ig.forbidden[u] | ig.forbidden[v])
+        significant = 0
+        for w in ig.adj[u] | ig.adj[v]:
+            degree = len(ig.adj[w])
+            if w in ig.adj[u] and w in ig.adj[v]:
+                degree -= 1
+            if degree >= k:
+                significant += 1
+        return significant < k
+
+    # from each node to the temps coalesced into it
+    def members(self, ig: InterferenceGraph) -> dict[int, list[int]]:
+        members = {u: [u] for u in ig.adj}
+        for t in ig.alias:
+            members[ig.find(t)].append(t)
+        return members
+
+    def simplify(self, ig: InterferenceGraph, k: int) -> list[int]:
+        degree = {u: len(ig.adj[u]) for u in ig.adj}
+        remaining = set(ig.adj)
+        stack: list[int] = []
+
+        while remaining:
+            candidates = sorted(
+                u for u in remaining if degree[u] < k - len(ig.forbidden[u])
+            )
+            if not candidates:
+                # no trivially colorable node, push the cheapest one optimistically
+                candidates = [
+                    min(
+                        remaining,
+                        key=lambda u: (ig.cost[u] / (degree[u] + 1), u),
+                    )
+                ]
+            for u in candidates:
+                remaining.remove(u)
+                stack.append(u)
+                for w in ig.adj[u]:
+                    degree[w] -= 1
+
+        return stack
+
+    def select(
+        self,
+        ig: InterferenceGraph,
+        stack: list[int],
+        regs: list[Reg],
+        members: dict[int, list[int]],
+        moves: list[tuple[int, int, int]],
+        prefers: dict[int, list[Reg]],
+    ) -> dict[int, Optional[Reg]]:
+        partners: dict[int, list[int]] = {}
+        for (dst, src, _) in moves:
+            u, v = ig.find(dst), ig.find(src)
+            if u != v:
+                partners.setdefault(u, []).append(v)
+                partners.setdefault(v, []).append(u)
+
+        colors: dict[int, Optional[Reg]] = {}
+        while stack:
+            u = stack.pop()
+            taken = {colors[w] for w in ig.adj[u] if colors.get(w) is not None}
+            available = [
+                reg for reg in regs if reg not in taken and reg not in ig.forbidden[u]
+            ]
+            colors[u] = None
+            if not available:
+                continue
+
+            preferred = [colors.get(w) for w in partners.get(u, [])]
+            for t in members[u]:
+                preferred += prefers.get(t, [])
+            for reg in preferred:
+                if reg in available:
+                    colors[u] = reg
+                    break
+            else:
+                colors[u] = available[0]
+
+        return colors
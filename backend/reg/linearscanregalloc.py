@@ -0,0 +1,148 @@
+from backend.dataflow.cfg import CFG
+from backend.reg.globalregalloc import GlobalRegAlloc
+from backend.subroutineinfo import SubroutineInfo
+from utils.tac.reg import Reg
+from utils.tac.temp import Temp
+
+"""
+LinearScanRegAlloc: one kind of GlobalRegAlloc, which allocates regs for a whole function
+
+Unlike BruteRegAlloc, a temp keeps its reg across basic blocks, so live temps are
+not stored to the stack at the end of every basic block.
+
+Every instr at index i owns two positions: 2i where its srcs are read and 2i + 1
+where its dsts are written, so a dst may reuse the reg of a src that dies there.
+The live interval of a temp is the hull of all the positions where it is live.
+
+1. accept：根据 CFG 与活跃变量分析结果为整个函数分配寄存器，并生成相应汇编代码
+2. buildIntervals：将函数内的指令线性编号，求出每个 Temp 的活跃区间
+3. scan：按起点顺序扫描活跃区间并分配寄存器，寄存器不足时溢出结束最晚的区间
+"""
+
+
+class Interval:
+    def __init__(self, temp: Temp, pos: int) -> None:
+        self.temp = temp
+        self.start = pos
+        self.end = pos
+        self.reg: Reg = None
+
+    def extend(self, pos: int) -> None:
+        if pos < self.start:
+            self.start = pos
+        if pos > self.end:
+            self.end = pos
+
+    def __str__(self) -> str:
+        return "{}: [{}, {}]".format(str(self.temp), self.start, self.end)
+
+
+class LinearScanRegAlloc(GlobalRegAlloc):
+    def accept(self, graph: CFG, info: SubroutineInfo) -> None:
+        intervals, fixedDefs = self.buildIntervals(graph)
+
+        if not self.scan(intervals, fixedDefs, self.emitter.allocatableRegs):
+            # spilled temps need scratch regs, so scan again without them
+            self.scan(intervals, fixedDefs, self.regsWithoutSpillRegs())
+
+        subEmitter = self.emitter.emitSubroutine(info)
+        self.emitFunction(graph, {i.temp.index: i.reg for i in intervals}, subEmitter)
+        subEmitter.emitEnd()
+
+    def buildIntervals(
+        self, graph: CFG
+    ) -> tuple[list[Interval], dict[int, list[int]]]:
+        temps: dict[int, Temp] = {}
+        for bb in graph.iterator():
+            for loc in bb.iterator():
+                for temp in loc.instr.srcs + loc.instr.dsts:
+                    if not isinstance(temp, Reg):
+                        temps[temp.index] = temp
+
+        intervals: dict[int, Interval] = {}
+        # from reg.id to the positions where the reg is written by a precolored dst
+        fixedDefs: dict[int, list[int]] = {}
+
+        def touch(index: int, pos: int):
+            if index in intervals:
+                intervals[index].extend(pos)
+            else:
+                intervals[index] = Interval(temps[index], pos)
+
+        pos = 0
+        for bb in graph.iterator():
+            if bb.isEmpty():
+                continue
+            first = pos
+            for loc in bb.iterator():
+                for temp in loc.instr.srcs:
+                    if not isinstance(temp, Reg):
+                        touch(temp.index, pos)
+                for temp in loc.instr.dsts:
+                    if isinstance(temp, Reg):
+                        fixedDefs.setdefault(temp.id, []).append(pos + 1)
+                    else:
+                        touch(temp.index, pos + 1)
+                pos += 2
+
+            for index in bb.liveIn:
+                if index in temps:
+                    touch(index, first)
+            for index in bb.liveOut:
+                if index in temps:
+                    touch(index, pos - 1)
+
+        return (
+            sorted(intervals.values(), key=lambda i: (i.start, i.temp.index)),
+            fixedDefs,
+        )
+
+    # return False if some interval is spilled
+    def scan(
+        self,
+        intervals: list[Interval],
+        fixedDefs: dict[int, list[int]],
+        regs: list[Reg],
+    ) -> bool:
+        def conflicts(reg: Reg, interval: Interval) -> bool:
+            for pos in fixedDefs.get(reg.id, []):
+                if interval.start <= pos <= interval.end:
+                    return True
+            return False
+
+        allSucceed = True
+        active: list[Interval] = []
+        free = list(regs)
+        for interval in intervals:
+            interval.reg = None
+
+            # expire the intervals which end before the current one starts
+            for old in list(active):
+                if old.end < interval.start:
+                    active.remove(old)
+                    free.append(old.reg)
+            free.sort(key=regs.index)
+
+            for reg in free:
+                if not conflicts(reg, interval):
+                    free.remove(reg)
+                    interval.reg = reg
+                    active.append(interval)
+                    break
+            if interval.reg is not None:
+                continue
+
+            allSucceed = False
+            victim = None
+            for old in active:
+                if conflicts(old.reg, interval):
+                    continue
+                if victim is None or old.end > victim.end:
+                    victim = old
+            if victim is not None and victim.end > interval.end:
+                interval.reg = victim.reg
+                victim.reg = None
+                active.remove(victim)
+                active.append(interval)
+
+        return allSucceed
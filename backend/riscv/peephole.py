@@ -0,0 +1,292 @@
+from typing import Callable, Optional
+
+from utils.passtimer import PassTimer
+from utils.riscv import Riscv
+from utils.tac.nativeinstr import NativeInstr
+from utils.tac.reg import Reg
+from utils.tac.tacop import InstrKind
+
+"""
+Peephole: rewrites short sequences of the native instrs of a function before they are printed
+
+It runs on the buf of RiscvSubroutineEmitter, after the register allocation, when the
+loads and stores of the stack slots, the moves between regs and the jumps between the
+basic blocks are all known. Each rule looks at the instrs from a position, and gives
+how many of them it replaces and the instrs replacing them, or None if it does not
+apply. The rules are tried at each position in the order of RULES, the buf is rewritten
+from the first instr to the last one, and again until no rule applies.
+
+Some rules need to know whether a reg is read again, so the liveness of the regs is
+computed on the buf before each round, from the labels and the jumps. After the last
+instr, or a jump to the epilogue, only a0 is live. The liveness is not updated while
+the buf is rewritten: the rules only remove the reads and the writes of the regs, or
+move a write to the instr computing its value, so a reg found dead stays dead.
+
+The stack slots are only tracked inside a basic block: a load of a slot whose value is
+in a reg since a load or a store of the same slot, the reg not written since, becomes
+a move, and a store of that reg to the slot is removed. The instrs before a position
+are looked up in result, the instrs already rewritten in the round, and not in buf: a
+rule may have changed the reg written by one of them, e.g. forward-move.
+
+1. RULES：规则表，从规则名到规则函数，规则返回被替换的指令条数和替换它们的指令，不适用时返回 None
+2. run：反复应用规则直到没有规则命中，每条规则的命中次数记在 hits 中，并计入 timer 的计数器
+3. isDeadAfter：某条指令之后寄存器的值是否不会再被读取
+"""
+
+Rule = Callable[["Peephole", int], Optional[tuple[int, list[NativeInstr]]]]
+
+
+def maskOf(regs: list) -> int:
+    mask = 0
+    for reg in regs:
+        if isinstance(reg, Reg):
+            mask |= 1 << reg.id
+    return mask
+
+
+def fitsImm12(value: int) -> bool:
+    return -2048 <= value <= 2047
+
+
+class Peephole:
+    def __init__(
+        self, rules: Optional[dict] = None, timer: Optional[PassTimer] = None
+    ) -> None:
+        self.rules: dict[str, Rule] = RULES if rules is None else rules
+        self.timer = timer or PassTimer(enabled=False)
+        self.hits = {name: 0 for name in self.rules}
+
+    def run(self, buf: list[NativeInstr], funcName: str) -> list[NativeInstr]:
+        self.exitLabel = funcName + Riscv.EPILOGUE_SUFFIX
+        with self.timer.phase("peephole", funcName):
+            changed = True
+            while changed:
+                self.buf = buf
+                self.computeLiveness()
+                changed = False
+                result: list[NativeInstr] = []
+                self.result = result
+                i = 0
+                while i < len(buf):
+                    for (name, rule) in self.rules.items():
+                        rewrite = rule(self, i)
+                        if rewrite is not None:
+                            (count, instrs) = rewrite
+                            result += instrs
+                            i += count
+                            self.hits[name] += 1
+                            self.timer.count("peephole: " + name)
+                            changed = True
+                            break
+                    else:
+                        result.append(buf[i])
+                        i += 1
+                buf = result
+        return buf
+
+    def computeLiveness(self) -> None:
+        buf = self.buf
+        n = len(buf)
+        exitMask = maskOf([Riscv.A0])
+        allMask = (1 << 32) - 1
+        labels = {
+            instr.label.name: i for (i, instr) in enumerate(buf) if instr.isLabel()
+        }
+        labels[self.exitLabel] = -1
+
+        # the instrs run after each instr, -1 for the epilogue, None if unknown
+        succs: list[list[Optional[int]]] = []
+        for (i, instr) in enumerate(buf):
+            if instr.kind is InstrKind.RET:
+                succs.append([-1])
+                continue
+            next = [i + 1 if i + 1 < n else -1]
+            if instr.kind is InstrKind.JMP:
+                next = []
+            if instr.kind in (InstrKind.JMP, InstrKind.COND_JMP):
+                next.append(labels.get(instr.label.name))
+            succs.append(next)
+
+        uses = [maskOf(instr.srcs) for instr in buf]
+        defs = [maskOf(instr.dsts) for instr in buf]
+        self.liveAfter = [0] * n
+        liveIn = [0] * n
+        changed = True
+        while changed:
+            changed = False
+            for i in range(n - 1, -1, -1):
+                live = 0
+                for j in succs[i]:
+                    if j is None:
+                        live = allMask
+                    elif j < 0:
+                        live |= exitMask
+                    else:
+                        live |= liveIn[j]
+                self.liveAfter[i] = live
+                live = (live & ~defs[i]) | uses[i]
+                if live != liveIn[i]:
+                    liveIn[i] = live
+                    changed = True
+
+    def isDeadAfter(self, reg: Reg, i: int) -> bool:
+        return not (self.liveAfter[i] >> reg.id) & 1
+
+    # the reg holding the value of the stack slot base + offset after the instrs
+    # already rewritten, i.e. before the instr the rules are looking at
+    def slotValue(self, base: Reg, offset: int) -> Optional[Reg]:
+        written = 0
+        for instr in reversed(self.result):
+            if not instr.isSequential():
+                return None
+            if (
+                isinstance(instr, (Riscv.NativeLoadWord, Riscv.NativeStoreWord))
+                and instr.offset == offset
+                and instr.srcs[-1] is base
+            ):
+                if isinstance(instr, Riscv.NativeLoadWord):
+                    reg = instr.dsts[0]
+                else:
+                    reg = instr.srcs[0]
+                return None if (written >> reg.id) & 1 else reg
+            if base in instr.dsts:
+                return None
+            written |= maskOf(instr.dsts)
+        return None
+
+
+# mv r, r
+def redundantMove(p: Peephole, i: int) -> Optional[tuple[int, list[NativeInstr]]]:
+    instr = p.buf[i]
+    if isinstance(instr.origin, Riscv.Move) and instr.dsts[0] is instr.srcs[0]:
+        return (1, [])
+    return None
+
+
+# sw r, slot ... lw d, slot -> mv d, r
+def redundantLoad(p: Peephole, i: int) -> Optional[tuple[int, list[NativeInstr]]]:
+    instr = p.buf[i]
+    if not isinstance(instr, Riscv.NativeLoadWord):
+        return None
+    reg = p.slotValue(instr.srcs[0], instr.offset)
+    if reg is None:
+        return None
+    dst = instr.dsts[0]
+    if reg is dst:
+        return (1, [])
+    return (1, [Riscv.Move(dst, reg).toNative([dst], [reg])])
+
+
+# lw r, slot ... sw r, slot
+def redundantStore(p: Peephole, i: int) -> Optional[tuple[int, list[NativeInstr]]]:
+    instr = p.buf[i]
+    if isinstance(instr, Riscv.NativeStoreWord):
+        reg = p.slotValue(instr.srcs[1], instr.offset)
+        if reg is instr.srcs[0]:
+            return (1, [])
+    return None
+
+
+# j L; L: or a jump to the epilogue, which is printed right after the buf
+def jumpToNext(p: Peephole, i: int) -> Optional[tuple[int, list[NativeInstr]]]:
+    buf = p.buf
+    instr = buf[i]
+    if instr.kind is InstrKind.RET and i == len(buf) - 1:
+        return (1, [])
+    if instr.kind is InstrKind.JMP:
+        j = i + 1
+        while j < len(buf) and buf[j].isLabel():
+            if buf[j].label.name == instr.label.name:
+                return (1, [])
+            j += 1
+    return None
+
+
+# beq a, b, L1; j L2; L1: -> bne a, b, L2; L1:
+def branchOverJump(p: Peephole, i: int) -> Optional[tuple[int, list[NativeInstr]]]:
+    buf = p.buf
+    if i + 2 >= len(buf):
+        return None
+    (branch, jump, label) = buf[i : i + 3]
+    if (
+        isinstance(branch.origin, Riscv.Branch)
+        and jump.kind in (InstrKind.JMP, InstrKind.RET)
+        and label.isLabel()
+        and branch.label.name == label.label.name
+    ):
+        inverse = branch.origin.inverse(jump.label)
+        return (2, [inverse.toNative([], branch.srcs)])
+    return None
+
+
+IMMEDIATE_OPS = {"add": "addi", "and": "andi", "or": "ori", "slt": "slti"}
+
+COMMUTATIVE_OPS = {"add", "and", "or"}
+
+
+# li r, c; add d, a, r -> addi d, a, c, when r is not read afterwards
+def immediateOperand(p: Peephole, i: int) -> Optional[tuple[int, list[NativeInstr]]]:
+    buf = p.buf
+    if i + 1 >= len(buf):
+        return None
+    (load, instr) = (buf[i], buf[i + 1])
+    if not isinstance(load.origin, Riscv.LoadImm) or not isinstance(
+        instr.origin, Riscv.Binary
+    ):
+        return None
+
+    reg = load.dsts[0]
+    (lhs, rhs) = instr.srcs
+    (op, value) = (instr.origin.op, load.origin.value)
+    if rhs is reg and lhs is not reg:
+        src = lhs
+    elif lhs is reg and rhs is not reg and op in COMMUTATIVE_OPS:
+        src = rhs
+    else:
+        return None
+    if op == "sub":
+        (op, value) = ("add", -value)
+
+    dst = instr.dsts[0]
+    if (
+        op not in IMMEDIATE_OPS
+        or not fitsImm12(value)
+        or not (reg is dst or p.isDeadAfter(reg, i + 1))
+    ):
+        return None
+    binary = Riscv.BinaryImm(IMMEDIATE_OPS[op], dst, src, value)
+    return (2, [binary.toNative([dst], [src])])
+
+
+# op t, a, b; mv d, t -> op d, a, b, when t is not read afterwards
+def forwardMove(p: Peephole, i: int) -> Optional[tuple[int, list[NativeInstr]]]:
+    buf = p.buf
+    if i + 1 >= len(buf):
+        return None
+    (instr, move) = (buf[i], buf[i + 1])
+    if (
+        not isinstance(move.origin, Riscv.Move)
+        or not instr.isSequential()
+        or len(instr.dsts) != 1
+        or move.srcs[0] is not instr.dsts[0]
+        or not p.isDeadAfter(instr.dsts[0], i + 1)
+    ):
+        return None
+
+    dst = move.dsts[0]
+    if instr.origin is not None:
+        return (2, [instr.origin.toNative([dst], instr.srcs)])
+    if isinstance(instr, Riscv.NativeLoadWord):
+        return (2, [Riscv.NativeLoadWord(dst, instr.srcs[0], instr.offset)])
+    return None
+
+
+RULES: dict[str, Rule] = {
+    "redundant-move": redundantMove,
+    "redundant-load": redundantLoad,
+    "redundant-store": redundantStore,
+    "jump-to-next": jumpToNext,
+    "branch-over-jump": branchOverJump,
+    "immediate-operand": immediateOperand,
+    "forward-move": forwardMove,
+}
@@ -1,29 +1,111 @@
-from typing import Sequence, Tuple
+from typing import Optional, Sequence, TextIO, Tuple
 
 from backend.asmemitter import AsmEmitter
+from backend.interp.tacinterpreter import s32
+from backend.opt.tacpass import TACPass
 from utils.error import IllegalArgumentException
 from utils.label.label import Label, LabelKind
 from utils.riscv import Riscv
 from utils.tac.reg import Reg
 from utils.tac.tacfunc import TACFunc
 from utils.tac.tacinstr import *
+from utils.tac.tacop import BinaryOp, CondBranchOp, UnaryOp
 from utils.tac.tacvisitor import TACVisitor
 
 from ..subroutineemitter import SubroutineEmitter
 from ..subroutineinfo import SubroutineInfo
+from .peephole import Peephole
+from .strengthreduction import StrengthReduction
 
 """
 RiscvAsmEmitter: an AsmEmitter for RiscV
+
+RiscvInstrSelector puts a constant operand into the immediate of the instr when it fits
+in 12 bits, e.g. addi/slti/xori, instead of loading it into a reg. The constants are the
+temps of a LoadImm4 found by TACPass.findSingleDefs, which hold the same value wherever
+they are read, and their li is left out if no instr reads the reg any more. The
+MUL/DIV/REM by a constant are made of shifts, adds and mulh by StrengthReduction. The
+comparisons are lowered to slt/slti, sub/xori with seqz/snez, and a xori flipping the
+result, and the logical and/or to snez first, as RISC-V has no such instrs.
+
+A comparison whose result is only read by the CondBranch ending its block is not
+computed, the branch compares its operands instead, e.g. blt a, b for a < b, or
+beq x0, a for a == 0. A logical and/or read only by such a branch becomes a chain of
+branches, the first operand jumping past the second one when it decides the result.
+The operands of the and/or are computed by then, the frontend has no && and ||
+yet, so only the booleans are saved, not the evaluation of the second operand.
+
+If a Peephole is given, the instrs of each function are rewritten by it before printed.
+
+1. selectInstr：把 TAC 指令翻译为 RISC-V 指令，常量操作数尽量放入立即数
+2. RiscvInstrSelector.constantOf：若临时变量是能放入 12 位立即数的常量，返回它的值
+3. findFusedBranches：找出结果只被条件跳转读取的比较和逻辑运算，与条件跳转合并
 """
 
+# how a comparison is made x < y: whether the operands are swapped, the result negated
+COMPARISONS = {
+    BinaryOp.SLT: (False, False),
+    BinaryOp.SGT: (True, False),
+    BinaryOp.GEQ: (False, True),
+    BinaryOp.LEQ: (True, True),
+}
+
+# the instrs whose result may be made part of a CondBranch
+FUSIBLE = set(COMPARISONS) | {BinaryOp.EQU, BinaryOp.NEQ, BinaryOp.AND, BinaryOp.OR}
+
+
+# the comparisons and logical and/or whose result is only read by a CondBranch, or by
+# another such and/or, in the same block, their operands unchanged until the branch
+def findFusedBranches(instrs: list[TACInstr]) -> set[Binary]:
+    reads: dict[int, int] = {}
+    for instr in instrs:
+        for index in instr.getRead():
+            reads[index] = reads.get(index, 0) + 1
+
+    fused: set[Binary] = set()
+    # the fusible instrs of the block so far, by the temp they write
+    pending: dict[int, Binary] = {}
+
+    def fuse(index: int) -> None:
+        instr = pending.get(index)
+        if instr is not None and reads[index] == 1:
+            fused.add(instr)
+            if instr.op in (BinaryOp.AND, BinaryOp.OR):
+                fuse(instr.lhs.index)
+                fuse(instr.rhs.index)
+
+    for instr in instrs:
+        if isinstance(instr, CondBranch):
+            fuse(instr.cond.index)
+        if not instr.isSequential():
+            pending.clear()
+            continue
+        written = set(instr.getWritten())
+        if written:
+            pending = {
+                index: other
+                for (index, other) in pending.items()
+                if index not in written and not written & set(other.getRead())
+            }
+        if (
+            isinstance(instr, Binary)
+            and instr.op in FUSIBLE
+            and instr.dst.index not in instr.getRead()
+        ):
+            pending[instr.dst.index] = instr
+    return fused
+
 
 class RiscvAsmEmitter(AsmEmitter):
     def __init__(
         self,
         allocatableRegs: list[Reg],
         callerSaveRegs: list[Reg],
+        sink: Optional[TextIO] = None,
+        peephole: Optional[Peephole] = None,
     ) -> None:
-        super().__init__(allocatableRegs, callerSaveRegs)
+        super().__init__(allocatableRegs, callerSaveRegs, sink)
+        self.peephole = peephole
 
     
         # the start of the asm code
@@ -36,28 +118,65 @@ class RiscvAsmEmitter(AsmEmitter):
     # collect some info which is saved in SubroutineInfo for SubroutineEmitter
     def selectInstr(self, func: TACFunc) -> tuple[list[str], SubroutineInfo]:
 
+        graph = TACPass.buildCFG(func)
+        singleDefs = TACPass.findSingleDefs(graph, graph.getDominatorTree())
+        constants = {
+            instr.dst.index: s32(instr.value)
+            for instr in func.getInstrSeq()
+            if isinstance(instr, LoadImm4) and instr.dst.index in singleDefs
+        }
+
         selector: RiscvAsmEmitter.RiscvInstrSelector = (
-            RiscvAsmEmitter.RiscvInstrSelector(func.entry)
+            RiscvAsmEmitter.RiscvInstrSelector(
+                func, constants, findFusedBranches(func.getInstrSeq())
+            )
         )
         for instr in func.getInstrSeq():
             instr.accept(selector)
 
+        # the constants all of whose reads became immediates
+        read = {src.index for instr in selector.seq for src in instr.srcs}
+        seq = [
+            instr
+            for instr in selector.seq
+            if not (
+                isinstance(instr, Riscv.LoadImm)
+                and instr.dsts[0].index in constants
+                and instr.dsts[0].index not in read
+            )
+        ]
+
         info = SubroutineInfo(func.entry)
 
-        return (selector.seq, info)
+        return (seq, info)
 
     # use info to construct a RiscvSubroutineEmitter
     def emitSubroutine(self, info: SubroutineInfo):
         return RiscvSubroutineEmitter(self, info)
 
     # return all the string stored in asmcodeprinter
+    # or "" if the asm code has been written to a sink
     def emitEnd(self):
         return self.printer.close()
 
     class RiscvInstrSelector(TACVisitor):
-        def __init__(self, entry: Label) -> None:
-            self.entry = entry
+        def __init__(
+            self, func: TACFunc, constants: dict[int, int], fused: set[Binary]
+        ) -> None:
+            self.func = func
+            self.entry = func.entry
+            self.constants = constants
+            self.fused = fused
+            # the fused instrs met, by the temp they would write
+            self.deferred: dict[int, Binary] = {}
             self.seq = []
+            self.reduction = StrengthReduction(func, self.seq)
+
+        def constantOf(self, temp: Temp) -> Optional[int]:
+            value = self.constants.get(temp.index)
+            if value is not None and -2048 <= value <= 2047:
+                return value
+            return None
 
         # in step11, you need to think about how to deal with globalTemp in almost all the visit functions. 
         def visitReturn(self, instr: Return) -> None:
@@ -67,6 +186,9 @@ class RiscvAsmEmitter(AsmEmitter):
                 self.seq.append(Riscv.LoadImm(Riscv.A0, 0))
             self.seq.append(Riscv.JumpToEpilogue(self.entry))
 
+        def visitAssign(self, instr: Assign) -> None:
+            self.seq.append(Riscv.Move(instr.dst, instr.src))
+
         def visitMark(self, instr: Mark) -> None:
             self.seq.append(Riscv.RiscvLabel(instr.label))
 
@@ -77,10 +199,122 @@ class RiscvAsmEmitter(AsmEmitter):
             self.seq.append(Riscv.Unary(instr.op, instr.dst, instr.operand))
  
         def visitBinary(self, instr: Binary) -> None:
-            self.seq.append(Riscv.Binary(instr.op, instr.dst, instr.lhs, instr.rhs))
+            (op, dst, lhs, rhs) = (instr.op, instr.dst, instr.lhs, instr.rhs)
+            if instr in self.fused:
+                # made part of the branch reading it
+                self.deferred[dst.index] = instr
+            elif op in COMPARISONS:
+                # x < y, negated for GEQ/LEQ
+                (swapped, negated) = COMPARISONS[op]
+                (x, y) = (rhs, lhs) if swapped else (lhs, rhs)
+                self.selectLessThan(dst, x, y, negated)
+            elif op in (BinaryOp.EQU, BinaryOp.NEQ):
+                self.selectEqual(dst, lhs, rhs, op == BinaryOp.NEQ)
+            elif op == BinaryOp.AND:
+                # a nonzero value is true, so each operand becomes 0/1 first
+                (x, y) = (self.func.freshTemp(), self.func.freshTemp())
+                self.seq.append(Riscv.Unary(UnaryOp.SNEZ, x, lhs))
+                self.seq.append(Riscv.Unary(UnaryOp.SNEZ, y, rhs))
+                self.seq.append(Riscv.Binary(BinaryOp.AND, dst, x, y))
+            elif op == BinaryOp.OR:
+                self.seq.append(Riscv.Binary(BinaryOp.OR, dst, lhs, rhs))
+                self.seq.append(Riscv.Unary(UnaryOp.SNEZ, dst, dst))
+            else:
+                self.selectArith(op, dst, lhs, rhs)
+
+        def selectArith(self, op: BinaryOp, dst: Temp, lhs: Temp, rhs: Temp) -> None:
+            if op in (BinaryOp.ADD, BinaryOp.MUL) and lhs.index in self.constants:
+                (lhs, rhs) = (rhs, lhs)
+            value = self.constantOf(rhs)
+            if value is not None:
+                if op == BinaryOp.ADD:
+                    self.seq.append(Riscv.BinaryImm("addi", dst, lhs, value))
+                    return
+                if op == BinaryOp.SUB and value != -2048:
+                    self.seq.append(Riscv.BinaryImm("addi", dst, lhs, -value))
+                    return
+
+            # any constant, not only those fitting in an immediate
+            value = self.constants.get(rhs.index)
+            reductions = {
+                BinaryOp.MUL: self.reduction.selectMul,
+                BinaryOp.DIV: self.reduction.selectDiv,
+                BinaryOp.REM: self.reduction.selectRem,
+            }
+            if value is not None and op in reductions:
+                if reductions[op](dst, lhs, value):
+                    return
+            self.seq.append(Riscv.Binary(op, dst, lhs, rhs))
+
+        # dst = x < y, or x >= y if negated
+        def selectLessThan(self, dst: Temp, x: Temp, y: Temp, negated: bool) -> None:
+            value = self.constantOf(y)
+            other = self.constantOf(x)
+            if value is not None:
+                self.seq.append(Riscv.BinaryImm("slti", dst, x, value))
+            elif other is not None and other != 2047:
+                # c < y is !(y < c + 1)
+                self.seq.append(Riscv.BinaryImm("slti", dst, y, other + 1))
+                negated = not negated
+            else:
+                self.seq.append(Riscv.Binary(BinaryOp.SLT, dst, x, y))
+            if negated:
+                self.seq.append(Riscv.BinaryImm("xori", dst, dst, 1))
+
+        # dst = lhs == rhs, or lhs != rhs if negated
+        def selectEqual(self, dst: Temp, lhs: Temp, rhs: Temp, negated: bool) -> None:
+            if self.constantOf(lhs) is not None:
+                (lhs, rhs) = (rhs, lhs)
+            value = self.constantOf(rhs)
+            if value == 0:
+                diff = lhs
+            elif value is not None:
+                self.seq.append(Riscv.BinaryImm("xori", dst, lhs, value))
+                diff = dst
+            else:
+                self.seq.append(Riscv.Binary(BinaryOp.SUB, dst, lhs, rhs))
+                diff = dst
+            op = UnaryOp.SNEZ if negated else UnaryOp.SEQZ
+            self.seq.append(Riscv.Unary(op, dst, diff))
 
         def visitCondBranch(self, instr: CondBranch) -> None:
-            self.seq.append(Riscv.Branch(instr.cond, instr.label))
+            self.selectBranch(instr.cond, instr.op == CondBranchOp.BNE, instr.label)
+
+        # jump to target if cond is nonzero, or zero if not onTrue
+        def selectBranch(self, cond: Temp, onTrue: bool, target: Label) -> None:
+            instr = self.deferred.pop(cond.index, None)
+            if instr is None:
+                op = "bne" if onTrue else "beq"
+                self.seq.append(Riscv.Branch(cond, target, op))
+                return
+
+            (lhs, rhs) = (instr.lhs, instr.rhs)
+            if instr.op in (BinaryOp.AND, BinaryOp.OR):
+                if (instr.op == BinaryOp.AND) == onTrue:
+                    # both operands decide, the first one may skip the second
+                    skip = self.func.freshLabel()
+                    self.selectBranch(lhs, not onTrue, skip)
+                    self.selectBranch(rhs, onTrue, target)
+                    self.seq.append(Riscv.RiscvLabel(skip))
+                else:
+                    self.selectBranch(lhs, onTrue, target)
+                    self.selectBranch(rhs, onTrue, target)
+            elif instr.op in (BinaryOp.EQU, BinaryOp.NEQ):
+                equal = (instr.op == BinaryOp.EQU) == onTrue
+                op = "beq" if equal else "bne"
+                if self.constants.get(lhs.index) == 0:
+                    (lhs, rhs) = (rhs, lhs)
+                if self.constants.get(rhs.index) == 0:
+                    # compared with x0
+                    self.seq.append(Riscv.Branch(lhs, target, op))
+                else:
+                    self.seq.append(Riscv.Branch(lhs, target, op, rhs))
+            else:
+                (swapped, negated) = COMPARISONS[instr.op]
+                (x, y) = (rhs, lhs) if swapped else (lhs, rhs)
+                # x < y, or x >= y if negated
+                op = "bge" if negated == onTrue else "blt"
+                self.seq.append(Riscv.Branch(x, target, op, y))
         
         def visitBranch(self, instr: Branch) -> None:
             self.seq.append(Riscv.Jump(instr.target))
@@ -89,14 +323,24 @@ class RiscvAsmEmitter(AsmEmitter):
         # in step11, you need to think about how to store the array 
 """
 RiscvAsmEmitter: an SubroutineEmitter for RiscV
+
+The frame of a function holds the stack slots of its temps from sp, and above them the
+CalleeSaved regs written by its body, which is only known once the body is finished:
+the regs written are taken from the buf, after the Peephole. A function needing no
+slot and writing no CalleeSaved reg, e.g. a leaf whose temps all fit in the CallerSaved
+regs, has no frame, and sp is left as it is.
+
+1. offsetOf：临时变量在栈帧中的位置，从 0 开始
+2. emitEnd：根据函数体实际写入的 CalleeSaved 寄存器生成序言和尾声，不需要栈帧时省略
 """
 
 class RiscvSubroutineEmitter(SubroutineEmitter):
     def __init__(self, emitter: RiscvAsmEmitter, info: SubroutineInfo) -> None:
         super().__init__(emitter, info)
         
-        # + 4 is for the RA reg 
-        self.nextLocalOffset = 4 * len(Riscv.CalleeSaved) + 4
+        # the size of the stack slots of the temps, the CalleeSaved regs are saved
+        # above them, see emitEnd
+        self.nextLocalOffset = 0
         
         # the buf which stored all the NativeInstrs in this function
         self.buf: list[NativeInstr] = []
@@ -104,6 +348,10 @@ class RiscvSubroutineEmitter(SubroutineEmitter):
         # from temp to int
         # record where a temp is stored in the stack
         self.offsets = {}
+        # the temps stored to the stack, every temp loaded must be one of them
+        self.stored: set[int] = set()
+
+        self.peephole = emitter.peephole
 
         self.printer.printLabel(info.funcLabel)
 
@@ -116,24 +364,24 @@ class RiscvSubroutineEmitter(SubroutineEmitter):
     # store some temp to stack
     # usually happen when reaching the end of a basicblock
     # in step9, you need to think about the fuction parameters here
-    def emitStoreToStack(self, src: Reg) -> None:
-        if src.temp.index not in self.offsets:
-            self.offsets[src.temp.index] = self.nextLocalOffset
-            self.nextLocalOffset += 4
-        self.buf.append(
-            Riscv.NativeStoreWord(src, Riscv.SP, self.offsets[src.temp.index])
-        )
+    def emitStoreToStack(self, src: Reg, temp: Temp) -> None:
+        self.stored.add(temp.index)
+        self.buf.append(Riscv.NativeStoreWord(src, Riscv.SP, self.offsetOf(temp)))
 
     # load some temp from stack
     # usually happen when using a temp which is stored to stack before
+    # the block storing it may be emitted after the one loading it, see BlockLayout,
+    # so whether it is stored somewhere is only checked by emitEnd
     # in step9, you need to think about the fuction parameters here
     def emitLoadFromStack(self, dst: Reg, src: Temp):
-        if src.index not in self.offsets:
-            raise IllegalArgumentException()
-        else:
-            self.buf.append(
-                Riscv.NativeLoadWord(dst, Riscv.SP, self.offsets[src.index])
-            )
+        self.buf.append(Riscv.NativeLoadWord(dst, Riscv.SP, self.offsetOf(src)))
+
+    # the stack slot of a temp, given on its first store or load
+    def offsetOf(self, temp: Temp) -> int:
+        if temp.index not in self.offsets:
+            self.offsets[temp.index] = self.nextLocalOffset
+            self.nextLocalOffset += 4
+        return self.offsets[temp.index]
 
     # add a NativeInstr to buf
     # when calling the fuction emitEnd, all the instr in buf will be transformed to RiscV code
@@ -145,16 +393,31 @@ class RiscvSubroutineEmitter(SubroutineEmitter):
 
     
     def emitEnd(self):
+        # a temp loaded but never stored
+        if not self.stored.issuperset(self.offsets):
+            raise IllegalArgumentException()
+
+        if self.peephole is not None:
+            self.buf = self.peephole.run(self.buf, self.info.funcLabel.name)
+
+        # the CalleeSaved regs written by the body, and where they are saved
+        written = {reg for instr in self.buf for reg in instr.dsts}
+        saved = [
+            (reg, self.nextLocalOffset + 4 * i)
+            for (i, reg) in enumerate(
+                reg for reg in Riscv.CalleeSaved if reg in written
+            )
+        ]
+        frameSize = self.nextLocalOffset + 4 * len(saved)
+
         self.printer.printComment("start of prologue")
-        self.printer.printInstr(Riscv.SPAdd(-self.nextLocalOffset))
+        if frameSize > 0:
+            self.printer.printInstr(Riscv.SPAdd(-frameSize))
 
         # in step9, you need to think about how to store RA here
         # you can get some ideas from how to save CalleeSaved regs
-        for i in range(len(Riscv.CalleeSaved)):
-            if Riscv.CalleeSaved[i].isUsed():
-                self.printer.printInstr(
-                    Riscv.NativeStoreWord(Riscv.CalleeSaved[i], Riscv.SP, 4 * i)
-                )
+        for (reg, offset) in saved:
+            self.printer.printInstr(Riscv.NativeStoreWord(reg, Riscv.SP, offset))
 
         self.printer.printComment("end of prologue")
         self.printer.println("")
@@ -176,15 +439,16 @@ class RiscvSubroutineEmitter(SubroutineEmitter):
         )
         self.printer.printComment("start of epilogue")
 
-        for i in range(len(Riscv.CalleeSaved)):
-            if Riscv.CalleeSaved[i].isUsed():
-                self.printer.printInstr(
-                    Riscv.NativeLoadWord(Riscv.CalleeSaved[i], Riscv.SP, 4 * i)
-                )
+        for (reg, offset) in saved:
+            self.printer.printInstr(Riscv.NativeLoadWord(reg, Riscv.SP, offset))
 
-        self.printer.printInstr(Riscv.SPAdd(self.nextLocalOffset))
+        if frameSize > 0:
+            self.printer.printInstr(Riscv.SPAdd(frameSize))
         self.printer.printComment("end of epilogue")
         self.printer.println("")
 
         self.printer.printInstr(Riscv.NativeReturn())
         self.printer.println("")
+
+        # the function is finished, write it out instead of holding the whole program
+        self.printer.flush()
@@ -0,0 +1,353 @@
+import argparse
+import json
+import re
+from typing import Callable, Optional
+
+from utils.error import SimulatorError
+
+"""
+RiscvSimulator: an interpreter of RV32IM assembly, to measure the code we generate
+
+It runs the .S output of `main.py --riscv`, i.e. the text of the program, not its binary
+encoding: every instr takes one slot of the text and jumps go to the slot of a label,
+so the pc and the return addresses are slot numbers. The usual pseudo instrs are
+expanded to base instrs (e.g. mv to addi, bnez to bne), and counted as one instr.
+
+The program starts at `main`, with sp at the top of a memory of MEMORY_SIZE bytes
+and ra pointing just after the last instr, so the program stops when main returns.
+
+1. assemble：把汇编文本解析为指令序列和标签表，伪指令在这里展开
+2. run：从入口开始执行，返回 a0 的值、执行的指令数、访存指令数和按 CYCLES 估计的周期数
+"""
+
+MASK = 0xFFFF_FFFF
+
+
+def s32(x: int) -> int:
+    x &= MASK
+    return x - (1 << 32) if x & 0x8000_0000 else x
+
+
+def u32(x: int) -> int:
+    return x & MASK
+
+
+def div(x: int, y: int) -> int:
+    if y == 0:
+        return -1
+    q = abs(x) // abs(y)
+    return q if (x < 0) == (y < 0) else -q
+
+
+def rem(x: int, y: int) -> int:
+    if y == 0:
+        return x
+    return x - y * div(x, y)
+
+
+# from the op to the function computing it, both for the reg and the imm forms
+ALU_OPS: dict[str, Callable[[int, int], int]] = {
+    "add": lambda x, y: x + y,
+    "sub": lambda x, y: x - y,
+    "and": lambda x, y: x & y,
+    "or": lambda x, y: x | y,
+    "xor": lambda x, y: x ^ y,
+    "sll": lambda x, y: x << (y & 31),
+    "srl": lambda x, y: u32(x) >> (y & 31),
+    "sra": lambda x, y: x >> (y & 31),
+    "slt": lambda x, y: int(x < y),
+    "sltu": lambda x, y: int(u32(x) < u32(y)),
+    "mul": lambda x, y: x * y,
+    "mulh": lambda x, y: (x * y) >> 32,
+    "mulhsu": lambda x, y: (x * u32(y)) >> 32,
+    "mulhu": lambda x, y: (u32(x) * u32(y)) >> 32,
+    "div": div,
+    "divu": lambda x, y: u32(x) // u32(y) if y else -1,
+    "rem": rem,
+    "remu": lambda x, y: u32(x) % u32(y) if y else x,
+}
+# from the imm form to the reg form
+ALU_IMM_OPS = {
+    "addi": "add",
+    "andi": "and",
+    "ori": "or",
+    "xori": "xor",
+    "slli": "sll",
+    "srli": "srl",
+    "srai": "sra",
+    "slti": "slt",
+    "sltiu": "sltu",
+}
+
+BRANCH_OPS: dict[str, Callable[[int, int], bool]] = {
+    "beq": lambda x, y: x == y,
+    "bne": lambda x, y: x != y,
+    "blt": lambda x, y: x < y,
+    "bge": lambda x, y: x >= y,
+    "bltu": lambda x, y: u32(x) < u32(y),
+    "bgeu": lambda x, y: u32(x) >= u32(y),
+}
+
+# (size in bytes, signed)
+LOAD_OPS = {
+    "lw": (4, True),
+    "lh": (2, True),
+    "lhu": (2, False),
+    "lb": (1, True),
+    "lbu": (1, False),
+}
+STORE_OPS = {"sw": 4, "sh": 2, "sb": 1}
+
+REG_NAMES = ["zero", "ra", "sp", "gp", "tp", "t0", "t1", "t2", "fp", "s1"]
+REG_NAMES += ["a%d" % i for i in range(8)]
+REG_NAMES += ["s%d" % i for i in range(2, 12)]
+REG_NAMES += ["t%d" % i for i in range(3, 7)]
+REGS = {name: i for (i, name) in enumerate(REG_NAMES)}
+REGS.update({"x%d" % i: i for i in range(32)})
+REGS["s0"] = 8
+
+# the cycles an instr takes on a simple in-order core, one if not listed: a pipelined
+# multiplier, and a divider giving one bit of the quotient per cycle
+CYCLES = {
+    "mul": 4,
+    "mulh": 4,
+    "mulhsu": 4,
+    "mulhu": 4,
+    "div": 34,
+    "divu": 34,
+    "rem": 34,
+    "remu": 34,
+}
+
+# the kinds of the decoded instrs
+(ALU, ALU_IMM, LI, LOAD, STORE, BRANCH, JAL, JALR) = range(8)
+
+MEMORY_OPERAND = re.compile(r"^(-?\w*)\((\w+)\)$")
+
+
+class SimResult:
+    def __init__(
+        self, exitValue: int, instrCount: int, loadStoreCount: int, cycles: int
+    ) -> None:
+        self.exitValue = exitValue
+        self.instrCount = instrCount
+        self.loadStoreCount = loadStoreCount
+        self.cycles = cycles
+
+    def toJson(self) -> dict:
+        return {
+            "exitValue": self.exitValue,
+            "instrCount": self.instrCount,
+            "loadStoreCount": self.loadStoreCount,
+            "cycles": self.cycles,
+        }
+
+
+class RiscvSimulator:
+    MEMORY_SIZE = 1 << 20
+
+    def __init__(self, text: str) -> None:
+        self.instrs: list[tuple] = []
+        self.labels: dict[str, int] = {}
+        # the cycles of each instr
+        self.cycles: list[int] = []
+        self.assemble(text)
+
+    def assemble(self, text: str) -> None:
+        lines: list[tuple[int, str, list[str]]] = []
+        for (lineno, line) in enumerate(text.splitlines(), 1):
+            line = line.split("#", 1)[0].strip()
+            while ":" in line:
+                (label, line) = line.split(":", 1)
+                self.labels[label.strip()] = len(lines)
+                line = line.strip()
+            # directives like .text and .global do not matter here
+            if line and not line.startswith("."):
+                parts = line.split(None, 1)
+                operands = []
+                if len(parts) > 1:
+                    operands = [o.strip() for o in parts[1].split(",")]
+                lines.append((lineno, parts[0], operands))
+
+        for (lineno, op, operands) in lines:
+            try:
+                self.instrs.append(self.decode(op, operands))
+                self.cycles.append(CYCLES.get(op, 1))
+            except (KeyError, ValueError, IndexError):
+                raise SimulatorError(
+                    "line {}: cannot decode '{} {}'".format(
+                        lineno, op, ", ".join(operands)
+                    )
+                )
+
+    def reg(self, name: str) -> int:
+        return REGS[name]
+
+    def imm(self, value: str) -> int:
+        return int(value, 0)
+
+    def label(self, name: str) -> int:
+        if name not in self.labels:
+            raise KeyError(name)
+        return self.labels[name]
+
+    def decode(self, op: str, o: list[str]) -> tuple:
+        reg, imm, label = self.reg, self.imm, self.label
+        zero, ra = REGS["zero"], REGS["ra"]
+
+        if op in ALU_OPS:
+            return (ALU, reg(o[0]), reg(o[1]), reg(o[2]), ALU_OPS[op])
+        if op in ALU_IMM_OPS:
+            return (ALU_IMM, reg(o[0]), reg(o[1]), imm(o[2]), ALU_OPS[ALU_IMM_OPS[op]])
+        if op in LOAD_OPS or op in STORE_OPS:
+            match = MEMORY_OPERAND.match(o[1])
+            if match is None:
+                raise ValueError(o[1])
+            offset = imm(match.group(1) or "0")
+            if op in LOAD_OPS:
+                return (LOAD, reg(o[0]), reg(match.group(2)), offset, LOAD_OPS[op])
+            return (STORE, reg(o[0]), reg(match.group(2)), offset, STORE_OPS[op])
+        if op in BRANCH_OPS:
+            return (BRANCH, reg(o[0]), reg(o[1]), label(o[2]), BRANCH_OPS[op])
+
+        # pseudo instrs
+        if op == "li":
+            return (LI, reg(o[0]), s32(imm(o[1])))
+        if op == "lui":
+            return (LI, reg(o[0]), s32(imm(o[1]) << 12))
+        if op == "mv":
+            return (ALU_IMM, reg(o[0]), reg(o[1]), 0, ALU_OPS["add"])
+        if op == "neg":
+            return (ALU, reg(o[0]), zero, reg(o[1]), ALU_OPS["sub"])
+        if op == "not":
+            return (ALU_IMM, reg(o[0]), reg(o[1]), -1, ALU_OPS["xor"])
+        if op == "seqz":
+            return (ALU_IMM, reg(o[0]), reg(o[1]), 1, ALU_OPS["sltu"])
+        if op == "snez":
+            return (ALU, reg(o[0]), zero, reg(o[1]), ALU_OPS["sltu"])
+        if op == "sltz":
+            return (ALU, reg(o[0]), reg(o[1]), zero, ALU_OPS["slt"])
+        if op == "sgtz":
+            return (ALU, reg(o[0]), zero, reg(o[1]), ALU_OPS["slt"])
+        if op in ("beqz", "bnez", "bltz", "bgez"):
+            return (BRANCH, reg(o[0]), zero, label(o[1]), BRANCH_OPS[op[:-1]])
+        if op in ("blez", "bgtz"):
+            # x <= 0 is 0 >= x, x > 0 is 0 < x
+            swapped = {"blez": "bge", "bgtz": "blt"}[op]
+            return (BRANCH, zero, reg(o[0]), label(o[1]), BRANCH_OPS[swapped])
+        if op in ("bgt", "ble", "bgtu", "bleu"):
+            swapped = {"bgt": "blt", "ble": "bge", "bgtu": "bltu", "bleu": "bgeu"}[op]
+            return (BRANCH, reg(o[1]), reg(o[0]), label(o[2]), BRANCH_OPS[swapped])
+        if op == "j":
+            return (JAL, zero, label(o[0]))
+        if op in ("jal", "call"):
+            if len(o) == 1:
+                return (JAL, ra, label(o[0]))
+            return (JAL, reg(o[0]), label(o[1]))
+        if op == "jr":
+            return (JALR, zero, reg(o[0]))
+        if op == "jalr":
+            return (JALR, ra, reg(o[0]))
+        if op == "ret":
+            return (JALR, zero, ra)
+        if op == "nop":
+            return (ALU_IMM, zero, zero, 0, ALU_OPS["add"])
+        raise KeyError(op)
+
+    def run(self, entry: str = "main", maxSteps: Optional[int] = None) -> SimResult:
+        if entry not in self.labels:
+            raise SimulatorError("no label '{}'".format(entry))
+
+        instrs = self.instrs
+        end = len(instrs)
+        memory = bytearray(self.MEMORY_SIZE)
+        regs = [0] * 32
+        regs[REGS["sp"]] = self.MEMORY_SIZE
+        regs[REGS["ra"]] = end
+
+        pc = self.labels[entry]
+        count = 0
+        loadStores = 0
+        cycles = 0
+        while pc != end:
+            if not 0 <= pc < end:
+                raise SimulatorError("jump to {} out of the program".format(pc))
+            if maxSteps is not None and count >= maxSteps:
+                raise SimulatorError("more than {} instrs executed".format(maxSteps))
+            instr = instrs[pc]
+            kind = instr[0]
+            count += 1
+            cycles += self.cycles[pc]
+            pc += 1
+
+            if kind == ALU:
+                if instr[1]:
+                    regs[instr[1]] = s32(instr[4](regs[instr[2]], regs[instr[3]]))
+            elif kind == ALU_IMM:
+                if instr[1]:
+                    regs[instr[1]] = s32(instr[4](regs[instr[2]], instr[3]))
+            elif kind == LI:
+                if instr[1]:
+                    regs[instr[1]] = instr[2]
+            elif kind == BRANCH:
+                if instr[4](regs[instr[1]], regs[instr[2]]):
+                    pc = instr[3]
+            elif kind == LOAD:
+                loadStores += 1
+                (size, signed) = instr[4]
+                addr = self.checkAddress(regs[instr[2]] + instr[3], size)
+                if instr[1]:
+                    regs[instr[1]] = int.from_bytes(
+                        memory[addr : addr + size], "little", signed=signed
+                    )
+            elif kind == STORE:
+                loadStores += 1
+                size = instr[4]
+                addr = self.checkAddress(regs[instr[2]] + instr[3], size)
+                value = regs[instr[1]] & ((1 << (8 * size)) - 1)
+                memory[addr : addr + size] = value.to_bytes(size, "little")
+            elif kind == JAL:
+                if instr[1]:
+                    regs[instr[1]] = pc
+                pc = instr[2]
+            else:
+                target = regs[instr[2]]
+                if instr[1]:
+                    regs[instr[1]] = pc
+                pc = target
+
+        return SimResult(regs[REGS["a0"]], count, loadStores, cycles)
+
+    def checkAddress(self, addr: int, size: int) -> int:
+        if not 0 <= addr <= self.MEMORY_SIZE - size:
+            raise SimulatorError("access to address {} out of the memory".format(addr))
+        return addr
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="RV32IM simulator")
+    parser.add_argument("input", type=str, help="the .S file to run")
+    parser.add_argument("--entry", type=str, default="main")
+    parser.add_argument(
+        "--max-steps", type=int, help="stop with an error after so many instrs"
+    )
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parseArgs()
+    with open(args.input) as f:
+        result = RiscvSimulator(f.read()).run(args.entry, args.max_steps)
+
+    if args.json:
+        print(json.dumps(result.toJson()))
+    else:
+        print("exit value: {}".format(result.exitValue))
+        print("instrs: {}".format(result.instrCount))
+        print("loads/stores: {}".format(result.loadStoreCount))
+        print("cycles: {}".format(result.cycles))
+
+
+if __name__ == "__main__":
+    main()
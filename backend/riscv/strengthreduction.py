@@ -0,0 +1,188 @@
+from typing import Optional
+
+from backend.interp.tacinterpreter import s32
+from utils.riscv import Riscv
+from utils.tac.tacfunc import TACFunc
+from utils.tac.tacinstr import TACInstr
+from utils.tac.tacop import BinaryOp, UnaryOp
+from utils.tac.temp import Temp
+
+"""
+StrengthReduction: the instrs of RiscvInstrSelector for a MUL/DIV/REM by a constant
+
+mul, and above all div and rem, take many cycles on the in-order cores (see CYCLES of
+RiscvSimulator), so the operations by a constant are made of cheaper instrs:
+
+    x * c       c or -c is 2^a or 2^a - 2^b, or c is 2^a + 2^b, modulo 2^32: a shift
+                of x, or the sum or difference of two, negated for -c = 2^a
+    x / 2^k     (x + (x < 0 ? 2^k - 1 : 0)) >> k, rounding towards zero as in C
+    x / c       the high word of x * M, shifted right by s, plus one if x < 0, where the
+                magic number M and the shift s are given by magicOf (Hacker's Delight,
+                chapter 10)
+    x % c       x - (x / c) * c, the quotient and the product computed as above
+
+A negative divisor divides by -c and negates the quotient, and x % c is x % -c. Each
+method returns False, emitting nothing, if the constant is better left to the generic
+instr, e.g. a division by zero, which does not trap but gives -1.
+
+1. selectMul/selectDiv/selectRem：为乘、除、取模常量生成指令序列，放入 seq
+2. magicOf：除数的魔数和移位量
+"""
+
+MASK = 0xFFFF_FFFF
+
+
+# M and s such that x / d == (high word of M * x, plus x if M < 0) >> s, rounded towards
+# zero, for 2 <= d < 2^31
+def magicOf(d: int) -> tuple[int, int]:
+    two31 = 1 << 31
+    anc = two31 - 1 - two31 % d
+    p = 31
+    (q1, r1) = divmod(two31, anc)
+    (q2, r2) = divmod(two31, d)
+    while True:
+        p += 1
+        (q1, r1) = (2 * q1, 2 * r1)
+        if r1 >= anc:
+            (q1, r1) = (q1 + 1, r1 - anc)
+        (q2, r2) = (2 * q2, 2 * r2)
+        if r2 >= d:
+            (q2, r2) = (q2 + 1, r2 - d)
+        delta = d - r2
+        if not (q1 < delta or (q1 == delta and r1 == 0)):
+            break
+    return (s32(q2 + 1), p - 32)
+
+
+# the exponent of a power of two, or None
+def log2Of(value: int) -> Optional[int]:
+    if value > 0 and value & (value - 1) == 0:
+        return value.bit_length() - 1
+    return None
+
+
+class StrengthReduction:
+    def __init__(self, func: TACFunc, seq: list[TACInstr]) -> None:
+        self.func = func
+        self.seq = seq
+
+    def emitShift(self, x: Temp, shift: int) -> Temp:
+        if shift == 0:
+            return x
+        temp = self.func.freshTemp()
+        self.seq.append(Riscv.BinaryImm("slli", temp, x, shift))
+        return temp
+
+    # dst = x * c
+    def selectMul(self, dst: Temp, x: Temp, c: int) -> bool:
+        value = c & MASK
+        negated = -c & MASK
+        if value == 0:
+            self.seq.append(Riscv.LoadImm(dst, 0))
+            return True
+        shift = log2Of(value)
+        if shift is not None:
+            self.seq.append(Riscv.BinaryImm("slli", dst, x, shift))
+            return True
+        shift = log2Of(negated)
+        if shift is not None:
+            self.seq.append(Riscv.Unary(UnaryOp.NEG, dst, self.emitShift(x, shift)))
+            return True
+
+        # 2^a + 2^b, with a > b
+        low = value & -value
+        high = log2Of(value - low)
+        if high is not None:
+            high = self.emitShift(x, high)
+            low = self.emitShift(x, low.bit_length() - 1)
+            self.seq.append(Riscv.Binary(BinaryOp.ADD, dst, high, low))
+            return True
+        # 2^a - 2^b, or -c is, giving 2^b - 2^a
+        for (factor, negative) in ((value, False), (negated, True)):
+            low = factor & -factor
+            high = log2Of(factor + low)
+            if high is not None and high < 32:
+                high = self.emitShift(x, high)
+                low = self.emitShift(x, low.bit_length() - 1)
+                if negative:
+                    (high, low) = (low, high)
+                self.seq.append(Riscv.Binary(BinaryOp.SUB, dst, high, low))
+                return True
+        return False
+
+    # dst = x / c, rounded towards zero
+    def selectDiv(self, dst: Temp, x: Temp, c: int) -> bool:
+        if c == 0:
+            return False
+        if c == 1:
+            self.seq.append(Riscv.Move(dst, x))
+            return True
+        if c == -1:
+            self.seq.append(Riscv.Unary(UnaryOp.NEG, dst, x))
+            return True
+
+        quotient = self.func.freshTemp() if c < 0 else dst
+        shift = log2Of(abs(c))
+        if shift is not None:
+            self.emitDivPow2(quotient, x, shift)
+        else:
+            self.emitDivMagic(quotient, x, abs(c))
+        if c < 0:
+            self.seq.append(Riscv.Unary(UnaryOp.NEG, dst, quotient))
+        return True
+
+    # dst = x % c, of the sign of x
+    def selectRem(self, dst: Temp, x: Temp, c: int) -> bool:
+        if c == 0:
+            return False
+        if c in (1, -1):
+            self.seq.append(Riscv.LoadImm(dst, 0))
+            return True
+
+        c = abs(c)
+        quotient = self.func.freshTemp()
+        product = self.func.freshTemp()
+        shift = log2Of(c)
+        if shift is not None:
+            self.emitDivPow2(quotient, x, shift)
+            self.seq.append(Riscv.BinaryImm("slli", product, quotient, shift))
+        else:
+            self.emitDivMagic(quotient, x, c)
+            if not self.selectMul(product, quotient, c):
+                factor = self.func.freshTemp()
+                self.seq.append(Riscv.LoadImm(factor, c))
+                self.seq.append(Riscv.Binary(BinaryOp.MUL, product, quotient, factor))
+        self.seq.append(Riscv.Binary(BinaryOp.SUB, dst, x, product))
+        return True
+
+    # dst = x / 2^shift, adding 2^shift - 1 to a negative x first
+    def emitDivPow2(self, dst: Temp, x: Temp, shift: int) -> None:
+        bias = self.func.freshTemp()
+        if shift == 1:
+            self.seq.append(Riscv.BinaryImm("srli", bias, x, 31))
+        else:
+            sign = self.func.freshTemp()
+            self.seq.append(Riscv.BinaryImm("srai", sign, x, 31))
+            self.seq.append(Riscv.BinaryImm("srli", bias, sign, 32 - shift))
+        sum = self.func.freshTemp()
+        self.seq.append(Riscv.Binary(BinaryOp.ADD, sum, x, bias))
+        self.seq.append(Riscv.BinaryImm("srai", dst, sum, shift))
+
+    # dst = x / d, for a d >= 3 which is not a power of two
+    def emitDivMagic(self, dst: Temp, x: Temp, d: int) -> None:
+        (magic, shift) = magicOf(d)
+        factor = self.func.freshTemp()
+        high = self.func.freshTemp()
+        self.seq.append(Riscv.LoadImm(factor, magic))
+        self.seq.append(Riscv.MulHigh(high, x, factor))
+        if magic < 0:
+            sum = self.func.freshTemp()
+            self.seq.append(Riscv.Binary(BinaryOp.ADD, sum, high, x))
+            high = sum
+        shifted = high
+        if shift > 0:
+            shifted = self.func.freshTemp()
+            self.seq.append(Riscv.BinaryImm("srai", shifted, high, shift))
+        sign = self.func.freshTemp()
+        self.seq.append(Riscv.BinaryImm("srli", sign, x, 31))
+        self.seq.append(Riscv.Binary(BinaryOp.ADD, dst, shifted, sign))
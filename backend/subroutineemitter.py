@@ -27,7 +27,7 @@ class SubroutineEmitter(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def emitStoreToStack(self, src: Reg) -> None:
+    def emitStoreToStack(self, src: Reg, temp: Temp) -> None:
         raise NotImplementedError
 
     @abstractmethod
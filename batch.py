@@ -0,0 +1,62 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, TextIO
+
+"""
+The batch mode, started by `python main.py --batch PATH... [--jobs N]`
+
+Each C file is compiled to the .S file next to it, e.g. a/b.c to a/b.S. The files
+are spread over a pool of worker processes. The workers are forked from the main
+process, so the lexer, parser and backend are loaded only once, and each worker
+compiles its files one after another with a CompilerSession of its own.
+
+1. collectInputs：展开命令行给出的路径，目录中的 .c 文件按路径排序
+2. compileAll：并行编译所有文件，按输入顺序报告每个文件的结果和总时间，全部成功时返回 True
+"""
+
+
+def collectInputs(paths: list[str]) -> list[str]:
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for (root, _, files) in os.walk(path):
+                found += [os.path.join(root, f) for f in files if f.endswith(".c")]
+            inputs += sorted(found)
+        else:
+            inputs.append(path)
+    return inputs
+
+
+def compileAll(
+    compile: Callable[[str], dict],
+    inputs: list[str],
+    workers: Optional[int],
+    out: TextIO,
+) -> bool:
+    start = time.perf_counter()
+    failed = 0
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(workers) as executor:
+        # hand out several small files at once to save round trips
+        chunksize = max(1, len(inputs) // (workers * 8))
+        for (path, result) in zip(
+            inputs, executor.map(compile, inputs, chunksize=chunksize)
+        ):
+            if result["ok"]:
+                print("ok     {}".format(path), file=out)
+            else:
+                failed += 1
+                print("error  {}".format(path), file=out)
+                for line in result["error"].splitlines():
+                    print("       {}".format(line), file=out)
+
+    print(
+        "{} files, {} failed, {} workers, {:.2f}s".format(
+            len(inputs), failed, workers, time.perf_counter() - start
+        ),
+        file=out,
+    )
+    return failed == 0
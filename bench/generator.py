@@ -0,0 +1,113 @@
+"""
+Generator of synthetic MiniDecaf programs of a given size, for benchmarking the compiler.
+
+Only the constructs supported by every stage of the compiler are used: int literals,
+`+` and unary `-`, if/while/break/return and declarations. Every program is a single
+`main` function, made of the same unit repeated until the program reaches the size:
+
+    nested      if/while statements nested DEPTH deep
+    straight    short arithmetic expression statements, one per line
+    locals      declarations of distinct locals with initializers
+    chain       expression statements adding up CHAIN literals each
+
+The visitors of the compiler are recursive, so the nesting depth and the length of a
+chain are kept moderate, and are the same for every size.
+
+    python -m bench.generator --kind nested --size 1M --output nested-1M.c
+"""
+
+import argparse
+import random
+from typing import Callable
+
+# the nesting depth of `nested` and the number of literals of a `chain` statement
+DEPTH = 16
+CHAIN = 64
+
+
+def nestedUnit(rng: random.Random, index: int) -> list[str]:
+    lines = []
+    for level in range(DEPTH):
+        indent = "    " * (level + 1)
+        if level % 2 == 0:
+            lines.append("{}if ({}) {{".format(indent, rng.randint(0, 1)))
+        else:
+            lines.append("{}while ({}) {{".format(indent, rng.randint(0, 1)))
+    indent = "    " * (DEPTH + 1)
+    lines.append("{}{} + {};".format(indent, index, rng.randint(0, 99)))
+    for level in reversed(range(DEPTH)):
+        indent = "    " * (level + 1)
+        if level % 2 == 1:
+            lines.append("{}    break;".format(indent))
+        lines.append("{}}}".format(indent))
+    return lines
+
+
+def straightUnit(rng: random.Random, index: int) -> list[str]:
+    return [
+        "    {} + -{} + {};".format(index, rng.randint(0, 99), rng.randint(0, 99))
+    ]
+
+
+def localsUnit(rng: random.Random, index: int) -> list[str]:
+    return ["    int v{} = {};".format(index, rng.randint(0, 99))]
+
+
+def chainUnit(rng: random.Random, index: int) -> list[str]:
+    terms = [str(rng.randint(0, 99)) for _ in range(CHAIN)]
+    return ["    " + " + ".join(terms) + ";"]
+
+
+KINDS: dict[str, Callable[[random.Random, int], list[str]]] = {
+    "nested": nestedUnit,
+    "straight": straightUnit,
+    "locals": localsUnit,
+    "chain": chainUnit,
+}
+
+
+# a program of about size bytes, the same for the same arguments
+def generate(kind: str, size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    unit = KINDS[kind]
+    lines = ["int main() {"]
+    length = len(lines[0]) + 1
+    index = 0
+    while length < size:
+        for line in unit(rng, index):
+            lines.append(line)
+            length += len(line) + 1
+        index += 1
+    lines += ["    return 0;", "}", ""]
+    return "\n".join(lines)
+
+
+# "1K", "10M" etc. to a number of bytes
+def parseSize(size: str) -> int:
+    units = {"K": 1024, "M": 1024 * 1024}
+    if size[-1:].upper() in units:
+        return int(float(size[:-1]) * units[size[-1:].upper()])
+    return int(size)
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="synthetic MiniDecaf programs")
+    parser.add_argument("--kind", choices=KINDS.keys(), default="nested")
+    parser.add_argument("--size", type=str, default="1K", help="e.g. 4096, 1K, 10M")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, help="the C file to write, or stdout")
+    return parser.parse_args()
+
+
+def main():
+    args = parseArgs()
+    code = generate(args.kind, parseSize(args.size), args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(code)
+    else:
+        print(code, end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark of the loop-invariant code motion, in the instrs executed by RiscvSimulator.
+
+The frontend has no variables yet, so the program is written in TAC directly: two nested
+loops of OUTER and INNER iterations adding up values of which some do not change in the
+inner loop, or in either loop. x and y are written twice, so that they are not known to
+be constants and the invariant values are left to LICM rather than folded by SCCP. The
+program is compiled at each optimization level, with and without licm, and must return
+what the TACInterpreter returns:
+
+    python -m bench.licm --outer 30 --inner 30 --levels 1 2 --regallocs linear color
+"""
+
+import argparse
+import json
+
+from backend.interp.tacinterpreter import TACInterpreter
+from backend.opt.optimizer import OPT_LEVELS, Optimizer
+from backend.riscv.riscvsimulator import RiscvSimulator
+from compilersession import REG_ALLOCS, CompilerSession
+from utils.tac.programwriter import ProgramWriter
+from utils.tac.tacop import BinaryOp, CondBranchOp, UnaryOp
+from utils.tac.tacprog import TACProg
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="loop-invariant code motion benchmark")
+    parser.add_argument("--outer", type=int, default=30)
+    parser.add_argument("--inner", type=int, default=30)
+    levels = [level for level in OPT_LEVELS if "licm" in OPT_LEVELS[level]]
+    parser.add_argument("--levels", nargs="+", type=int, choices=levels, default=levels)
+    parser.add_argument(
+        "--regallocs",
+        nargs="+",
+        choices=REG_ALLOCS.keys(),
+        default=["linear", "color"],
+    )
+    parser.add_argument("--json", type=str, help="also write the results to this file")
+    return parser.parse_args()
+
+
+# sum of x * y - x + i * y + j over the iterations of i and j
+def loopProg(outer: int, inner: int) -> TACProg:
+    pw = ProgramWriter(["main"])
+    mv = pw.visitMainFunc()
+    (x, y, i, j, sum) = (mv.freshTemp() for _ in range(5))
+    # two definitions each, so that they are not known to be constants
+    mv.visitAssignment(x, mv.visitLoad(0))
+    mv.visitAssignment(x, mv.visitLoad(7))
+    mv.visitAssignment(y, mv.visitLoad(0))
+    mv.visitAssignment(y, mv.visitLoad(-3))
+    mv.visitAssignment(i, mv.visitLoad(outer))
+    mv.visitAssignment(sum, mv.visitLoad(0))
+
+    (outerLoop, innerLoop, innerEnd, end) = (mv.freshLabel() for _ in range(4))
+    mv.visitLabel(outerLoop)
+    mv.visitCondBranch(CondBranchOp.BEQ, i, end)
+    mv.visitAssignment(j, mv.visitLoad(inner))
+    mv.visitLabel(innerLoop)
+    mv.visitCondBranch(CondBranchOp.BEQ, j, innerEnd)
+    # invariant in both loops
+    both = mv.visitBinary(
+        BinaryOp.ADD,
+        mv.visitBinary(BinaryOp.MUL, x, y),
+        mv.visitUnary(UnaryOp.NEG, x),
+    )
+    # invariant in the inner loop only
+    outerOnly = mv.visitBinary(BinaryOp.MUL, i, y)
+    value = mv.visitBinary(BinaryOp.ADD, both, outerOnly)
+    mv.visitAssignment(sum, mv.visitBinary(BinaryOp.ADD, sum, value))
+    mv.visitAssignment(sum, mv.visitBinary(BinaryOp.ADD, sum, j))
+    mv.visitAssignment(j, mv.visitBinary(BinaryOp.SUB, j, mv.visitLoad(1)))
+    mv.visitBranch(innerLoop)
+    mv.visitLabel(innerEnd)
+    mv.visitAssignment(i, mv.visitBinary(BinaryOp.SUB, i, mv.visitLoad(1)))
+    mv.visitBranch(outerLoop)
+    mv.visitLabel(end)
+    mv.visitReturn(sum)
+    mv.visitEnd()
+    return pw.visitEnd()
+
+
+def run(outer: int, inner: int, passes: list[str], regAlloc: str) -> dict:
+    (expected, _) = TACInterpreter().run(loopProg(outer, inner))
+    prog = Optimizer(passes).transform(loopProg(outer, inner))
+    asm = CompilerSession().asm(prog, regAlloc)
+    result = RiscvSimulator(asm).run()
+    if result.exitValue != expected:
+        raise AssertionError(
+            "{} with {}: {} instead of {}".format(
+                ",".join(passes), regAlloc, result.exitValue, expected
+            )
+        )
+    return result.toJson()
+
+
+def main():
+    args = parseArgs()
+
+    print(
+        "{:<8}{:<10}{:>14}{:>14}{:>10}".format(
+            "level", "regalloc", "instrs", "(no licm)", "saved"
+        )
+    )
+    results = []
+    for level in args.levels:
+        passes = OPT_LEVELS[level]
+        withoutLicm = [name for name in passes if name != "licm"]
+        for regAlloc in args.regallocs:
+            licm = run(args.outer, args.inner, passes, regAlloc)
+            baseline = run(args.outer, args.inner, withoutLicm, regAlloc)
+            saved = 1 - licm["instrCount"] / baseline["instrCount"]
+            print(
+                "{:<8}{:<10}{:>14}{:>14}{:>9.1%}".format(
+                    "-O{}".format(level),
+                    regAlloc,
+                    licm["instrCount"],
+                    baseline["instrCount"],
+                    saved,
+                ),
+                flush=True,
+            )
+            results.append(
+                {
+                    "level": level,
+                    "regalloc": regAlloc,
+                    "licm": licm,
+                    "withoutLicm": baseline,
+                }
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
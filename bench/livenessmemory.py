@@ -0,0 +1,99 @@
+"""
+Memory benchmark of the per-instruction liveness results.
+
+It builds a synthetic function of about `--size` TAC instrs, in which `--live` temps stay
+live through the whole function, runs the liveness analysis on it and reports the peak RSS.
+With `--materialize`, the full liveIn/liveOut sets of every loc are kept as well, which is
+what LivenessAnalyzer used to store, so the two runs can be compared:
+
+    python -m bench.livenessmemory --size 100000 --live 64
+    python -m bench.livenessmemory --size 100000 --live 64 --materialize
+
+Each run should be done in a fresh process, as the peak RSS of a process never goes down.
+"""
+
+import argparse
+import resource
+import time
+
+from backend.dataflow.bitvectorlivenessanalyzer import BitVectorLivenessAnalyzer
+from backend.dataflow.cfgbuilder import CFGBuilder
+from backend.dataflow.livenessanalyzer import LivenessAnalyzer
+from backend.riscv.riscvasmemitter import RiscvAsmEmitter
+from utils.riscv import Riscv
+from utils.tac.programwriter import ProgramWriter
+from utils.tac.tacfunc import TACFunc
+from utils.tac.tacop import BinaryOp
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="liveness memory benchmark")
+    parser.add_argument("--size", type=int, default=100000, help="number of instrs")
+    parser.add_argument("--live", type=int, default=64, help="number of long-lived temps")
+    parser.add_argument(
+        "--liveness", choices=["iterative", "bitvector"], default="iterative"
+    )
+    parser.add_argument(
+        "--materialize",
+        action="store_true",
+        help="keep the full liveIn/liveOut sets of every loc",
+    )
+    return parser.parse_args()
+
+
+# a straight-line function that sums `live` constants again and again
+def syntheticFunc(size: int, live: int) -> TACFunc:
+    pw = ProgramWriter(["main"])
+    mv = pw.visitMainFunc()
+    keep = [mv.visitLoad(i) for i in range(live)]
+    acc = mv.visitLoad(0)
+    while len(mv.func.instrSeq) < size - live:
+        acc = mv.visitBinary(BinaryOp.ADD, acc, keep[len(mv.func.instrSeq) % live])
+    for temp in keep:
+        acc = mv.visitBinary(BinaryOp.ADD, acc, temp)
+    mv.visitReturn(acc)
+    mv.visitEnd()
+    return pw.visitEnd().funcs[0]
+
+
+def peakRSS() -> int:
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def main():
+    args = parseArgs()
+
+    func = syntheticFunc(args.size, args.live)
+    emitter = RiscvAsmEmitter(Riscv.AllocatableRegs, Riscv.CallerSaved)
+    seq, _ = emitter.selectInstr(func)
+    cfg = CFGBuilder().buildFrom(seq)
+    before = peakRSS()
+
+    start = time.perf_counter()
+    analyzer = {"iterative": LivenessAnalyzer, "bitvector": BitVectorLivenessAnalyzer}[
+        args.liveness
+    ]()
+    analyzer.accept(cfg)
+
+    kept = []
+    if args.materialize:
+        for bb in cfg.iterator():
+            for loc in bb.iterator():
+                kept.append((bb.liveInAt(loc).copy(), bb.liveOutAt(loc).copy()))
+    elapsed = time.perf_counter() - start
+
+    print(
+        "{} instrs, {} live temps{}: {:.2f}s, peak RSS {} MB (before analysis {} MB)".format(
+            len(seq),
+            args.live,
+            ", materialized" if args.materialize else "",
+            elapsed,
+            peakRSS(),
+            before,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark of every stage of the compiler on the synthetic programs of bench.generator.
+
+Each program is compiled by a CompilerSession, and the stages are timed by its PassTimer:
+parse (parser.parse), namer and typer (Namer/Typer.transform), tacgen (TACGen.transform)
+and asm (Asm.transform). The throughput of a stage is the number of source lines divided
+by its time, so a stage whose throughput drops as the programs grow is super-linear:
+
+    python -m bench.pipeline --kinds nested straight --sizes 1K 10K 100K 1M
+
+A stage which fails, e.g. with a RecursionError, is reported, and the later stages of
+the program are skipped.
+"""
+
+import argparse
+import json
+import os
+import time
+
+from bench.generator import KINDS, generate, parseSize
+from compilersession import LIVENESS_ANALYZERS, REG_ALLOCS, CompilerSession
+from utils.passtimer import PassTimer
+
+STAGES = ["parse", "namer", "typer", "tacgen", "asm"]
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="compiler pipeline benchmark")
+    parser.add_argument(
+        "--kinds", nargs="+", choices=KINDS.keys(), default=list(KINDS.keys())
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", default=["1K", "10K", "100K"], help="e.g. 1K 1M 10M"
+    )
+    parser.add_argument("--regalloc", choices=REG_ALLOCS.keys(), default="brute")
+    parser.add_argument(
+        "--liveness", choices=LIVENESS_ANALYZERS.keys(), default="iterative"
+    )
+    parser.add_argument("--json", type=str, help="also write the results to this file")
+    return parser.parse_args()
+
+
+# the seconds spent in each stage, stops at the first stage which fails
+def runStages(code: str, regAlloc: str, liveness: str) -> tuple[dict, str]:
+    timer = PassTimer()
+    session = CompilerSession(timer)
+    error = ""
+    try:
+        program = session.parse(code)
+        if session.parser.error_stack:
+            raise SyntaxError(str(session.parser.error_stack[0]))
+        prog = session.tac(program)
+        with open(os.devnull, "w") as sink:
+            session.asm(prog, regAlloc, liveness, sink)
+    except Exception as e:
+        error = "{}: {}".format(type(e).__name__, e).splitlines()[0]
+
+    seconds = {
+        stats.name: stats.seconds
+        for stats in timer.stats.values()
+        if stats.name in STAGES
+    }
+    return seconds, error
+
+
+def main():
+    args = parseArgs()
+
+    print(
+        "{:<10}{:>8}{:>10}".format("kind", "size", "lines")
+        + "".join("{:>12}".format(stage) for stage in STAGES)
+        + "   (lines/s)"
+    )
+    results = []
+    for kind in args.kinds:
+        for size in args.sizes:
+            code = generate(kind, parseSize(size))
+            lines = code.count("\n")
+            start = time.perf_counter()
+            seconds, error = runStages(code, args.regalloc, args.liveness)
+            total = time.perf_counter() - start
+
+            row = "{:<10}{:>8}{:>10}".format(kind, size, lines)
+            for stage in STAGES:
+                if stage in seconds:
+                    row += "{:>12.0f}".format(lines / max(seconds[stage], 1e-9))
+                else:
+                    row += "{:>12}".format("-")
+            print(row + "   {:.2f}s {}".format(total, error), flush=True)
+
+            results.append(
+                {
+                    "kind": kind,
+                    "size": parseSize(size),
+                    "lines": lines,
+                    "seconds": seconds,
+                    "error": error,
+                }
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
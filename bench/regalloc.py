@@ -0,0 +1,109 @@
+"""
+Benchmark of the register allocators under register pressure, in the instrs and the
+loads/stores executed by RiscvSimulator.
+
+The frontend has no variables yet, so the program is written in TAC directly: EXTRA
+values are computed before a loop of ITERATIONS iterations and all added to a sum in
+every iteration, so that they are all live across the whole loop. The values are made
+from a variable written twice, so that they are not known to be constants and have to
+be kept in regs or on the stack. Every allocator must return what the TACInterpreter
+returns:
+
+    python -m bench.regalloc --iterations 100 --extra 10 20 30 40
+"""
+
+import argparse
+import json
+
+from backend.interp.tacinterpreter import TACInterpreter
+from backend.riscv.riscvsimulator import RiscvSimulator
+from compilersession import REG_ALLOCS, CompilerSession
+from utils.tac.programwriter import ProgramWriter
+from utils.tac.tacop import BinaryOp, CondBranchOp
+from utils.tac.tacprog import TACProg
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="register allocator benchmark")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--extra", nargs="+", type=int, default=[10, 20, 30, 40])
+    parser.add_argument(
+        "--regallocs", nargs="+", choices=REG_ALLOCS.keys(), default=list(REG_ALLOCS)
+    )
+    parser.add_argument("--json", type=str, help="also write the results to this file")
+    return parser.parse_args()
+
+
+# the loop adding up i and the extra values, each of them live across the loop
+def pressureProg(iterations: int, extra: int) -> TACProg:
+    pw = ProgramWriter(["main"])
+    mv = pw.visitMainFunc()
+    (x, i, sum) = (mv.freshTemp(), mv.freshTemp(), mv.freshTemp())
+    # two definitions, so that x and the values are not known to be constants
+    mv.visitAssignment(x, mv.visitLoad(0))
+    mv.visitAssignment(x, mv.visitLoad(1))
+    values = [mv.visitBinary(BinaryOp.ADD, x, mv.visitLoad(k)) for k in range(extra)]
+    mv.visitAssignment(i, mv.visitLoad(iterations))
+    mv.visitAssignment(sum, mv.visitLoad(0))
+    one = mv.visitLoad(1)
+
+    (loop, end) = (mv.freshLabel(), mv.freshLabel())
+    mv.visitLabel(loop)
+    mv.visitCondBranch(CondBranchOp.BEQ, i, end)
+    mv.visitAssignment(sum, mv.visitBinary(BinaryOp.ADD, sum, i))
+    for value in values:
+        mv.visitAssignment(sum, mv.visitBinary(BinaryOp.ADD, sum, value))
+    mv.visitAssignment(i, mv.visitBinary(BinaryOp.SUB, i, one))
+    mv.visitBranch(loop)
+    mv.visitLabel(end)
+    mv.visitReturn(sum)
+    mv.visitEnd()
+    return pw.visitEnd()
+
+
+def run(iterations: int, extra: int, regAlloc: str) -> dict:
+    (expected, _) = TACInterpreter().run(pressureProg(iterations, extra))
+    asm = CompilerSession().asm(pressureProg(iterations, extra), regAlloc)
+    result = RiscvSimulator(asm).run()
+    if result.exitValue != expected:
+        raise AssertionError(
+            "{} with {} values: {} instead of {}".format(
+                regAlloc, extra, result.exitValue, expected
+            )
+        )
+    return result.toJson()
+
+
+def main():
+    args = parseArgs()
+
+    print(
+        "{:<8}".format("extra")
+        + "".join("{:>22}".format(name) for name in args.regallocs)
+    )
+    print(
+        "{:<8}".format("")
+        + "".join("{:>12}{:>10}".format("instrs", "ld/st") for _ in args.regallocs)
+    )
+    results = []
+    for extra in args.extra:
+        row = {name: run(args.iterations, extra, name) for name in args.regallocs}
+        print(
+            "{:<8}".format(extra)
+            + "".join(
+                "{:>12}{:>10}".format(
+                    row[name]["instrCount"], row[name]["loadStoreCount"]
+                )
+                for name in args.regallocs
+            ),
+            flush=True,
+        )
+        results.append({"extra": extra, "iterations": args.iterations, **row})
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
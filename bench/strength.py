@@ -0,0 +1,128 @@
+"""
+Microbenchmark of the MUL/DIV/REM by a constant, in the cycles of RiscvSimulator.
+
+The frontend has no `*`, `/` or `%` yet, so each program is written in TAC directly: a
+loop of ITERATIONS iterations adding up x op c, x stepping through negative and positive
+values. The same loop is compiled twice, with c a constant, which StrengthReduction
+turns into shifts, adds and mulh, and with c a variable written twice, which is left to
+the generic mul/div/rem. Both runs must return what the TACInterpreter returns:
+
+    python -m bench.strength --ops div rem --constants 3 -8 10 --regalloc linear
+"""
+
+import argparse
+import json
+
+from backend.interp.tacinterpreter import TACInterpreter
+from backend.riscv.riscvsimulator import RiscvSimulator
+from compilersession import REG_ALLOCS, CompilerSession
+from utils.tac.programwriter import ProgramWriter
+from utils.tac.tacop import BinaryOp, CondBranchOp
+from utils.tac.tacprog import TACProg
+
+OPS = {"mul": BinaryOp.MUL, "div": BinaryOp.DIV, "rem": BinaryOp.REM}
+
+ITERATIONS = 1000
+# x starts at START and is increased by STEP, both odd so that every remainder shows up
+START = -1_000_001
+STEP = 2_001
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="MUL/DIV/REM by constant benchmark")
+    parser.add_argument("--ops", nargs="+", choices=OPS.keys(), default=list(OPS))
+    parser.add_argument(
+        "--constants",
+        nargs="+",
+        type=int,
+        default=[2, 3, 7, 10, -8, 1000, 641],
+    )
+    parser.add_argument("--regalloc", choices=REG_ALLOCS.keys(), default="linear")
+    parser.add_argument("--json", type=str, help="also write the results to this file")
+    return parser.parse_args()
+
+
+# the loop computing the sum of x op c, c is a variable if generic
+def loopProg(op: BinaryOp, constant: int, generic: bool) -> TACProg:
+    pw = ProgramWriter(["main"])
+    mv = pw.visitMainFunc()
+    (x, c, i, sum) = (mv.freshTemp(), mv.freshTemp(), mv.freshTemp(), mv.freshTemp())
+    mv.visitAssignment(x, mv.visitLoad(START))
+    mv.visitAssignment(i, mv.visitLoad(ITERATIONS))
+    mv.visitAssignment(sum, mv.visitLoad(0))
+    if generic:
+        # two definitions, so that it is not known to be a constant
+        mv.visitAssignment(c, mv.visitLoad(0))
+        mv.visitAssignment(c, mv.visitLoad(constant))
+    else:
+        c = mv.visitLoad(constant)
+    step = mv.visitLoad(STEP)
+    one = mv.visitLoad(1)
+
+    (loop, end) = (mv.freshLabel(), mv.freshLabel())
+    mv.visitLabel(loop)
+    mv.visitCondBranch(CondBranchOp.BEQ, i, end)
+    mv.visitAssignment(sum, mv.visitBinary(BinaryOp.ADD, sum, mv.visitBinary(op, x, c)))
+    mv.visitAssignment(x, mv.visitBinary(BinaryOp.ADD, x, step))
+    mv.visitAssignment(i, mv.visitBinary(BinaryOp.SUB, i, one))
+    mv.visitBranch(loop)
+    mv.visitLabel(end)
+    mv.visitReturn(sum)
+    mv.visitEnd()
+    return pw.visitEnd()
+
+
+def run(op: BinaryOp, constant: int, generic: bool, regAlloc: str) -> dict:
+    (expected, _) = TACInterpreter().run(loopProg(op, constant, generic))
+    asm = CompilerSession().asm(loopProg(op, constant, generic), regAlloc)
+    result = RiscvSimulator(asm).run()
+    if result.exitValue != expected:
+        raise AssertionError(
+            "{} by {}: {} instead of {}".format(
+                op.name, constant, result.exitValue, expected
+            )
+        )
+    return result.toJson()
+
+
+def main():
+    args = parseArgs()
+
+    print(
+        "{:<6}{:>12}{:>14}{:>14}{:>14}{:>14}{:>10}".format(
+            "op", "constant", "instrs", "(generic)", "cycles", "(generic)", "speedup"
+        )
+    )
+    results = []
+    for name in args.ops:
+        for constant in args.constants:
+            reduced = run(OPS[name], constant, False, args.regalloc)
+            generic = run(OPS[name], constant, True, args.regalloc)
+            print(
+                "{:<6}{:>12}{:>14}{:>14}{:>14}{:>14}{:>9.2f}x".format(
+                    name,
+                    constant,
+                    reduced["instrCount"],
+                    generic["instrCount"],
+                    reduced["cycles"],
+                    generic["cycles"],
+                    generic["cycles"] / reduced["cycles"],
+                ),
+                flush=True,
+            )
+            results.append(
+                {
+                    "op": name,
+                    "constant": constant,
+                    "reduced": reduced,
+                    "generic": generic,
+                }
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
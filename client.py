@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+"""
+The client of the compile server, a drop-in replacement of `python main.py`:
+
+    python main.py --serve --socket /tmp/minidecaf.sock &
+    python client.py --riscv --input a.c
+
+It sends the job to the server and prints the result as main.py would, including the
+exit code. The socket is given by --socket or the MINIDECAF_SOCKET environment variable.
+"""
+
+DEFAULT_SOCKET = "/tmp/minidecaf.sock"
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="MiniDecaf compile server client")
+    parser.add_argument("--input", type=str, required=True, help="the input C file")
+    parser.add_argument("--parse", action="store_true", help="output parsed AST")
+    parser.add_argument("--tac", action="store_true", help="output transformed TAC")
+    parser.add_argument("--riscv", action="store_true", help="output generated RISC-V")
+    parser.add_argument("--regalloc", type=str, help="the register allocator")
+    parser.add_argument("--liveness", type=str, help="the liveness analyzer")
+    parser.add_argument("--layout", action="store_true", help="reorder basic blocks")
+    parser.add_argument(
+        "--peephole", action="store_true", help="rewrite RISC-V by peephole rules"
+    )
+    parser.add_argument("-O", dest="opt", type=int, help="the optimization level")
+    parser.add_argument(
+        "--output", type=str, help="write the output to this file instead of stdout"
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=os.environ.get("MINIDECAF_SOCKET", DEFAULT_SOCKET),
+        help="the unix socket of the server",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parseArgs()
+
+    # the same priority as main.py
+    if args.riscv:
+        stage = "riscv"
+    elif args.tac:
+        stage = "tac"
+    elif args.parse:
+        stage = "parse"
+    else:
+        return
+
+    # relative to the directory of the client, not of the server
+    job = {"input": os.path.abspath(args.input), "stage": stage}
+    if args.regalloc:
+        job["regalloc"] = args.regalloc
+    if args.liveness:
+        job["liveness"] = args.liveness
+    if args.layout:
+        job["layout"] = True
+    if args.peephole:
+        job["peephole"] = True
+    if args.opt is not None:
+        job["opt"] = args.opt
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(args.socket)
+        sock.sendall(json.dumps(job).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            result = json.loads(f.readline())
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result["output"])
+    else:
+        sys.stdout.write(result["output"])
+    sys.stderr.write(result["error"])
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import contextlib
+import fcntl
+import functools
+import hashlib
+import io
+import json
+import os
+import tempfile
+from typing import Iterator, Optional, TextIO
+
+"""
+CompileCache: an on-disk cache of compiler outputs, addressed by the content of the source
+
+The key of an output is the hash of the source text, the compiler version and every
+option which changes the output, as passed to keyOf by main.compileTo: the stage
+(interpret/riscv/tac/parse), the optimization level -O, the register allocator, the
+liveness analyzer, --layout, --peephole and the text of the --profile-in file. Leaving
+any of them out of the key would return the output of other options. The compiler
+version is the hash of the compiler sources, so editing the compiler never returns a
+stale output. Only successful compilations are cached.
+
+Every output is a file named by its key. The mtime of a file is refreshed on each hit,
+and the files with the oldest mtimes are evicted once the cache grows beyond maxBytes.
+Files are written to a temp file first and then renamed, so several processes can share
+a cache. The hits and misses of all the processes are counted in STATS_FILE.
+
+An output does not have to be held in memory: open gives the file of a hit, to be
+copied to the output, and writer gives a stream writing both to the output and to the
+new entry, so that the compiler can stream its output function by function.
+
+1. keyOf：计算一次编译的键
+2. get/open：查询缓存，命中时返回输出（或输出文件）并更新 mtime
+3. put/writer：写入缓存，超出大小上限时按 LRU 淘汰
+4. stats：返回累计的命中/未命中次数、缓存项数和总大小
+"""
+
+DEFAULT_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "minidecaf"
+)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+ENTRY_SUFFIX = ".out"
+STATS_FILE = "stats.json"
+
+# the directories and files whose content is the compiler, relative to this file
+COMPILER_SOURCES = ["frontend", "backend", "utils", "compilersession.py", "main.py"]
+
+
+@functools.lru_cache(maxsize=None)
+def compilerVersion() -> str:
+    root = os.path.dirname(os.path.abspath(__file__))
+    paths = []
+    for source in COMPILER_SOURCES:
+        path = os.path.join(root, source)
+        if os.path.isdir(path):
+            for (dir, _, files) in os.walk(path):
+                paths += [
+                    os.path.join(dir, f)
+                    for f in files
+                    # parsetab.py is generated by ply from ply_parser.py
+                    if f.endswith(".py") and f != "parsetab.py"
+                ]
+        else:
+            paths.append(path)
+
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        h.update(os.path.relpath(path, root).encode())
+        with open(path, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+class CompileCache:
+    def __init__(
+        self, directory: str = DEFAULT_DIR, maxBytes: int = DEFAULT_MAX_BYTES
+    ) -> None:
+        self.directory = directory
+        self.maxBytes = maxBytes
+        # the hits and misses of this process
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def keyOf(self, code: str, *options: str) -> str:
+        h = hashlib.sha256()
+        for part in [compilerVersion(), *options, code]:
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        f = self.open(key)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    # the file of the output of key, to be closed by the caller, or None
+    def open(self, key: str) -> Optional[TextIO]:
+        path = os.path.join(self.directory, key + ENTRY_SUFFIX)
+        try:
+            f = open(path)
+            os.utime(path)
+        except FileNotFoundError:
+            f = None
+
+        if f is None:
+            self.misses += 1
+            self.count("misses")
+        else:
+            self.hits += 1
+            self.count("hits")
+        return f
+
+    def put(self, key: str, text: str) -> None:
+        with self.writer(key) as f:
+            f.write(text)
+
+    # a stream to write the output of key to, and to output as well if given
+    # the entry is only put into the cache if the block exits without an exception
+    @contextlib.contextmanager
+    def writer(self, key: str, output: Optional[TextIO] = None) -> Iterator[TextIO]:
+        (fd, tmp) = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                yield f if output is None else TeeWriter(output, f)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        os.replace(tmp, os.path.join(self.directory, key + ENTRY_SUFFIX))
+        self.evict()
+
+    def entries(self) -> list[os.DirEntry]:
+        return [
+            entry
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(ENTRY_SUFFIX)
+        ]
+
+    # remove the least recently used entries until the cache fits in maxBytes
+    def evict(self) -> None:
+        entries = [(entry.stat(), entry.path) for entry in self.entries()]
+        size = sum(stat.st_size for (stat, _) in entries)
+        if size <= self.maxBytes:
+            return
+
+        entries.sort(key=lambda e: e[0].st_mtime_ns)
+        for (stat, path) in entries:
+            if size <= self.maxBytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                # evicted by another process at the same time
+                pass
+            size -= stat.st_size
+
+    # add one to a counter in STATS_FILE, which is locked as other processes may share it
+    def count(self, counter: str) -> None:
+        with open(os.path.join(self.directory, STATS_FILE), "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            content = f.read()
+            stats = json.loads(content) if content else {}
+            stats[counter] = stats.get(counter, 0) + 1
+            f.seek(0)
+            f.truncate()
+            json.dump(stats, f)
+
+    def stats(self) -> dict:
+        try:
+            with open(os.path.join(self.directory, STATS_FILE)) as f:
+                stats = json.load(f)
+        except (FileNotFoundError, ValueError):
+            stats = {}
+
+        entries = self.entries()
+        return {
+            "hits": stats.get("hits", 0),
+            "misses": stats.get("misses", 0),
+            "entries": len(entries),
+            "bytes": sum(entry.stat().st_size for entry in entries),
+        }
+
+
+# a text stream writing everything to both of its streams
+class TeeWriter(io.TextIOBase):
+    def __init__(self, first: TextIO, second: TextIO) -> None:
+        self.first = first
+        self.second = second
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.first.write(text)
+        self.second.write(text)
+        return len(text)
+
+    def flush(self) -> None:
+        self.first.flush()
+        self.second.flush()
@@ -0,0 +1,115 @@
+from typing import Optional, TextIO
+
+from backend.asm import Asm
+from backend.dataflow.bitvectorlivenessanalyzer import BitVectorLivenessAnalyzer
+from backend.dataflow.blocklayout import BlockLayout
+from backend.dataflow.livenessanalyzer import LivenessAnalyzer
+from backend.interp.profile import Profile
+from backend.opt.optimizer import OPT_LEVELS, Optimizer
+from backend.reg.bruteregalloc import BruteRegAlloc
+from backend.reg.graphcolorregalloc import GraphColorRegAlloc
+from backend.reg.linearscanregalloc import LinearScanRegAlloc
+from backend.riscv.peephole import Peephole
+from backend.riscv.riscvasmemitter import RiscvAsmEmitter
+from frontend.ast.tree import Program
+from frontend.lexer import newLexer
+from frontend.parser import newParser
+from frontend.scope.globalscope import GlobalScopeType
+from frontend.tacgen.tacgen import TACGen
+from frontend.typecheck.namer import Namer
+from frontend.typecheck.typer import Typer
+from utils.passtimer import PassTimer
+from utils.riscv import Riscv
+from utils.tac.tacprog import TACProg
+
+"""
+CompilerSession: the state of the compiler pipeline, so that one process can compile many programs
+
+A session owns a lexer, a parser and their error stacks, and a global scope. The
+module-level `lexer`, `parser` and `GlobalScope` are never touched by it, and every
+compilation starts from a clean state, so a session can compile any number of programs
+one after another, and each thread can have a session of its own.
+
+The Reg objects of Riscv are shared by all sessions, as the operands of all the native
+instrs, but they hold no state: the register allocator and the emitters created by asm
+for each program keep which temp is in which reg, and which regs a function writes. So
+the backends of sessions in different threads do not wait for each other.
+
+Each pass is measured by self.timer, which is disabled unless one is given.
+
+1. parse：词法与语法分析，错误保存在 self.parser.error_stack 中
+2. tac：语义分析并生成 TAC，每个程序使用新的全局作用域，并按优化级别 opt 优化 TAC
+3. asm：生成 RISC-V 汇编，若给出 sink，则每个函数生成后立即写入 sink，并返回 ""；
+   若 layout 为真或给出 profile，则按 profile（或静态估计）重新排列基本块；
+   若 peephole 为真，则对每个函数生成的指令做窥孔优化
+"""
+
+REG_ALLOCS = {
+    "brute": BruteRegAlloc,
+    "linear": LinearScanRegAlloc,
+    "color": GraphColorRegAlloc,
+}
+
+LIVENESS_ANALYZERS = {
+    "iterative": LivenessAnalyzer,
+    "bitvector": BitVectorLivenessAnalyzer,
+}
+
+class CompilerSession:
+    def __init__(self, timer: Optional[PassTimer] = None) -> None:
+        self.lexer = newLexer()
+        self.parser = newParser()
+        self.globalScope = GlobalScopeType()
+        self.timer = timer or PassTimer(enabled=False)
+
+    def parse(self, code: str) -> Program:
+        self.lexer.error_stack.clear()
+        self.lexer.lineno = 1
+        self.lexer.begin("INITIAL")
+        self.parser.error_stack.clear()
+        with self.timer.phase("parse"):
+            return self.parser.parse(code, lexer=self.lexer)
+
+    def tac(self, p: Program, opt: int = 0) -> TACProg:
+        self.globalScope = GlobalScopeType()
+        with self.timer.phase("namer"):
+            namer = Namer(self.globalScope)
+            p = namer.transform(p)
+        with self.timer.phase("typer"):
+            typer = Typer()
+            p = typer.transform(p)
+
+        with self.timer.phase("tacgen"):
+            tacgen = TACGen()
+            prog = tacgen.transform(p)
+
+        if OPT_LEVELS[opt]:
+            with self.timer.phase("opt"):
+                Optimizer(OPT_LEVELS[opt], self.timer).transform(prog)
+        return prog
+
+    def asm(
+        self,
+        p: TACProg,
+        regAlloc: str = "brute",
+        liveness: str = "iterative",
+        sink: Optional[TextIO] = None,
+        layout: bool = False,
+        profile: Optional[Profile] = None,
+        peephole: bool = False,
+    ) -> str:
+        riscvAsmEmitter = RiscvAsmEmitter(
+            Riscv.AllocatableRegs,
+            Riscv.CallerSaved,
+            sink,
+            Peephole(timer=self.timer) if peephole else None,
+        )
+        asm = Asm(
+            riscvAsmEmitter,
+            REG_ALLOCS[regAlloc](riscvAsmEmitter),
+            LIVENESS_ANALYZERS[liveness](),
+            self.timer,
+            BlockLayout(profile) if layout or profile is not None else None,
+        )
+        with self.timer.phase("asm"):
+            return asm.transform(p)
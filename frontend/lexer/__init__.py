@@ -10,6 +10,7 @@ from . import lex
 # * replace the '.ply-lexer' by '.xxx' to use your own-defined lexer, where 'xxx' is the module/package name of it
 # * note that your lexer should be iterable, and should have the method 'input' in order to accept the input source file
 from .ply_lexer import lexer as ply_lexer
+from .ply_lexer import newLexer as ply_newLexer
 
 
 class LexToken(Protocol):
@@ -50,8 +51,14 @@ class Lexer(Protocol):
 
 lexer: Lexer = ply_lexer
 
+
+def newLexer() -> Lexer:
+    return ply_newLexer()
+
+
 __all__ = [
     "lexer",
+    "newLexer",
     "lex",
     "LexToken",
     "Lexer",
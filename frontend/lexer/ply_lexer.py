@@ -37,7 +37,8 @@ def t_ANY_Newline(t):
 
 
 def t_ANY_error(t):
-    error_stack.append(DecafLexError(t))
+    # not error_stack, as a lexer made by newLexer has its own stack
+    t.lexer.error_stack.append(DecafLexError(t))
     t.lexer.skip(1)
 
 
@@ -69,3 +70,14 @@ t_Integer = _intlit_into_node(t_Integer)
 
 lexer = lex.lex()
 lexer.error_stack = error_stack  # type: ignore
+
+
+def newLexer():
+    """
+    A lexer with its own state and error_stack, sharing the tables with `lexer`.
+    """
+    c = lexer.clone()
+    c.error_stack = []  # type: ignore
+    c.lineno = 1
+    c.begin("INITIAL")
+    return c
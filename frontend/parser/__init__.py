@@ -4,6 +4,7 @@ from frontend.ast.tree import Program
 from frontend.lexer import Lexer
 from utils.error import DecafSyntaxError
 
+from .ply_parser import newParser as _newParser
 from .ply_parser import parser as _parser
 
 
@@ -18,6 +19,11 @@ class Parser(Protocol):
 parser = cast(Parser, _parser)
 
 
+def newParser() -> Parser:
+    return cast(Parser, _newParser())
+
+
 __all__ = [
     "parser",
+    "newParser",
 ]
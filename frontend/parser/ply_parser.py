@@ -11,6 +11,8 @@ Refer to https://www.dabeaz.com/ply/ply.html for more details.
 """
 
 
+import copy
+
 import ply.yacc as yacc
 
 from frontend.ast.tree import *
@@ -255,12 +257,19 @@ def p_error(t):
     """
     A naive (and possibly erroneous) implementation of error recovering.
     """
+    return recover(parser, t)
+
+
+# the parser is passed in, as every parser made by newParser has its own error_stack
+def recover(parser, t):
     if not t:
-        error_stack.append(DecafSyntaxError(t, "EOF"))
+        parser.error_stack.append(DecafSyntaxError(t, "EOF"))
         return
 
     inp = t.lexer.lexdata
-    error_stack.append(DecafSyntaxError(t, f"\n{inp.splitlines()[t.lineno - 1]}"))
+    parser.error_stack.append(
+        DecafSyntaxError(t, f"\n{inp.splitlines()[t.lineno - 1]}")
+    )
 
     parser.errok()
     return parser.token()
@@ -268,3 +277,13 @@ def p_error(t):
 
 parser = yacc.yacc(start="program")
 parser.error_stack = error_stack  # type: ignore
+
+
+def newParser():
+    """
+    A parser with its own error_stack, sharing the parsing tables with `parser`.
+    """
+    p = copy.copy(parser)
+    p.error_stack = []  # type: ignore
+    p.errorfunc = lambda t: recover(p, t)
+    return p
@@ -3,7 +3,7 @@ from typing import Protocol, TypeVar, cast
 from frontend.ast.node import Node, NullType
 from frontend.ast.tree import *
 from frontend.ast.visitor import RecursiveVisitor, Visitor
-from frontend.scope.globalscope import GlobalScope
+from frontend.scope.globalscope import GlobalScope, GlobalScopeType
 from frontend.scope.scope import Scope, ScopeKind
 from frontend.scope.scopestack import ScopeStack
 from frontend.symbol.funcsymbol import FuncSymbol
@@ -20,13 +20,14 @@ The namer phase: resolve all symbols defined in the abstract syntax tree and sto
 
 
 class Namer(Visitor[ScopeStack, None]):
-    def __init__(self) -> None:
-        pass
+    # a CompilerSession passes a global scope of its own
+    def __init__(self, globalScope: GlobalScopeType = GlobalScope) -> None:
+        self.globalScope = globalScope
 
     # Entry of this phase
     def transform(self, program: Program) -> Program:
         # Global scope. You don't have to consider it until Step 9.
-        program.globalScope = GlobalScope
+        program.globalScope = self.globalScope
         ctx = ScopeStack(program.globalScope)
 
         program.accept(self, ctx)
@@ -1,17 +1,22 @@
 import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import shutil
 import sys
+import tracemalloc
+from typing import Optional, TextIO
 
-from backend.asm import Asm
-from backend.reg.bruteregalloc import BruteRegAlloc
-from backend.riscv.riscvasmemitter import RiscvAsmEmitter
+from backend.interp.profile import Profile
+from backend.interp.tacinterpreter import TACInterpreter
+from backend.opt.optimizer import OPT_LEVELS
+from compilecache import DEFAULT_DIR, DEFAULT_MAX_BYTES, CompileCache
+from compilersession import LIVENESS_ANALYZERS, REG_ALLOCS, CompilerSession
 from frontend.ast.tree import Program
-from frontend.lexer import lexer
-from frontend.parser import parser
-from frontend.tacgen.tacgen import TACGen
-from frontend.typecheck.namer import Namer
-from frontend.typecheck.typer import Typer
+from utils.passtimer import PassTimer
 from utils.printtree import TreePrinter
-from utils.riscv import Riscv
 from utils.tac.tacprog import TACProg
 
 
@@ -21,6 +26,109 @@ def parseArgs():
     parser.add_argument("--parse", action="store_true", help="output parsed AST")
     parser.add_argument("--tac", action="store_true", help="output transformed TAC")
     parser.add_argument("--riscv", action="store_true", help="output generated RISC-V")
+    parser.add_argument(
+        "--interpret",
+        action="store_true",
+        help="run the TAC with the interpreter and output the result and the counts",
+    )
+    parser.add_argument(
+        "--profile-out",
+        type=str,
+        metavar="FILE",
+        help="with --interpret, write the block and edge counts to this file",
+    )
+    parser.add_argument(
+        "-O",
+        dest="opt",
+        type=int,
+        choices=OPT_LEVELS.keys(),
+        default=0,
+        help="the optimization level of the TAC",
+    )
+    parser.add_argument(
+        "--regalloc",
+        choices=REG_ALLOCS.keys(),
+        default="brute",
+        help="the register allocator used when generating RISC-V",
+    )
+    parser.add_argument(
+        "--liveness",
+        choices=LIVENESS_ANALYZERS.keys(),
+        default="iterative",
+        help="the liveness analyzer used when generating RISC-V",
+    )
+    parser.add_argument(
+        "--layout",
+        action="store_true",
+        help="reorder the basic blocks so that the hot paths fall through",
+    )
+    parser.add_argument(
+        "--profile-in",
+        type=str,
+        metavar="FILE",
+        help="lay out the basic blocks by the counts of --profile-out, implies --layout",
+    )
+    parser.add_argument(
+        "--peephole",
+        action="store_true",
+        help="rewrite the generated RISC-V of each function with the peephole rules",
+    )
+    parser.add_argument(
+        "--output", type=str, help="write the output to this file instead of stdout"
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="keep the compiler loaded and read compile jobs as JSON lines, see server.py",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        help="with --serve, accept jobs on this unix socket instead of stdin",
+    )
+    parser.add_argument(
+        "--batch",
+        type=str,
+        nargs="+",
+        metavar="PATH",
+        help="compile these C files and directories to RISC-V, see batch.py",
+    )
+    parser.add_argument(
+        "--jobs", type=int, help="the number of worker processes of --batch"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always compile, without looking up or filling the compile cache",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=DEFAULT_DIR,
+        help="the directory of the compile cache",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="the size limit of the compile cache, in MB",
+    )
+    parser.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="print the hits and misses of the compile cache to stderr",
+    )
+    parser.add_argument(
+        "--time-passes",
+        action="store_true",
+        help="print the time, calls and peak memory of each pass to stderr",
+    )
+    parser.add_argument(
+        "--stats-json",
+        type=str,
+        metavar="FILE",
+        help="write the numbers of --time-passes to this file as JSON",
+    )
     return parser.parse_args()
 
 
@@ -30,73 +138,280 @@ def readCode(fileName):
 
 
 # The parser stage: MiniDecaf code -> Abstract syntax tree
-def step_parse(args: argparse.Namespace):
-    code = readCode(args.input)
-    r: Program = parser.parse(code, lexer=lexer)
+def step_parse(code: str, session: CompilerSession):
+    r: Program = session.parse(code)
 
-    errors = parser.error_stack
+    errors = session.parser.error_stack
     if errors:
         print("\n".join(map(str, errors)), file=sys.stderr)
-        exit(1)
+        sys.exit(1)
 
     return r
 
 
 # IR generation stage: Abstract syntax tree -> Three-address code
-def step_tac(p: Program):
-    namer = Namer()
-    p = namer.transform(p)
-    typer = Typer()
-    p = typer.transform(p)
-
-    tacgen = TACGen()
-    tac_prog = tacgen.transform(p)
+def step_tac(p: Program, session: CompilerSession, opt: int = 0):
+    tac_prog = session.tac(p, opt)
 
     return tac_prog
 
 
 # Target code generation stage: Three-address code -> RISC-V assembly code
-def step_asm(p: TACProg):
-    riscvAsmEmitter = RiscvAsmEmitter(Riscv.AllocatableRegs, Riscv.CallerSaved)
-    asm = Asm(riscvAsmEmitter, BruteRegAlloc(riscvAsmEmitter))
-    prog = asm.transform(p)
+# if sink is given, the code of each function is written to it once generated, and "" is returned
+def step_asm(
+    p: TACProg,
+    session: CompilerSession,
+    regAlloc: str = "brute",
+    liveness: str = "iterative",
+    sink: Optional[TextIO] = None,
+    layout: bool = False,
+    profile: Optional[Profile] = None,
+    peephole: bool = False,
+):
+    prog = session.asm(p, regAlloc, liveness, sink, layout, profile, peephole)
     return prog
 
-# hope all of you happiness
-# enjoy potato chips
 
-def main():
-    args = parseArgs()
+def cacheOf(args: argparse.Namespace) -> CompileCache:
+    return CompileCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+
+# the cache to look up and fill for the compilations of args, or None to always compile
+def openCache(args: argparse.Namespace) -> Optional[CompileCache]:
+    # the passes have to be run to be measured, and the profile to be written
+    if args.no_cache or args.time_passes or args.stats_json or args.profile_out:
+        return None
+    return cacheOf(args)
+
+
+# Run the stage selected by args on code, and write the result to output
+# returns whether the result is found in cache, in which case nothing is compiled
+def compileTo(
+    args: argparse.Namespace,
+    code: str,
+    output: TextIO,
+    session: CompilerSession,
+    cache: Optional[CompileCache] = None,
+) -> bool:
+    stages = [
+        stage
+        for stage in ["interpret", "riscv", "tac", "parse"]
+        if getattr(args, stage)
+    ]
+    if cache is None or not stages:
+        runStage(args, code, output, session)
+        return False
 
+    # only the first stage is run, as in runStage
+    profile = readCode(args.profile_in) if args.profile_in else ""
+    key = cache.keyOf(
+        code,
+        stages[0],
+        "-O{}".format(args.opt),
+        args.regalloc,
+        args.liveness,
+        "layout" if args.layout else "",
+        "peephole" if args.peephole else "",
+        profile,
+    )
+    entry = cache.open(key)
+    if entry is not None:
+        with entry:
+            shutil.copyfileobj(entry, output)
+        return True
+
+    # the output is streamed to the new entry as well, not buffered in memory
+    with cache.writer(key, output) as sink:
+        runStage(args, code, sink, session)
+    return False
+
+
+def runStage(
+    args: argparse.Namespace, code: str, output: TextIO, session: CompilerSession
+):
     def _parse():
-        r = step_parse(args)
+        r = step_parse(code, session)
         # print("\nParsed AST:\n")
         # printer = TreePrinter(indentLen=2)
         # printer.work(r)
         return r
 
     def _tac():
-        tac = step_tac(_parse())
+        tac = step_tac(_parse(), session, args.opt)
         # print("\nGenerated TAC:\n")
         # tac.printTo()
         return tac
 
-    def _asm():
-        asm = step_asm(_tac())
+    def _asm(sink: TextIO):
+        profile = Profile.load(args.profile_in) if args.profile_in else None
+        asm = step_asm(
+            _tac(),
+            session,
+            args.regalloc,
+            args.liveness,
+            sink,
+            args.layout,
+            profile,
+            args.peephole,
+        )
         # print("\nGenerated ASM:\n")
         # print(asm)
         return asm
 
-    if args.riscv:
-        prog = _asm()
-        print(prog)
+    if args.interpret:
+        value, profile = TACInterpreter().run(_tac())
+        print("exit value: {}".format(value), file=output)
+        print("instrs: {}".format(profile.instrCount()), file=output)
+        if args.profile_out:
+            profile.save(args.profile_out)
+    elif args.riscv:
+        # the asm code is streamed to output function by function
+        _asm(output)
     elif args.tac:
         prog = _tac()
-        prog.printTo()
+        with contextlib.redirect_stdout(output):
+            prog.printTo()
     elif args.parse:
         prog = _parse()
         printer = TreePrinter(indentLen=2)
-        printer.work(prog)
+        with contextlib.redirect_stdout(output):
+            printer.work(prog)
+
+
+# Run one compile job of the server, args holds the defaults of the options the job leaves out
+# a job is a dict like {"input": "a.c", "stage": "riscv"}, or {"code": "int main() ..."}
+def compileJob(
+    job: dict,
+    args: argparse.Namespace,
+    session: CompilerSession,
+    cache: Optional[CompileCache] = None,
+) -> dict:
+    jobArgs = argparse.Namespace(**vars(args))
+    stage = job.get("stage", "riscv")
+    jobArgs.interpret, jobArgs.riscv, jobArgs.tac, jobArgs.parse = (
+        stage == "interpret",
+        stage == "riscv",
+        stage == "tac",
+        stage == "parse",
+    )
+    jobArgs.profile_out = None
+    jobArgs.profile_in = None
+    jobArgs.layout = job.get("layout", args.layout)
+    jobArgs.peephole = job.get("peephole", args.peephole)
+    jobArgs.opt = job.get("opt", args.opt)
+    jobArgs.regalloc = job.get("regalloc", args.regalloc)
+    jobArgs.liveness = job.get("liveness", args.liveness)
+
+    output = io.StringIO()
+    errors = io.StringIO()
+    ok = False
+    cached = False
+    try:
+        code = job["code"] if "code" in job else readCode(job["input"])
+        with contextlib.redirect_stderr(errors):
+            cached = compileTo(jobArgs, code, output, session, cache)
+        ok = True
+    except SystemExit:
+        # step_parse has already written the syntax errors to stderr
+        pass
+    except Exception as e:
+        print("{}: {}".format(type(e).__name__, e), file=errors)
+
+    return {
+        "ok": ok,
+        "output": output.getvalue(),
+        "error": errors.getvalue(),
+        "cached": cached,
+    }
+
+
+# The session and cache of a worker process of the batch mode
+workerSession: Optional[CompilerSession] = None
+workerCache: Optional[CompileCache] = None
+
+
+# Run one job of the batch mode: compile the C file at path to the .S file next to it
+def compileFile(path: str, args: argparse.Namespace) -> dict:
+    global workerSession, workerCache
+    if workerSession is None:
+        workerSession = CompilerSession()
+        workerCache = openCache(args)
+
+    result = compileJob(
+        {"input": path, "stage": "riscv"}, args, workerSession, workerCache
+    )
+    if result["ok"]:
+        with open(os.path.splitext(path)[0] + ".S", "w") as f:
+            f.write(result.pop("output"))
+    return result
+
+# hope all of you happiness
+# enjoy potato chips
+
+def main():
+    args = parseArgs()
+    try:
+        run(args)
+    finally:
+        if args.cache_stats and not args.no_cache:
+            # the stats are printed even if this compilation skipped the cache
+            stats = cacheOf(args).stats()
+            print(
+                "cache: {} hits, {} misses, {} entries, {:.1f} MB".format(
+                    stats["hits"],
+                    stats["misses"],
+                    stats["entries"],
+                    stats["bytes"] / (1024 * 1024),
+                ),
+                file=sys.stderr,
+            )
+
+
+def run(args: argparse.Namespace):
+    if args.serve:
+        import server
+
+        session = CompilerSession()
+        cache = openCache(args)
+        compile = lambda job: compileJob(job, args, session, cache)
+        if args.socket:
+            server.serveSocket(compile, args.socket)
+        else:
+            server.serveStream(compile, sys.stdin, sys.stdout)
+        return
+
+    if args.batch:
+        import batch
+
+        inputs = batch.collectInputs(args.batch)
+        compile = functools.partial(compileFile, args=args)
+        if not batch.compileAll(compile, inputs, args.jobs, sys.stdout):
+            sys.exit(1)
+        return
+
+    timer = PassTimer(enabled=bool(args.time_passes or args.stats_json))
+    if timer.enabled:
+        tracemalloc.start()
+
+    with contextlib.ExitStack() as stack:
+        if args.output:
+            output = stack.enter_context(open(args.output, "w"))
+        else:
+            output = sys.stdout
+
+        code = readCode(args.input)
+        compileTo(args, code, output, CompilerSession(timer), openCache(args))
+
+    if args.time_passes:
+        timer.printTo(sys.stderr)
+    if args.stats_json:
+        with open(args.stats_json, "w") as f:
+            stats = {
+                "input": args.input,
+                "passes": timer.toJson(),
+                "counters": timer.counters,
+            }
+            json.dump(stats, f, indent=2)
 
     return
 
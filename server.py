@@ -0,0 +1,64 @@
+import json
+import os
+import socketserver
+from typing import Callable, TextIO
+
+"""
+The compile server, started by `python main.py --serve [--socket PATH]`
+
+Starting python and building the PLY lexer and parser tables takes much longer than
+compiling a small MiniDecaf file, so the server loads the compiler once and then
+compiles any number of files. Jobs and results are JSON objects, one per line:
+
+    job:    {"input": "a.c", "stage": "riscv", "regalloc": "brute", "liveness": "iterative"}
+            {"code": "int main() { return 0; }", "layout": true, "peephole": true}
+    result: {"ok": true, "output": "<the asm/tac/ast>", "error": "<what would go to stderr>"}
+
+Every key of a job except "input"/"code" is optional, the defaults come from the command
+line of the server. Jobs are compiled one by one, by a single CompilerSession.
+
+1. serveStream：从 inp 逐行读取任务，结果逐行写入 out，用于 stdin/stdout
+2. serveSocket：在 unix socket 上接受连接，每个连接上可以发送任意多个任务，client.py 即是这样使用的
+"""
+
+Compile = Callable[[dict], dict]
+
+
+def runJob(compile: Compile, line: str) -> dict:
+    try:
+        job = json.loads(line)
+    except ValueError as e:
+        return {"ok": False, "output": "", "error": "bad job: {}\n".format(e)}
+    if not isinstance(job, dict):
+        return {"ok": False, "output": "", "error": "bad job: not a JSON object\n"}
+    return compile(job)
+
+
+def serveStream(compile: Compile, inp: TextIO, out: TextIO) -> None:
+    for line in inp:
+        if line.strip():
+            out.write(json.dumps(runJob(compile, line)) + "\n")
+            out.flush()
+
+
+def serveSocket(compile: Compile, path: str) -> None:
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            for line in self.rfile:
+                if line.strip():
+                    result = runJob(compile, line.decode())
+                    self.wfile.write(json.dumps(result).encode() + b"\n")
+                    self.wfile.flush()
+
+    # a socket file left by a server which was killed
+    if os.path.exists(path):
+        os.unlink(path)
+
+    # connections are handled one at a time
+    with socketserver.UnixStreamServer(path, Handler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
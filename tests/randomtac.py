@@ -0,0 +1,143 @@
+import random
+
+from utils.label.label import Label
+from utils.tac.programwriter import ProgramWriter
+from utils.tac.tacop import BinaryOp, CondBranchOp, UnaryOp
+from utils.tac.tacprog import TACProg
+from utils.tac.temp import Temp
+
+"""
+Random TAC programs for the differential tests of the passes and of the backend
+
+The frontend has no `*`, `/`, `%`, comparisons or logical operators yet, so the programs
+are written in TAC directly, with every op of BinaryOp and UnaryOp. A program is made of
+regions nested DEPTH deep: straight code, an if/else, and a counted loop, which may
+break out early and whose body may read temps it never writes. The operands are taken
+from temps written once or many times, and from CONSTANTS, which hold the bounds of the
+immediates and of the 32-bit values and powers of two, so that folding, the selection
+of immediates and the reduction of MUL/DIV/REM all have something to work on.
+
+Every temp is written before the first region, and every loop runs at most
+MAX_ITERATIONS times, so each program returns a value: a checksum of all the temps.
+
+1. randomProg：由种子生成一个只含 main 函数的程序
+"""
+
+CONSTANTS = [0, 1, -1, 2, -2, 3, 4, -4, 5, 7, -7, 8, 10, 16, -16, 641, 1000]
+CONSTANTS += [2047, -2048, 2048, -2049, 65536, -65536, 0x40000001, 2**31 - 1, -(2**31)]
+
+COMPARISONS = [
+    BinaryOp.EQU,
+    BinaryOp.NEQ,
+    BinaryOp.SLT,
+    BinaryOp.LEQ,
+    BinaryOp.SGT,
+    BinaryOp.GEQ,
+]
+
+DEPTH = 3
+MAX_ITERATIONS = 4
+
+
+class RandomProgWriter:
+    def __init__(self, seed: int, ntemps: int) -> None:
+        self.rng = random.Random(seed)
+        self.pw = ProgramWriter(["main"])
+        self.mv = self.pw.visitMainFunc()
+        self.temps = [self.mv.freshTemp() for _ in range(ntemps)]
+
+    def write(self) -> TACProg:
+        for temp in self.temps:
+            self.mv.visitAssignment(temp, self.mv.visitLoad(self.constant()))
+        for _ in range(self.rng.randint(1, 3)):
+            self.region(DEPTH)
+        self.mv.visitReturn(self.checksum())
+        self.mv.visitEnd()
+        return self.pw.visitEnd()
+
+    # a value depending on every temp, so that a wrong one shows up in the return value
+    def checksum(self) -> Temp:
+        result = self.temps[0]
+        for temp in self.temps[1:]:
+            scaled = self.mv.visitBinary(BinaryOp.MUL, result, self.mv.visitLoad(31))
+            result = self.mv.visitBinary(BinaryOp.ADD, scaled, temp)
+        return result
+
+    def constant(self) -> int:
+        return self.rng.choice(CONSTANTS)
+
+    # a temp written many times, or a new one loaded with a constant
+    def operand(self) -> Temp:
+        if self.rng.random() < 0.4:
+            return self.mv.visitLoad(self.constant())
+        return self.rng.choice(self.temps)
+
+    def expression(self) -> Temp:
+        kind = self.rng.random()
+        if kind < 0.7:
+            op = self.rng.choice(list(BinaryOp))
+            return self.mv.visitBinary(op, self.operand(), self.operand())
+        elif kind < 0.85:
+            return self.mv.visitUnary(self.rng.choice(list(UnaryOp)), self.operand())
+        return self.operand()
+
+    # a temp to branch on, the and/or of comparisons as the frontend would give
+    def condition(self, depth: int = 2) -> Temp:
+        kind = self.rng.random()
+        if depth > 0 and kind < 0.3:
+            op = self.rng.choice([BinaryOp.AND, BinaryOp.OR])
+            return self.mv.visitBinary(
+                op, self.condition(depth - 1), self.condition(depth - 1)
+            )
+        elif kind < 0.85:
+            op = self.rng.choice(COMPARISONS)
+            return self.mv.visitBinary(op, self.operand(), self.operand())
+        return self.rng.choice(self.temps)
+
+    def branchOn(self, cond: Temp, target: Label) -> None:
+        op = self.rng.choice([CondBranchOp.BEQ, CondBranchOp.BNE])
+        self.mv.visitCondBranch(op, cond, target)
+
+    def region(self, depth: int) -> None:
+        kind = self.rng.random()
+        if depth == 0 or kind < 0.4:
+            self.straight()
+        elif kind < 0.7:
+            self.ifElse(depth)
+        else:
+            self.loop(depth)
+
+    def straight(self) -> None:
+        for _ in range(self.rng.randint(1, 5)):
+            self.mv.visitAssignment(self.rng.choice(self.temps), self.expression())
+
+    def ifElse(self, depth: int) -> None:
+        (orElse, end) = (self.mv.freshLabel(), self.mv.freshLabel())
+        self.branchOn(self.condition(), orElse)
+        self.region(depth - 1)
+        if self.rng.random() < 0.1:
+            self.mv.visitReturn(self.rng.choice(self.temps))
+        else:
+            self.mv.visitBranch(end)
+        self.mv.visitLabel(orElse)
+        self.region(depth - 1)
+        self.mv.visitLabel(end)
+
+    # the counter is a temp of its own, never written by the body
+    def loop(self, depth: int) -> None:
+        (head, exit) = (self.mv.freshLabel(), self.mv.freshLabel())
+        counter = self.mv.freshTemp()
+        iterations = self.mv.visitLoad(self.rng.randint(1, MAX_ITERATIONS))
+        self.mv.visitAssignment(counter, iterations)
+        self.mv.visitLabel(head)
+        self.region(depth - 1)
+        if self.rng.random() < 0.3:
+            self.branchOn(self.condition(), exit)
+        self.region(depth - 1)
+        self.mv.visitBinarySelf(BinaryOp.SUB, counter, self.mv.visitLoad(1))
+        self.mv.visitCondBranch(CondBranchOp.BNE, counter, head)
+        self.mv.visitLabel(exit)
+
+
+def randomProg(seed: int, ntemps: int = 6) -> TACProg:
+    return RandomProgWriter(seed, ntemps).write()
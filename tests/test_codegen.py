@@ -0,0 +1,383 @@
+import unittest
+from typing import Callable
+
+from backend.interp.tacinterpreter import TACInterpreter
+from backend.opt.optimizer import OPT_LEVELS, Optimizer
+from backend.riscv.riscvsimulator import RiscvSimulator
+from bench.generator import KINDS, generate
+from bench.regalloc import pressureProg
+from compilersession import REG_ALLOCS, CompilerSession
+from tests.randomtac import randomProg
+from utils.riscv import Riscv
+from utils.tac.funcvisitor import FuncVisitor
+from utils.tac.programwriter import ProgramWriter
+from utils.tac.tacop import BinaryOp, CondBranchOp
+from utils.tac.tacprog import TACProg
+from utils.tac.temp import Temp
+
+"""
+Differential tests of the backend: the TAC of each program is run by TACInterpreter,
+and the RISC-V generated from it by RiscvSimulator, which must return the same value
+
+The programs are random TAC programs (see tests/randomtac.py) and the programs of
+bench.generator, compiled at every optimization level, by every register allocator,
+without and with the layout of the basic blocks, by the static heuristics or by the
+profile of the interpreter, and without and with the peephole. The targeted cases
+compute a single operation on operands at the bounds of what each instr selection
+handles, and check which instrs are selected. Every program is called by CALLER,
+which checks that the CalleeSaved regs and sp are restored, and the frames of a leaf
+function and of one writing CalleeSaved regs are checked as well.
+
+1. compare：对每个程序和每种编译选项的组合比较返回值
+2. 指令选择的针对性用例
+3. 栈帧：只保存和恢复函数写过的 CalleeSaved 寄存器
+"""
+
+SEEDS = range(60)
+
+# the values of the operands around the bounds of the immediates and of 32 bits
+VALUES = [0, 1, -1, 7, -7, 2047, -2048, 2048, -2049, 2**31 - 1, -(2**31)]
+
+COMPARISONS = [
+    BinaryOp.EQU,
+    BinaryOp.NEQ,
+    BinaryOp.SLT,
+    BinaryOp.LEQ,
+    BinaryOp.SGT,
+    BinaryOp.GEQ,
+]
+
+# the constants of MUL/DIV/REM: powers of two, their sums and differences, the ones
+# divided by a magic number, positive and negative, and the bounds of 32 bits
+FACTORS = [0, 1, -1, 2, -2, 3, -3, 4, -4, 5, 6, 7, -7, 8, -8, 10, 12, -12, 15, 641]
+FACTORS += [-641, 1000, 1024, -1024, 2**30, -(2**30), 2**31 - 1, -(2**31)]
+
+# the dividends: around zero, the multiples of the factors and the bounds of 32 bits
+DIVIDENDS = [0, 1, -1, 6, -6, 7, -7, 8, -8, 999, -1000, 12345678, -12345679]
+DIVIDENDS += [2**30, 2**31 - 1, -(2**31) + 1, -(2**31)]
+
+
+# the caller of main, which gives the CalleeSaved regs values of its own and checks
+# that main leaves them and sp as they were, or jumps out of the program, which
+# RiscvSimulator reports as an error
+CALLER = "\n".join(
+    ["caller:", "addi sp, sp, -16", "sw ra, 12(sp)"]
+    + ["li {}, {}".format(reg, 1000 + i) for (i, reg) in enumerate(Riscv.CalleeSaved)]
+    + ["call main", "li t0, {}".format(RiscvSimulator.MEMORY_SIZE - 16)]
+    + ["bne sp, t0, clobbered"]
+    + [
+        "li t0, {}\nbne {}, t0, clobbered".format(1000 + i, reg)
+        for (i, reg) in enumerate(Riscv.CalleeSaved)
+    ]
+    + ["lw ra, 12(sp)", "addi sp, sp, 16", "ret", "clobbered:", "li t0, -1", "jr t0"]
+)
+
+
+def simulate(asm: str) -> int:
+    return RiscvSimulator(asm + CALLER).run("caller", maxSteps=1000000).exitValue
+
+
+# the instrs of a section of each function: prologue, body or epilogue
+def instrsOf(asm: str, section: str = "body") -> list[str]:
+    result = []
+    inSection = False
+    for line in asm.splitlines():
+        line = line.strip()
+        if line == "# start of " + section:
+            inSection = True
+        elif line == "# end of " + section:
+            inSection = False
+        elif inSection and line and not line.endswith(":"):
+            result.append(line)
+    return result
+
+
+# the mnemonics of the instrs of the body of each function
+def mnemonicsOf(asm: str) -> list[str]:
+    return [instr.split()[0] for instr in instrsOf(asm)]
+
+
+# a constant, or a variable written twice, which is not known to be a constant
+def operandOf(mv: FuncVisitor, value: int, constant: bool) -> Temp:
+    if constant:
+        return mv.visitLoad(value)
+    temp = mv.freshTemp()
+    mv.visitAssignment(temp, mv.visitLoad(0))
+    mv.visitAssignment(temp, mv.visitLoad(value))
+    return temp
+
+
+# return lhs op rhs, constants tells which operands are constants
+def binaryProg(op: BinaryOp, lhs: int, rhs: int, constants: str = "") -> TACProg:
+    pw = ProgramWriter(["main"])
+    mv = pw.visitMainFunc()
+    x = operandOf(mv, lhs, "lhs" in constants)
+    y = operandOf(mv, rhs, "rhs" in constants)
+    mv.visitReturn(mv.visitBinary(op, x, y))
+    mv.visitEnd()
+    return pw.visitEnd()
+
+
+# if (cond(x, y, z) op 0) return 1; return 0, the branch being BEQ or BNE
+def branchProg(
+    cond: Callable[..., Temp], values: list[int], op: CondBranchOp, constants: str = ""
+) -> TACProg:
+    pw = ProgramWriter(["main"])
+    mv = pw.visitMainFunc()
+    operands = [
+        operandOf(mv, value, name in constants)
+        for (name, value) in zip("xyz", values)
+    ]
+    label = mv.freshLabel()
+    mv.visitCondBranch(op, cond(mv, *operands), label)
+    mv.visitReturn(mv.visitLoad(1))
+    mv.visitLabel(label)
+    mv.visitReturn(mv.visitLoad(0))
+    mv.visitEnd()
+    return pw.visitEnd()
+
+
+# the condition x op y of branchProg
+def comparison(op: BinaryOp) -> Callable[..., Temp]:
+    return lambda mv, x, y, *_: mv.visitBinary(op, x, y)
+
+
+# the condition x < y op y != z of branchProg, op being AND or OR
+def logical(op: BinaryOp) -> Callable[..., Temp]:
+    def cond(mv: FuncVisitor, x: Temp, y: Temp, z: Temp) -> Temp:
+        less = mv.visitBinary(BinaryOp.SLT, x, y)
+        return mv.visitBinary(op, less, mv.visitBinary(BinaryOp.NEQ, y, z))
+
+    return cond
+
+
+class TestCodegen(unittest.TestCase):
+    def compareProg(self, makeProg, session: CompilerSession, **config) -> None:
+        for (opt, passes) in OPT_LEVELS.items():
+            (expected, profile) = TACInterpreter().run(
+                Optimizer(passes).transform(makeProg())
+            )
+            # whether the blocks are laid out, and by which profile
+            layouts = {
+                "none": (False, None),
+                "static": (True, None),
+                "profile": (True, profile),
+            }
+            for regAlloc in REG_ALLOCS:
+                for (name, (layout, counts)) in layouts.items():
+                    for peephole in (False, True):
+                        with self.subTest(
+                            opt=opt,
+                            regAlloc=regAlloc,
+                            layout=name,
+                            peephole=peephole,
+                            **config,
+                        ):
+                            prog = Optimizer(passes).transform(makeProg())
+                            asm = session.asm(
+                                prog,
+                                regAlloc,
+                                layout=layout,
+                                profile=counts,
+                                peephole=peephole,
+                            )
+                            self.assertEqual(simulate(asm), expected)
+
+    def testRandomPrograms(self):
+        session = CompilerSession()
+        for seed in SEEDS:
+            self.compareProg(lambda: randomProg(seed), session, seed=seed)
+
+    def testGeneratedPrograms(self):
+        session = CompilerSession()
+        for kind in KINDS:
+            code = generate(kind, 2000)
+            self.compareProg(
+                lambda: session.tac(session.parse(code)), session, kind=kind
+            )
+
+    # an operand of each op is an immediate at the bounds, or a constant too large
+    def testImmediates(self):
+        session = CompilerSession()
+        for op in BinaryOp:
+            for constants in ("lhs", "rhs"):
+                for value in VALUES:
+                    for other in VALUES[:7]:
+                        (lhs, rhs) = (
+                            (value, other) if constants == "lhs" else (other, value)
+                        )
+                        prog = binaryProg(op, lhs, rhs, constants)
+                        expected = TACInterpreter().run(prog)[0]
+                        with self.subTest(op=op, lhs=lhs, rhs=rhs, constants=constants):
+                            asm = session.asm(binaryProg(op, lhs, rhs, constants))
+                            self.assertEqual(simulate(asm), expected)
+
+    def testImmediateSelection(self):
+        session = CompilerSession()
+
+        def mnemonics(op: BinaryOp, lhs: int, rhs: int, constants: str) -> list[str]:
+            return mnemonicsOf(session.asm(binaryProg(op, lhs, rhs, constants)))
+
+        self.assertIn("addi", mnemonics(BinaryOp.ADD, 5, 2047, "rhs"))
+        self.assertNotIn("add", mnemonics(BinaryOp.ADD, 5, 2047, "rhs"))
+        self.assertIn("addi", mnemonics(BinaryOp.ADD, -2048, 5, "lhs"))
+        self.assertIn("add", mnemonics(BinaryOp.ADD, 5, 2048, "rhs"))
+        # x - c is x + -c, and 2048 does not fit
+        self.assertIn("addi", mnemonics(BinaryOp.SUB, 5, -2047, "rhs"))
+        self.assertIn("sub", mnemonics(BinaryOp.SUB, 5, -2048, "rhs"))
+        self.assertIn("slti", mnemonics(BinaryOp.SLT, 5, -2048, "rhs"))
+        self.assertIn("slt", mnemonics(BinaryOp.SLT, 5, 2048, "rhs"))
+        # c < y is !(y < c + 1), unless c + 1 does not fit
+        self.assertIn("slti", mnemonics(BinaryOp.SLT, 2046, 5, "lhs"))
+        self.assertIn("slt", mnemonics(BinaryOp.SLT, 2047, 5, "lhs"))
+        self.assertIn("xori", mnemonics(BinaryOp.EQU, 5, 100, "rhs"))
+    # x * c, x / c and x % c with a constant c, rounded towards zero as in C
+    def testStrengthReduction(self):
+        session = CompilerSession()
+        for op in (BinaryOp.MUL, BinaryOp.DIV, BinaryOp.REM):
+            for c in FACTORS:
+                for x in DIVIDENDS:
+                    expected = TACInterpreter().run(binaryProg(op, x, c))[0]
+                    with self.subTest(op=op, x=x, c=c):
+                        asm = session.asm(binaryProg(op, x, c, "rhs"), "linear")
+                        self.assertEqual(simulate(asm), expected)
+
+    def testStrengthReductionSelection(self):
+        session = CompilerSession()
+
+        def mnemonics(op: BinaryOp, c: int) -> list[str]:
+            return mnemonicsOf(session.asm(binaryProg(op, 5, c, "rhs")))
+
+        for c in FACTORS:
+            with self.subTest(c=c):
+                # a division by zero is left to div and rem, which give -1 and x
+                self.assertEqual("div" in mnemonics(BinaryOp.DIV, c), c == 0)
+                self.assertEqual("rem" in mnemonics(BinaryOp.REM, c), c == 0)
+        # 2^a, -2^a, 2^a + 2^b and 2^a - 2^b are shifts, but not 641 = 2^9 + 2^7 + 1
+        for c in (8, -8, 10, 12, -7):
+            self.assertNotIn("mul", mnemonics(BinaryOp.MUL, c))
+        self.assertIn("mul", mnemonics(BinaryOp.MUL, 641))
+
+    # a comparison, or the and/or of two, read only by the branch is made part of it
+    def testFusedBranches(self):
+        session = CompilerSession()
+        cases = []
+        for op in COMPARISONS:
+            for constants in ("", "x", "y"):
+                for x in (0, 1, -1, 2047, -2048, -(2**31)):
+                    for y in (0, 1, -1, 2047, -2048, -(2**31)):
+                        cases.append((op, comparison(op), [x, y], constants))
+        for op in (BinaryOp.AND, BinaryOp.OR):
+            for x in (-1, 0, 1):
+                for y in (-1, 0, 1):
+                    for z in (-1, 0, 1):
+                        cases.append((op, logical(op), [x, y, z], ""))
+
+        for (op, cond, values, constants) in cases:
+            for branchOp in CondBranchOp:
+                prog = branchProg(cond, values, branchOp, constants)
+                expected = TACInterpreter().run(prog)[0]
+                with self.subTest(
+                    op=op, values=values, constants=constants, branchOp=branchOp
+                ):
+                    prog = branchProg(cond, values, branchOp, constants)
+                    self.assertEqual(simulate(session.asm(prog)), expected)
+
+    def testFusedBranchSelection(self):
+        session = CompilerSession()
+
+        def mnemonics(cond: Callable[..., Temp], constants: str = "") -> set[str]:
+            prog = branchProg(cond, [1, 2, 3], CondBranchOp.BEQ, constants)
+            return set(mnemonicsOf(session.asm(prog)))
+
+        # the instrs computing a comparison or an and/or into a reg
+        computing = {"slt", "slti", "seqz", "snez", "xori", "sub", "and", "or"}
+        for op in COMPARISONS:
+            for constants in ("", "y"):
+                with self.subTest(op=op, constants=constants):
+                    self.assertFalse(computing & mnemonics(comparison(op), constants))
+        for op in (BinaryOp.AND, BinaryOp.OR):
+            with self.subTest(op=op):
+                self.assertFalse(computing & mnemonics(logical(op)))
+
+        # the comparison is returned as well, so it is computed
+        def returned(mv: FuncVisitor, x: Temp, y: Temp, z: Temp) -> Temp:
+            less = mv.visitBinary(BinaryOp.SLT, x, y)
+            label = mv.freshLabel()
+            mv.visitCondBranch(CondBranchOp.BEQ, less, label)
+            mv.visitReturn(less)
+            mv.visitLabel(label)
+            return z
+
+        self.assertIn("slt", mnemonics(returned))
+
+    # without spills and CalleeSaved regs written, no frame is made at all
+    def testLeafFrame(self):
+        session = CompilerSession()
+        progs = {
+            "binary": lambda: binaryProg(BinaryOp.ADD, 5, 7),
+            "branch": lambda: branchProg(
+                comparison(BinaryOp.SLT), [1, 2, 3], CondBranchOp.BEQ
+            ),
+            "loop": lambda: pressureProg(3, 2),
+        }
+        for regAlloc in ("linear", "color"):
+            for (name, makeProg) in progs.items():
+                with self.subTest(regAlloc=regAlloc, prog=name):
+                    asm = session.asm(makeProg(), regAlloc)
+                    self.assertEqual(instrsOf(asm, "prologue"), [])
+                    self.assertEqual(instrsOf(asm, "epilogue"), [])
+                    self.assertNotIn("sp", asm)
+                    expected = TACInterpreter().run(makeProg())[0]
+                    self.assertEqual(simulate(asm), expected)
+
+    # the CalleeSaved regs saved are the ones written by the body, each in a slot of
+    # its own past the spilled temps
+    def testCalleeSavedFrame(self):
+        session = CompilerSession()
+        calleeSaved = {str(reg) for reg in Riscv.CalleeSaved}
+
+        def slotsOf(instrs: list[str], mnemonic: str) -> dict[str, int]:
+            result = {}
+            for instr in instrs:
+                (op, *operands) = instr.replace(",", " ").split()
+                if op == mnemonic and operands[0] in calleeSaved:
+                    result[operands[0]] = int(operands[1].removesuffix("(sp)"))
+            return result
+
+        for regAlloc in ("linear", "color"):
+            for extra in (15, 20, 30):
+                with self.subTest(regAlloc=regAlloc, extra=extra):
+                    asm = session.asm(pressureProg(3, extra), regAlloc)
+                    body = instrsOf(asm)
+                    # a CalleeSaved reg read by the body is written by it first
+                    used = {
+                        reg
+                        for instr in body
+                        for reg in instr.replace(",", " ").split()[1:]
+                        if reg in calleeSaved
+                    }
+                    self.assertTrue(used)
+                    prologue = instrsOf(asm, "prologue")
+                    epilogue = instrsOf(asm, "epilogue")
+                    saved = slotsOf(prologue, "sw")
+                    self.assertEqual(set(saved), used)
+                    self.assertEqual(slotsOf(epilogue, "lw"), saved)
+
+                    size = -int(prologue[0].split()[-1])
+                    self.assertEqual(prologue[0], "addi sp, sp, {}".format(-size))
+                    self.assertEqual(epilogue[-1], "addi sp, sp, {}".format(size))
+                    spilled = {
+                        int(instr.split()[-1].removesuffix("(sp)"))
+                        for instr in body
+                        if instr.endswith("(sp)")
+                    }
+                    slots = sorted(spilled) + sorted(saved.values())
+                    self.assertEqual(slots, list(range(0, size, 4)))
+
+                    expected = TACInterpreter().run(pressureProg(3, extra))[0]
+                    self.assertEqual(simulate(asm), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from bench.generator import generate
+from compilersession import REG_ALLOCS, CompilerSession
+
+"""
+Tests of CompilerSession: the programs compiled one after another by the same session,
+or at the same time by the sessions of several threads, must give what a fresh process
+running main.py gives for each of them
+
+1. 同一个会话依次编译不同的程序，每个输出与新进程的输出相同
+2. 语法错误不会残留到下一次编译
+3. 多个线程各自的会话同时编译，输出与依次编译相同
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROGRAMS = [
+    "int main() { if (0) { return 1; } else { if (1) return 2 + -3; } return 5; }",
+    "int main() { while (1) { while (2) { if (3) break; } if (1) break; } return 7; }",
+]
+
+
+# the output of a fresh process, which has never compiled anything before
+def compileInProcess(code: str, *options: str) -> str:
+    with tempfile.TemporaryDirectory() as dir:
+        input = os.path.join(dir, "input.c")
+        with open(input, "w") as f:
+            f.write(code)
+        result = subprocess.run(
+            [sys.executable, "main.py", "--no-cache", "--input", input, *options],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    return result.stdout
+
+
+def compileTAC(session: CompilerSession, code: str) -> str:
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        session.tac(session.parse(code)).printTo()
+    return output.getvalue()
+
+
+def compileAsm(session: CompilerSession, code: str, regAlloc: str) -> str:
+    return session.asm(session.tac(session.parse(code)), regAlloc)
+
+
+class TestCompilerSession(unittest.TestCase):
+    def testSequenceMatchesFreshProcess(self):
+        session = CompilerSession()
+        for regAlloc in REG_ALLOCS:
+            for code in PROGRAMS:
+                self.assertEqual(
+                    compileAsm(session, code, regAlloc),
+                    compileInProcess(code, "--riscv", "--regalloc", regAlloc),
+                )
+        for code in PROGRAMS:
+            self.assertEqual(compileTAC(session, code), compileInProcess(code, "--tac"))
+
+    def testErrorsDoNotLeak(self):
+        session = CompilerSession()
+        session.parse("int main() { return 1 + ; }")
+        self.assertTrue(session.parser.error_stack)
+
+        self.assertEqual(
+            compileAsm(session, PROGRAMS[0], "brute"),
+            compileInProcess(PROGRAMS[0], "--riscv"),
+        )
+        self.assertFalse(session.parser.error_stack)
+
+    def testThreads(self):
+        # a program long enough for the threads to switch in the middle of a function
+        programs = PROGRAMS + [generate("nested", 2000, seed) for seed in range(2)]
+        expected = {
+            (code, regAlloc): compileAsm(CompilerSession(), code, regAlloc)
+            for code in programs
+            for regAlloc in REG_ALLOCS
+        }
+        results = []
+
+        def work():
+            session = CompilerSession()
+            for _ in range(3):
+                for (code, regAlloc) in expected:
+                    results.append(
+                        (code, regAlloc, compileAsm(session, code, regAlloc))
+                    )
+
+        # switch between the threads as often as possible, so that they interleave
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=work) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        self.assertEqual(len(results), 4 * 3 * len(expected))
+        for (code, regAlloc, asm) in results:
+            self.assertEqual(asm, expected[(code, regAlloc)])
+
+
+if __name__ == "__main__":
+    unittest.main()
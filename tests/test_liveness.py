@@ -0,0 +1,113 @@
+import random
+import unittest
+
+from backend.dataflow.bitvectorlivenessanalyzer import BitVectorLivenessAnalyzer
+from backend.dataflow.cfg import CFG
+from backend.dataflow.cfgbuilder import CFGBuilder
+from backend.dataflow.livenessanalyzer import LivenessAnalyzer
+from backend.opt.optimizer import OPT_LEVELS
+from backend.riscv.riscvasmemitter import RiscvAsmEmitter
+from bench.generator import KINDS, generate
+from compilersession import CompilerSession
+from utils.riscv import Riscv
+from utils.tac.programwriter import ProgramWriter
+from utils.tac.tacop import BinaryOp, CondBranchOp, UnaryOp
+from utils.tac.tacprog import TACProg
+
+"""
+Differential tests of BitVectorLivenessAnalyzer against LivenessAnalyzer: on the same
+CFG, both must give the same define/liveUse/liveIn/liveOut of every block, and the
+same liveIn/liveOut at every Loc
+
+The CFGs are those of Asm, built from the instrs selected for the TAC of the programs
+of bench.generator at each optimization level, and of random TAC programs whose temps
+are written and read in arbitrary blocks, with loops, as CFGBuilder gets them.
+
+1. compareOn：在同一个指令序列上分别构造 CFG，比较两种分析器的结果
+"""
+
+
+# a random CFG of nblocks blocks, each temp written and read anywhere
+def randomProg(seed: int, nblocks: int = 20, ntemps: int = 15) -> TACProg:
+    rng = random.Random(seed)
+    pw = ProgramWriter(["main"])
+    mv = pw.visitMainFunc()
+    temps = [mv.freshTemp() for _ in range(ntemps)]
+    for temp in temps[: ntemps // 2]:
+        mv.visitAssignment(temp, mv.visitLoad(rng.randint(-5, 5)))
+    labels = [mv.freshLabel() for _ in range(nblocks)]
+    for label in labels:
+        mv.visitLabel(label)
+        for _ in range(rng.randint(0, 6)):
+            (dst, lhs, rhs) = (rng.choice(temps) for _ in range(3))
+            kind = rng.random()
+            if kind < 0.4:
+                op = rng.choice([BinaryOp.ADD, BinaryOp.SUB, BinaryOp.SLT])
+                mv.visitAssignment(dst, mv.visitBinary(op, lhs, rhs))
+            elif kind < 0.6:
+                mv.visitAssignment(dst, lhs)
+            elif kind < 0.7:
+                mv.visitAssignment(dst, mv.visitUnary(UnaryOp.NEG, lhs))
+            else:
+                mv.visitAssignment(dst, mv.visitLoad(rng.randint(-3, 3)))
+        kind = rng.random()
+        if kind < 0.4:
+            op = rng.choice([CondBranchOp.BEQ, CondBranchOp.BNE])
+            mv.visitCondBranch(op, rng.choice(temps), rng.choice(labels))
+        elif kind < 0.5:
+            mv.visitBranch(rng.choice(labels))
+        elif kind < 0.55:
+            mv.visitReturn(rng.choice(temps))
+    mv.visitReturn(rng.choice(temps))
+    mv.visitEnd()
+    return pw.visitEnd()
+
+
+class TestLiveness(unittest.TestCase):
+    def compareOn(self, instrSeq: list) -> None:
+        expected = CFGBuilder().buildFrom(instrSeq)
+        actual = CFGBuilder().buildFrom(instrSeq)
+        LivenessAnalyzer().accept(expected)
+        BitVectorLivenessAnalyzer().accept(actual)
+
+        for (bb, other) in zip(expected.nodes, actual.nodes):
+            self.assertEqual(bb.define, other.define)
+            self.assertEqual(bb.liveUse, other.liveUse)
+            self.assertEqual(bb.liveIn, other.liveIn)
+            self.assertEqual(bb.liveOut, other.liveOut)
+            for (loc, otherLoc) in zip(bb.iterator(), other.iterator()):
+                self.assertEqual(bb.liveInAt(loc), other.liveInAt(otherLoc))
+                self.assertEqual(bb.liveOutAt(loc), other.liveOutAt(otherLoc))
+
+    def compareProg(self, prog: TACProg) -> None:
+        emitter = RiscvAsmEmitter(Riscv.AllocatableRegs, Riscv.CallerSaved)
+        for func in prog.funcs:
+            # the TAC, as the passes see it, and the instrs selected from it, as Asm
+            self.compareOn(func.getInstrSeq())
+            self.compareOn(emitter.selectInstr(func)[0])
+
+    def testGeneratedPrograms(self):
+        session = CompilerSession()
+        for kind in KINDS:
+            for opt in OPT_LEVELS:
+                for seed in range(2):
+                    code = generate(kind, 2000, seed)
+                    with self.subTest(kind=kind, opt=opt, seed=seed):
+                        self.compareProg(session.tac(session.parse(code), opt))
+
+    def testRandomPrograms(self):
+        for seed in range(100):
+            with self.subTest(seed=seed):
+                self.compareProg(randomProg(seed))
+
+    def testComputeLiveOut(self):
+        for seed in range(100):
+            for func in randomProg(seed).funcs:
+                graph: CFG = CFGBuilder().buildFrom(func.getInstrSeq())
+                liveOut = BitVectorLivenessAnalyzer().computeLiveOut(graph)
+                LivenessAnalyzer().accept(graph)
+                self.assertEqual(liveOut, [bb.liveOut for bb in graph.nodes])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+"""
+Tests of the command line of main.py: the options which skip the compile cache can be
+given together with --cache-stats
+
+1. --cache-stats 与 --time-passes 等选项同时使用时，正常输出统计
+2. 编译出错时，--cache-stats 不会掩盖原来的错误
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODE = "int main() { return 3; }"
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.dir.name, "input.c")
+        with open(self.input, "w") as f:
+            f.write(CODE)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def runMain(self, *options: str) -> subprocess.CompletedProcess:
+        cacheDir = os.path.join(self.dir.name, "cache")
+        return subprocess.run(
+            [sys.executable, "main.py", "--cache-dir", cacheDir, *options],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+
+    def testCacheStatsWithoutCaching(self):
+        statsJson = os.path.join(self.dir.name, "stats.json")
+        for options in [["--time-passes"], ["--stats-json", statsJson]]:
+            with self.subTest(options=options):
+                result = self.runMain(
+                    "--input", self.input, "--riscv", "--cache-stats", *options
+                )
+                self.assertEqual(result.returncode, 0, result.stderr)
+                self.assertIn("main:", result.stdout)
+                self.assertIn("cache: 0 hits, 0 misses", result.stderr)
+
+        profile = os.path.join(self.dir.name, "profile.json")
+        result = self.runMain(
+            "--input", self.input, "--interpret", "--cache-stats", "--profile-out",
+            profile,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("exit value: 3", result.stdout)
+        self.assertIn("cache: 0 hits, 0 misses", result.stderr)
+
+    def testCacheStatsKeepsTheError(self):
+        missing = os.path.join(self.dir.name, "missing.c")
+        result = self.runMain(
+            "--input", missing, "--riscv", "--cache-stats", "--time-passes"
+        )
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("FileNotFoundError", result.stderr)
+        self.assertNotIn("AttributeError", result.stderr)
+        self.assertIn("cache: 0 hits, 0 misses", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,267 @@
+import unittest
+from typing import Optional
+
+from backend.interp.tacinterpreter import TACInterpreter
+from backend.opt.optimizer import OPT_LEVELS, Optimizer
+from bench.generator import KINDS, generate
+from compilersession import CompilerSession
+from tests.randomtac import randomProg
+from utils.tac.programwriter import ProgramWriter
+from utils.tac.tacinstr import Binary, CondBranch, LoadImm4, Phi
+from utils.tac.tacop import BinaryOp, CondBranchOp
+from utils.tac.tacprog import TACProg
+
+"""
+Differential tests of the TAC passes: each program is run by TACInterpreter before and
+after the passes, and must return the same value
+
+The programs are random TAC programs (see tests/randomtac.py), and the TAC of the
+programs of bench.generator, as the frontend gives it. Each pass is run alone, after
+ssa if it works on SSA form, and the passes of every optimization level are run in
+order. The targeted cases check that the pass does what it is for, e.g. that SCCP
+removes a branch on a constant.
+
+1. compare：对每个程序比较优化前后的返回值
+2. 各优化遍的针对性用例
+"""
+
+SEEDS = range(150)
+
+
+def interpret(prog: TACProg) -> Optional[int]:
+    return TACInterpreter(maxSteps=100000).run(prog)[0]
+
+
+def instrsOf(prog: TACProg) -> list:
+    return [instr for func in prog.funcs for instr in func.getInstrSeq()]
+
+
+class TestOpt(unittest.TestCase):
+    def compare(self, passes: list[str]) -> None:
+        for seed in SEEDS:
+            with self.subTest(passes=passes, seed=seed):
+                expected = interpret(randomProg(seed))
+                prog = Optimizer(passes).transform(randomProg(seed))
+                self.assertEqual(interpret(prog), expected)
+
+        session = CompilerSession()
+        for kind in KINDS:
+            code = generate(kind, 2000)
+            with self.subTest(passes=passes, kind=kind):
+                expected = interpret(session.tac(session.parse(code)))
+                prog = session.tac(session.parse(code))
+                self.assertEqual(interpret(Optimizer(passes).transform(prog)), expected)
+
+    def testOptLevels(self):
+        for passes in OPT_LEVELS.values():
+            self.compare(passes)
+
+    def testSCCP(self):
+        self.compare(["sccp"])
+
+    # x = 3; if (x < 4) y = x + 1; else y = 10; return y
+    def testSCCPFoldsBranch(self):
+        pw = ProgramWriter(["main"])
+        mv = pw.visitMainFunc()
+        (x, y) = (mv.freshTemp(), mv.freshTemp())
+        (orElse, end) = (mv.freshLabel(), mv.freshLabel())
+        mv.visitAssignment(x, mv.visitLoad(3))
+        cond = mv.visitBinary(BinaryOp.SLT, x, mv.visitLoad(4))
+        mv.visitCondBranch(CondBranchOp.BEQ, cond, orElse)
+        mv.visitAssignment(y, mv.visitBinary(BinaryOp.ADD, x, mv.visitLoad(1)))
+        mv.visitBranch(end)
+        mv.visitLabel(orElse)
+        mv.visitAssignment(y, mv.visitLoad(10))
+        mv.visitLabel(end)
+        mv.visitReturn(y)
+        mv.visitEnd()
+        prog = Optimizer(["sccp"]).transform(pw.visitEnd())
+
+        self.assertEqual(interpret(prog), 4)
+        instrs = instrsOf(prog)
+        self.assertFalse([instr for instr in instrs if isinstance(instr, CondBranch)])
+        values = [instr.value for instr in instrs if isinstance(instr, LoadImm4)]
+        self.assertNotIn(10, values)
+
+    def testSSA(self):
+        self.compare(["ssa"])
+        self.compare(["ssa", "outssa"])
+
+    # every temp has a single definition in SSA form, and no phi is left after it
+    def testSSAForm(self):
+        for seed in SEEDS:
+            with self.subTest(seed=seed):
+                prog = Optimizer(["ssa"]).transform(randomProg(seed))
+                written = [
+                    index for instr in instrsOf(prog) for index in instr.getWritten()
+                ]
+                self.assertEqual(len(written), len(set(written)))
+
+                prog = Optimizer(["outssa"]).transform(prog)
+                phis = [instr for instr in instrsOf(prog) if isinstance(instr, Phi)]
+                self.assertFalse(phis)
+
+    # x = 1; n = 2; loop: x1 = phi(x, x2); n1 = phi(n, n2); x2 = x1 + 1; n2 = n1 - 1
+    # if (n2 != 0) branch loop; return x1
+    # the back edge is critical, and x1 is read after the loop while x2 is live
+    def testSSADestructionLostCopy(self):
+        pw = ProgramWriter(["main"])
+        mv = pw.visitMainFunc()
+        (start, loop) = (mv.freshLabel(), mv.freshLabel())
+        mv.visitLabel(start)
+        (x, n) = (mv.visitLoad(1), mv.visitLoad(2))
+        mv.visitLabel(loop)
+        (x1, x2, n1, n2) = (mv.freshTemp() for _ in range(4))
+        mv.visitRaw(Phi(x1, {start: x, loop: x2}))
+        mv.visitRaw(Phi(n1, {start: n, loop: n2}))
+        one = mv.visitLoad(1)
+        mv.visitRaw(Binary(BinaryOp.ADD, x2, x1, one))
+        mv.visitRaw(Binary(BinaryOp.SUB, n2, n1, one))
+        mv.visitCondBranch(CondBranchOp.BNE, n2, loop)
+        mv.visitReturn(x1)
+        mv.visitEnd()
+        prog = pw.visitEnd()
+
+        self.assertEqual(interpret(prog), 2)
+        self.assertEqual(interpret(Optimizer(["outssa"]).transform(prog)), 2)
+
+    # a = 1; b = 2; n = 2; loop: a1 = phi(a, b1); b1 = phi(b, a1); n1 = phi(n, n2)
+    # n2 = n1 - 1; if (n2 != 0) branch loop; return a1 * 10 + b1
+    # the phis swap a1 and b1, the copies on the back edge form a cycle
+    def testSSADestructionSwap(self):
+        pw = ProgramWriter(["main"])
+        mv = pw.visitMainFunc()
+        (start, loop) = (mv.freshLabel(), mv.freshLabel())
+        mv.visitLabel(start)
+        (a, b, n) = (mv.visitLoad(1), mv.visitLoad(2), mv.visitLoad(2))
+        mv.visitLabel(loop)
+        (a1, b1, n1, n2) = (mv.freshTemp() for _ in range(4))
+        mv.visitRaw(Phi(a1, {start: a, loop: b1}))
+        mv.visitRaw(Phi(b1, {start: b, loop: a1}))
+        mv.visitRaw(Phi(n1, {start: n, loop: n2}))
+        mv.visitRaw(Binary(BinaryOp.SUB, n2, n1, mv.visitLoad(1)))
+        mv.visitCondBranch(CondBranchOp.BNE, n2, loop)
+        tens = mv.visitBinary(BinaryOp.MUL, a1, mv.visitLoad(10))
+        mv.visitReturn(mv.visitBinary(BinaryOp.ADD, tens, b1))
+        mv.visitEnd()
+        prog = pw.visitEnd()
+
+        self.assertEqual(interpret(prog), 21)
+        self.assertEqual(interpret(Optimizer(["outssa"]).transform(prog)), 21)
+    def testLICM(self):
+        self.compare(["licm"])
+
+    # s = 0; n = 10; loop: t = x * 7; s = s + t; n = n - 1; if (n != 0) branch loop
+    # x * 7 and the constants are computed once, before the loop
+    def testLICMHoistsInvariant(self):
+        pw = ProgramWriter(["main"])
+        mv = pw.visitMainFunc()
+        (s, n) = (mv.freshTemp(), mv.freshTemp())
+        loop = mv.freshLabel()
+        x = mv.visitLoad(6)
+        mv.visitAssignment(s, mv.visitLoad(0))
+        mv.visitAssignment(n, mv.visitLoad(10))
+        mv.visitLabel(loop)
+        t = mv.visitBinary(BinaryOp.MUL, x, mv.visitLoad(7))
+        mv.visitBinarySelf(BinaryOp.ADD, s, t)
+        mv.visitBinarySelf(BinaryOp.SUB, n, mv.visitLoad(1))
+        mv.visitCondBranch(CondBranchOp.BNE, n, loop)
+        mv.visitReturn(s)
+        mv.visitEnd()
+        prog = pw.visitEnd()
+
+        (value, before) = TACInterpreter().run(prog)
+        (hoisted, after) = TACInterpreter().run(Optimizer(["licm"]).transform(prog))
+        self.assertEqual((value, hoisted), (420, 420))
+        # the MUL and the LoadImm4 of 7 and 1 run once instead of ten times
+        self.assertEqual(before.instrCount() - after.instrCount(), 3 * 9)
+
+    def testValueNumbering(self):
+        self.compare(["lvn"])
+        self.compare(["gvn"])
+        self.compare(["ssa", "gvn", "outssa"])
+
+    # a = x + y; if (a) { b = y + x; x = 1; c = y + x } return a + b - c
+    # y + x is a again in the block dominated by it, but not once x is written
+    def valueNumberingProg(self) -> TACProg:
+        pw = ProgramWriter(["main"])
+        mv = pw.visitMainFunc()
+        (x, b, c) = (mv.freshTemp(), mv.freshTemp(), mv.freshTemp())
+        end = mv.freshLabel()
+        y = mv.visitLoad(30)
+        mv.visitAssignment(x, mv.visitLoad(12))
+        mv.visitAssignment(b, mv.visitLoad(0))
+        mv.visitAssignment(c, mv.visitLoad(0))
+        a = mv.visitBinary(BinaryOp.ADD, x, y)
+        mv.visitCondBranch(CondBranchOp.BEQ, a, end)
+        mv.visitAssignment(b, mv.visitBinary(BinaryOp.ADD, y, x))
+        mv.visitAssignment(x, mv.visitLoad(1))
+        mv.visitAssignment(c, mv.visitBinary(BinaryOp.ADD, y, x))
+        mv.visitLabel(end)
+        sum = mv.visitBinary(BinaryOp.ADD, a, b)
+        mv.visitReturn(mv.visitBinary(BinaryOp.SUB, sum, c))
+        mv.visitEnd()
+        return pw.visitEnd()
+
+    def testValueNumberingReusesValues(self):
+        # only the global one finds x + y in the block dominated by it
+        for (passes, count) in [
+            (["lvn"], 4),
+            (["gvn"], 3),
+            (["ssa", "gvn", "outssa"], 3),
+        ]:
+            with self.subTest(passes=passes):
+                prog = Optimizer(passes).transform(self.valueNumberingProg())
+                self.assertEqual(interpret(prog), 42 + 42 - 31)
+                adds = [
+                    instr
+                    for instr in instrsOf(prog)
+                    if isinstance(instr, Binary) and instr.op == BinaryOp.ADD
+                ]
+                self.assertEqual(len(adds), count)
+
+    # x op y and y op x are the same operation only if op is commutative
+    def testValueNumberingKeepsOperandOrder(self):
+        for op in BinaryOp:
+            pw = ProgramWriter(["main"])
+            mv = pw.visitMainFunc()
+            (x, y) = (mv.visitLoad(7), mv.visitLoad(-3))
+            a = mv.visitBinary(op, x, y)
+            b = mv.visitBinary(op, y, x)
+            scaled = mv.visitBinary(BinaryOp.MUL, a, mv.visitLoad(1000))
+            mv.visitReturn(mv.visitBinary(BinaryOp.ADD, scaled, b))
+            mv.visitEnd()
+            prog = pw.visitEnd()
+
+            expected = interpret(prog)
+            with self.subTest(op=op):
+                prog = Optimizer(["lvn"]).transform(prog)
+                self.assertEqual(interpret(prog), expected)
+    def testDCE(self):
+        self.compare(["dce"])
+
+    # x = 5; y = x * 3; x = 7; return x + 1; y = 9
+    # y is never read, the first value of x is overwritten, y = 9 is unreachable
+    def testDCERemovesDeadCode(self):
+        pw = ProgramWriter(["main"])
+        mv = pw.visitMainFunc()
+        (x, y) = (mv.freshTemp(), mv.freshTemp())
+        mv.visitAssignment(x, mv.visitLoad(5))
+        mv.visitAssignment(y, mv.visitBinary(BinaryOp.MUL, x, mv.visitLoad(3)))
+        mv.visitAssignment(x, mv.visitLoad(7))
+        mv.visitReturn(mv.visitBinary(BinaryOp.ADD, x, mv.visitLoad(1)))
+        mv.visitAssignment(y, mv.visitLoad(9))
+        mv.visitReturn(y)
+        mv.visitEnd()
+        prog = Optimizer(["dce"]).transform(pw.visitEnd())
+
+        self.assertEqual(interpret(prog), 8)
+        instrs = instrsOf(prog)
+        values = [instr.value for instr in instrs if isinstance(instr, LoadImm4)]
+        self.assertEqual(values, [7, 1])
+        ops = [instr.op for instr in instrs if isinstance(instr, Binary)]
+        self.assertEqual(ops, [BinaryOp.ADD])
+
+
+if __name__ == "__main__":
+    unittest.main()
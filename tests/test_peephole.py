@@ -0,0 +1,50 @@
+import unittest
+
+from backend.riscv.peephole import Peephole
+from backend.riscv.riscvsimulator import RiscvSimulator
+from utils.riscv import Riscv
+from utils.tac.nativeinstr import NativeInstr
+from utils.tac.tacop import BinaryOp
+
+"""
+Tests of Peephole: the instrs of a function are run by RiscvSimulator before and after
+the rules rewrite them, and must give the same a0
+
+1. 规则改写过的指令之后，向前查找栈槽的规则应看到改写后的指令
+"""
+
+
+def run(buf: list[NativeInstr]) -> int:
+    text = "\n".join(["main:"] + [str(instr) for instr in buf] + ["ret"])
+    return RiscvSimulator(text).run().exitValue
+
+
+class TestPeephole(unittest.TestCase):
+    # forward-move turns lw t5, 0(sp); mv a0, t5 into lw a0, 0(sp), so the second
+    # lw t5, 0(sp) must not be dropped as if t5 still held the slot
+    def testLoadAfterForwardMove(self):
+        (t0, t5, a0, sp) = (Riscv.T0, Riscv.T5, Riscv.A0, Riscv.SP)
+        buf = [
+            Riscv.SPAdd(-16),
+            Riscv.LoadImm(t0, 7).toNative([t0], []),
+            Riscv.NativeStoreWord(t0, sp, 0),
+            Riscv.LoadImm(t0, 100).toNative([t0], []),
+            Riscv.NativeLoadWord(t5, sp, 0),
+            Riscv.Move(a0, t5).toNative([a0], [t5]),
+            Riscv.NativeLoadWord(t5, sp, 0),
+            Riscv.Binary(BinaryOp.ADD, a0, a0, t5).toNative([a0], [a0, t5]),
+            Riscv.SPAdd(16),
+        ]
+        peephole = Peephole()
+        result = peephole.run(list(buf), "main")
+
+        self.assertEqual(run(buf), 14)
+        self.assertEqual(run(result), 14)
+        self.assertEqual(peephole.hits["forward-move"], 1)
+        self.assertEqual(peephole.hits["redundant-load"], 1)
+        loads = [instr for instr in result if isinstance(instr, Riscv.NativeLoadWord)]
+        self.assertEqual(len(loads), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
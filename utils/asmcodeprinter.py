@@ -1,33 +1,60 @@
+from typing import Optional, TextIO
+
 from utils.label.label import Label
 from utils.tac.nativeinstr import NativeInstr
 from utils.tac.tacinstr import TACInstr
 
+"""
+AsmCodePrinter: collect the asm code line by line, and write it to a sink
+
+ sink: a writable text stream, e.g. sys.stdout or a file
+       if it's None, the code is kept in memory and returned by close
+lines: the pending lines, which are joined and written to the sink by flush
+
+Call flush at the end of every function, so only the code of one function is held in memory.
+"""
+
 
 class AsmCodePrinter:
     INDENTS = "    "
     COMMENT_PROMPT = "#"
 
-    def __init__(self) -> None:
-        self.buffer = ""
+    def __init__(self, sink: Optional[TextIO] = None) -> None:
+        self.sink = sink
+        self.lines: list[str] = []
+        # the flushed code when there is no sink
+        self.chunks: list[str] = []
 
     def printf(self, fmt: str, **args):
-        self.buffer += self.INDENTS + fmt.format(**args)
+        self.lines.append(self.INDENTS + fmt.format(**args))
 
     def println(self, fmt: str, **args):
-        self.buffer += self.INDENTS + fmt.format(**args) + "\n"
+        self.lines.append(self.INDENTS + fmt.format(**args) + "\n")
 
     def printLabel(self, label: Label):
-        self.buffer += str(label.name) + ":\n"
+        self.lines.append(str(label.name) + ":\n")
 
     def printInstr(self, instr: NativeInstr):
         if instr.isLabel():
-            self.buffer += str(instr.label) + ":"
+            self.lines.append(str(instr.label) + ":\n")
         else:
-            self.buffer += self.INDENTS + str(instr)
-        self.buffer += "\n"
+            self.lines.append(self.INDENTS + str(instr) + "\n")
 
     def printComment(self, comment: str):
-        self.buffer += self.INDENTS + self.COMMENT_PROMPT + " " + comment + "\n"
+        self.lines.append(self.INDENTS + self.COMMENT_PROMPT + " " + comment + "\n")
+
+    def flush(self) -> None:
+        text = "".join(self.lines)
+        self.lines.clear()
+        if self.sink is None:
+            self.chunks.append(text)
+        else:
+            self.sink.write(text)
 
+    # return all the code if there is no sink, otherwise the code has been written to the sink
     def close(self) -> str:
-        return self.buffer
+        self.flush()
+        if self.sink is None:
+            return "".join(self.chunks)
+        self.sink.flush()
+        return ""
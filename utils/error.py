@@ -115,3 +115,8 @@ class IllegalArgumentException(Exception):
 class NullPointerException(Exception):
     def __init__(self) -> None:
         super().__init__("NullPointerException")
+
+
+class SimulatorError(Exception):
+    def __init__(self, message: str) -> None:
+        super().__init__("Simulator error: %s" % message)
@@ -8,6 +8,3 @@ class FuncLabel(Label):
 
     def __str__(self) -> str:
         return "FUNCTION<%s>" % self.func
-
-
-MAIN_LABEL = FuncLabel("main")
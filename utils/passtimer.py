@@ -0,0 +1,124 @@
+import contextlib
+import time
+import tracemalloc
+from typing import Iterator, Optional, TextIO
+
+"""
+PassTimer: measures the wall time, the number of calls and the peak memory of each pass
+
+A pass is measured by `with timer.phase("selectInstr", funcName): ...`. The numbers are
+accumulated per (pass, function), the function being None for the passes which work on
+the whole program. Passes may be nested, e.g. a whole-program pass containing per-function
+passes, and each of them gets the whole time and memory spent inside it.
+
+The peak memory is the peak of the memory allocated by python above what was allocated
+when the pass started, as traced by tracemalloc. It is only measured if tracemalloc has
+been started, which slows everything down, so the wall times are comparable only with
+each other. A disabled timer measures nothing, so that it can be passed around for free.
+
+A pass may also count what it does, e.g. the rewrites of each peephole rule, by
+`timer.count(name)`, the counters being summed over all the functions.
+
+1. phase：测量一个 pass，可以嵌套
+2. printTo：以表格形式输出所有 pass 的测量结果
+3. toJson：以可序列化的形式返回所有 pass 的测量结果
+4. count：累加一个计数器，计数器随测量结果一起输出
+"""
+
+
+class PassStats:
+    def __init__(self, name: str, func: Optional[str], depth: int) -> None:
+        self.name = name
+        self.func = func
+        # the number of passes it is nested in
+        self.depth = depth
+        self.calls = 0
+        self.seconds = 0.0
+        self.peakBytes = 0
+
+
+class PassTimer:
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        # in the order of the first call of each pass
+        self.stats: dict[tuple[str, Optional[str]], PassStats] = {}
+        self.depth = 0
+        # [base, peak] of the passes being measured, from the outermost one
+        self.frames: list[list[int]] = []
+        self.counters: dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str, func: Optional[str] = None) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        key = (name, func)
+        if key not in self.stats:
+            self.stats[key] = PassStats(name, func, self.depth)
+        stats = self.stats[key]
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            self.foldPeak()
+            current = tracemalloc.get_traced_memory()[0]
+            self.frames.append([current, current])
+
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats.seconds += time.perf_counter() - start
+            stats.calls += 1
+            self.depth -= 1
+            if tracing:
+                self.foldPeak()
+                (base, peak) = self.frames.pop()
+                stats.peakBytes = max(stats.peakBytes, peak - base)
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    # tracemalloc has only one peak, so it is reset at the start and the end of every pass
+    # and the peak so far is given to all the passes being measured
+    def foldPeak(self) -> None:
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self.frames:
+            frame[1] = max(frame[1], peak)
+        tracemalloc.reset_peak()
+
+    def printTo(self, out: TextIO) -> None:
+        print(
+            "{:<28}{:>8}{:>14}{:>14}".format("pass", "calls", "wall (ms)", "peak (KB)"),
+            file=out,
+        )
+        for stats in self.stats.values():
+            name = "  " * stats.depth + stats.name
+            if stats.func is not None:
+                name += " ({})".format(stats.func)
+            print(
+                "{:<28}{:>8}{:>14.3f}{:>14.1f}".format(
+                    name, stats.calls, stats.seconds * 1000, stats.peakBytes / 1024
+                ),
+                file=out,
+            )
+        if self.counters:
+            print("", file=out)
+            print("{:<50}{:>14}".format("counter", "count"), file=out)
+            for (name, n) in self.counters.items():
+                print("{:<50}{:>14}".format(name, n), file=out)
+
+    def toJson(self) -> list[dict]:
+        return [
+            {
+                "pass": stats.name,
+                "function": stats.func,
+                "depth": stats.depth,
+                "calls": stats.calls,
+                "seconds": stats.seconds,
+                "peakBytes": stats.peakBytes,
+            }
+            for stats in self.stats.values()
+        ]
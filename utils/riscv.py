@@ -64,6 +64,9 @@ class Riscv:
     FMT_OFFSET = "{}, {}({})"
     # Todo FMT4
 
+    # the branch taken exactly when the other one is not
+    INVERSE_BRANCH = {"beq": "bne", "bne": "beq", "blt": "bge", "bge": "blt"}
+
     class JumpToEpilogue(TACInstr):
         def __init__(self, label: Label) -> None:
             super().__init__(
@@ -121,13 +124,56 @@ class Riscv:
                 str(self.dsts[0]), str(self.srcs[0]), str(self.srcs[1])
             )
     
+    # the op with an immediate operand, e.g. addi, the op is its mnemonic
+    class BinaryImm(TACInstr):
+        def __init__(self, op: str, dst: Temp, src: Temp, value: int) -> None:
+            super().__init__(InstrKind.SEQ, [dst], [src], None)
+            self.op = op
+            self.value = value
+
+        def __str__(self) -> str:
+            return "{} ".format(self.op) + Riscv.FMT3.format(
+                str(self.dsts[0]), str(self.srcs[0]), self.value
+            )
+
+    # the high word of the signed product, for the divisions by a constant
+    class MulHigh(TACInstr):
+        def __init__(self, dst: Temp, src0: Temp, src1: Temp) -> None:
+            super().__init__(InstrKind.SEQ, [dst], [src0, src1], None)
+
+        def __str__(self) -> str:
+            return "mulh " + Riscv.FMT3.format(
+                str(self.dsts[0]), str(self.srcs[0]), str(self.srcs[1])
+            )
+
+    # compares cond with rhs, or x0 with cond if rhs is None, e.g. beq x0, cond jumps
+    # if cond is zero, and blt cond, rhs if cond < rhs, the op is its mnemonic
     class Branch(TACInstr):
-        def __init__(self, cond: Temp, target: Label) -> None:
-            super().__init__(InstrKind.COND_JMP, [], [cond], target)
+        def __init__(
+            self,
+            cond: Temp,
+            target: Label,
+            op: str = "beq",
+            rhs: Optional[Temp] = None,
+        ) -> None:
+            srcs = [cond] if rhs is None else [cond, rhs]
+            super().__init__(InstrKind.COND_JMP, [], srcs, target)
             self.target = target
-        
+            self.op = op
+
         def __str__(self) -> str:
-            return "beq " + Riscv.FMT3.format(str(Riscv.ZERO), str(self.srcs[0]), str(self.target))
+            if len(self.srcs) == 1:
+                operands = [str(Riscv.ZERO), str(self.srcs[0])]
+            else:
+                operands = [str(self.srcs[0]), str(self.srcs[1])]
+            return "{} ".format(self.op) + Riscv.FMT3.format(
+                *operands, str(self.target)
+            )
+
+        # the branch to target, on the same operands, taken when this one is not
+        def inverse(self, target: Label) -> "Riscv.Branch":
+            op = Riscv.INVERSE_BRANCH[self.op]
+            return Riscv.Branch(self.srcs[0], target, op, *self.srcs[1:])
 
     class Jump(TACInstr):
         def __init__(self, target: Label) -> None:
@@ -5,6 +5,13 @@ from utils.tac.reg import Reg
 
 from .tacop import InstrKind
 
+"""
+NativeInstr: an instr whose operands are regs, ready to be printed
+
+origin: the instr of Riscv it is made from by TACInstr.toNative, so that the Peephole
+        can tell what it does, or None for the native instrs made directly
+"""
+
 
 class NativeInstr:
     def __init__(
@@ -14,12 +21,14 @@ class NativeInstr:
         srcs: list[Reg],
         label: Optional[Label],
         instrString: Optional[str] = None,
+        origin=None,
     ) -> None:
         self.kind = kind
         self.dsts = dsts
         self.srcs = srcs
         self.label = label
         self.instrString = instrString
+        self.origin = origin
 
     def __str__(self) -> str:
         assert self.instrString is not None
@@ -19,7 +19,8 @@ class ProgramWriter:
             self.ctx.putFuncLabel(func)
 
     def visitMainFunc(self) -> FuncVisitor:
-        entry = MAIN_LABEL
+        # each program has a label of main of its own, put by the constructor
+        entry = self.ctx.getFuncLabel("main")
         return FuncVisitor(entry, 0, self.ctx)
 
     def visitFunc(self, name: str, numArgs: int) -> FuncVisitor:
@@ -1,5 +1,3 @@
-from typing import Optional
-
 from .temp import Temp
 
 
@@ -10,12 +8,5 @@ class Reg(Temp):
         self.id = id
         self.name = name
 
-        self.occupied = False
-        self.used = False
-        self.temp: Optional[Temp] = None
-
-    def isUsed(self):
-        return self.used
-
     def __str__(self) -> str:
         return self.name
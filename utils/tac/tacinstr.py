@@ -10,6 +10,8 @@ from .tacvisitor import TACVisitor
 from .temp import Temp
 
 
+# The operands of an instr are kept in dsts and srcs only, so that a pass can rename the
+# temps of any instr through them, the named operands of each instr are views of them.
 class TACInstr:
     def __init__(
         self,
@@ -39,12 +41,14 @@ class TACInstr:
         return self.kind == InstrKind.RET
 
     def toNative(self, dstRegs: list[Reg], srcRegs: list[Reg]) -> NativeInstr:
-        oldDsts = dstRegs
-        oldSrcs = srcRegs
+        oldDsts = self.dsts
+        oldSrcs = self.srcs
         self.dsts = dstRegs
         self.srcs = srcRegs
         instrString = self.__str__()
-        newInstr = NativeInstr(self.kind, dstRegs, srcRegs, self.label, instrString)
+        newInstr = NativeInstr(
+            self.kind, dstRegs, srcRegs, self.label, instrString, self
+        )
         self.dsts = oldDsts
         self.srcs = oldSrcs
         return newInstr
@@ -57,8 +61,14 @@ class TACInstr:
 class Assign(TACInstr):
     def __init__(self, dst: Temp, src: Temp) -> None:
         super().__init__(InstrKind.SEQ, [dst], [src], None)
-        self.dst = dst
-        self.src = src
+
+    @property
+    def dst(self) -> Temp:
+        return self.dsts[0]
+
+    @property
+    def src(self) -> Temp:
+        return self.srcs[0]
 
     def __str__(self) -> str:
         return "%s = %s" % (self.dst, self.src)
@@ -71,9 +81,12 @@ class Assign(TACInstr):
 class LoadImm4(TACInstr):
     def __init__(self, dst: Temp, value: int) -> None:
         super().__init__(InstrKind.SEQ, [dst], [], None)
-        self.dst = dst
         self.value = value
 
+    @property
+    def dst(self) -> Temp:
+        return self.dsts[0]
+
     def __str__(self) -> str:
         return "%s = %d" % (self.dst, self.value)
 
@@ -86,8 +99,14 @@ class Unary(TACInstr):
     def __init__(self, op: UnaryOp, dst: Temp, operand: Temp) -> None:
         super().__init__(InstrKind.SEQ, [dst], [operand], None)
         self.op = op
-        self.dst = dst
-        self.operand = operand
+
+    @property
+    def dst(self) -> Temp:
+        return self.dsts[0]
+
+    @property
+    def operand(self) -> Temp:
+        return self.srcs[0]
 
     def __str__(self) -> str:
         return "%s = %s %s" % (
@@ -105,9 +124,18 @@ class Binary(TACInstr):
     def __init__(self, op: BinaryOp, dst: Temp, lhs: Temp, rhs: Temp) -> None:
         super().__init__(InstrKind.SEQ, [dst], [lhs, rhs], None)
         self.op = op
-        self.dst = dst
-        self.lhs = lhs
-        self.rhs = rhs
+
+    @property
+    def dst(self) -> Temp:
+        return self.dsts[0]
+
+    @property
+    def lhs(self) -> Temp:
+        return self.srcs[0]
+
+    @property
+    def rhs(self) -> Temp:
+        return self.srcs[1]
 
     def __str__(self) -> str:
         opStr = {
@@ -149,9 +177,12 @@ class CondBranch(TACInstr):
     def __init__(self, op: CondBranchOp, cond: Temp, target: Label) -> None:
         super().__init__(InstrKind.COND_JMP, [], [cond], target)
         self.op = op
-        self.cond = cond
         self.target = target
 
+    @property
+    def cond(self) -> Temp:
+        return self.srcs[0]
+
     def __str__(self) -> str:
         return "if (%s %s) branch %s" % (
             self.cond,
@@ -170,7 +201,10 @@ class Return(TACInstr):
             super().__init__(InstrKind.RET, [], [], None)
         else:
             super().__init__(InstrKind.RET, [], [value], None)
-        self.value = value
+
+    @property
+    def value(self) -> Optional[Temp]:
+        return self.srcs[0] if self.srcs else None
 
     def __str__(self) -> str:
         return "return" if (self.value is None) else ("return " + str(self.value))
@@ -202,3 +236,33 @@ class Mark(TACInstr):
 
     def accept(self, v: TACVisitor) -> None:
         v.visitMark(self)
+
+
+# Phi function of SSA form, its value is the source of the edge control comes from.
+# The sources are indexed by the labels of the predecessor blocks, None if undefined.
+class Phi(TACInstr):
+    def __init__(self, dst: Temp, sources: dict[Label, Optional[Temp]]) -> None:
+        super().__init__(InstrKind.SEQ, [dst], [], None)
+        self.sources: dict[Label, Optional[Temp]] = {}
+        for (label, src) in sources.items():
+            self.setSource(label, src)
+
+    @property
+    def dst(self) -> Temp:
+        return self.dsts[0]
+
+    def setSource(self, label: Label, src: Optional[Temp]) -> None:
+        self.sources[label] = src
+        self.srcs = [src for src in self.sources.values() if src is not None]
+
+    def __str__(self) -> str:
+        return "%s = phi(%s)" % (
+            self.dst,
+            ", ".join(
+                "%s: %s" % (label, "undef" if src is None else src)
+                for (label, src) in self.sources.items()
+            ),
+        )
+
+    def accept(self, v: TACVisitor) -> None:
+        v.visitPhi(self)